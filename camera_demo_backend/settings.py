@@ -72,6 +72,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request SQL query count header for load testing (see loadtest.py)
+if os.environ.get('PROCTOR_QUERY_COUNT_HEADER') == 'True':
+    MIDDLEWARE.insert(0, 'proctor.middleware.QueryCountMiddleware')
+    CORS_EXPOSE_HEADERS = ['X-DB-Query-Count']
+
 # CORS settings
 if DEBUG:
     CORS_ALLOW_ALL_ORIGINS = True
@@ -156,3 +161,41 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Evidence retention (see `manage.py purge_evidence`): compressed archive location
+PROCTOR_ARCHIVE_DIR = os.environ.get('PROCTOR_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+
+# Inference thread split (see proctor/tuning.py) - 0 / unset means use the tuned
+# profile (`manage.py autotune_inference`) or derive from the core count
+PROCTOR_STAGE_THREADS = int(os.environ.get('PROCTOR_STAGE_THREADS', 0))
+PROCTOR_TORCH_THREADS = int(os.environ.get('PROCTOR_TORCH_THREADS', 0))
+PROCTOR_INTEROP_THREADS = int(os.environ.get('PROCTOR_INTEROP_THREADS', 0))
+PROCTOR_CV2_THREADS = int(os.environ.get('PROCTOR_CV2_THREADS', 0))
+PROCTOR_TUNING_PROFILE = os.environ.get('PROCTOR_TUNING_PROFILE', os.path.join(BASE_DIR, 'inference_profile.json'))
+# YOLO model tiers, heaviest first - lighter tiers take over while the worker is overloaded.
+# A single tier ("yolov5s") turns the downgrade off: overload then only slows the capture rate
+PROCTOR_MODEL_TIERS = [t.strip() for t in os.environ.get('PROCTOR_MODEL_TIERS', 'yolov5s,yolov5n').split(',') if t.strip()]
+# Detector replicas per worker process - frames analysed in parallel with gunicorn --threads;
+# a request waits up to PROCTOR_CHECKOUT_TIMEOUT_MS for its frame to be picked up before repeating its last result
+PROCTOR_DETECTOR_REPLICAS = int(os.environ.get('PROCTOR_DETECTOR_REPLICAS', 1))
+PROCTOR_CHECKOUT_TIMEOUT_MS = int(os.environ.get('PROCTOR_CHECKOUT_TIMEOUT_MS', 1000))
+# Frames are scheduled round-robin across candidates; each gets at least this many analysed frames/s
+# while the workers can keep up (candidates past it are served first)
+PROCTOR_MIN_ANALYSIS_FPS = float(os.environ.get('PROCTOR_MIN_ANALYSIS_FPS', 0.5))
+# Frames older than this (from the client's captured_at, or arrival) are answered with the last
+# result instead of being analysed - see proctor/deadlines.py
+PROCTOR_FRAME_MAX_AGE_MS = int(os.environ.get('PROCTOR_FRAME_MAX_AGE_MS', 2000))
+# Inference processes sharing this host (gunicorn --workers); cores are divided between them
+PROCTOR_WORKER_PROCESSES = int(os.environ.get('PROCTOR_WORKER_PROCESSES', os.environ.get('WEB_CONCURRENCY', 1)))
+# Rows fetched per database round trip by the streaming CSV / XLSX exports (proctor/exports.py)
+PROCTOR_EXPORT_CHUNK_SIZE = int(os.environ.get('PROCTOR_EXPORT_CHUNK_SIZE', 2000))
+# XLSX can't be streamed - rows per exported .xlsx file; larger exports are paged with ?after=<id>
+PROCTOR_EXPORT_XLSX_MAX_ROWS = int(os.environ.get('PROCTOR_EXPORT_XLSX_MAX_ROWS', 50000))
+# Per-candidate face buffers / object and phone trackers (proctor/state.py): 'local' keeps them in
+# each worker process; a redis:// URL shares them, so any worker or host can serve any frame
+PROCTOR_STATE_STORE = os.environ.get('PROCTOR_STATE_STORE', CACHES['default'].get('LOCATION', 'local'))
+# Seconds a silent candidate's tracker state (and each worker's cached motion model / results) is kept
+PROCTOR_STATE_TTL = int(os.environ.get('PROCTOR_STATE_TTL', 300))
+# Violation episodes (proctor/episodes.py): an episode ends after this many seconds without any frame
+# from the candidate - 0 derives it from the slowest advised capture interval plus the frame max age
+PROCTOR_EPISODE_GAP_S = float(os.environ.get('PROCTOR_EPISODE_GAP_S', 0))
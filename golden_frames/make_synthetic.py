@@ -0,0 +1,73 @@
+# make_synthetic.py - SYNTHETIC GOLDEN FRAMES
+#
+# Writes the committed `empty/` frames: webcam-like scenes with nobody and
+# nothing in them (an empty desk, a dark room, a blown-out window, a blurred
+# pan, a noisy low-end sensor). Each must raise `no_face` and nothing else
+# (labels.json), so they can ship with the repo - no real people - and make
+# `detector_regression` runnable on a fresh checkout. Frames of faces,
+# phones, books and laptops still have to be real photos (see README.md).
+#
+#   python golden_frames/make_synthetic.py
+#
+# Deterministic: the same numpy seed always produces the same files.
+import os
+
+import cv2
+import numpy as np
+
+WIDTH, HEIGHT = 640, 480
+OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'empty')
+
+
+def _room(rng, wall=(168, 176, 182), desk=(70, 96, 122)):
+    """Wall with a soft vertical light falloff, a desk edge and sensor noise (BGR)"""
+    falloff = np.linspace(1.1, 0.75, HEIGHT)[:, None, None]
+    frame = np.ones((HEIGHT, WIDTH, 3), np.float32) * np.array(wall, np.float32) * falloff
+    desk_top = int(HEIGHT * 0.72)
+    frame[desk_top:] = np.array(desk, np.float32) * np.linspace(1.0, 0.8, HEIGHT - desk_top)[:, None, None]
+    frame[desk_top - 2:desk_top + 2] *= 0.6   # desk edge shadow
+    frame += rng.normal(0, 3, frame.shape)
+    return frame
+
+
+def empty_desk(rng):
+    return _room(rng)
+
+
+def dark_room(rng):
+    frame = _room(rng) * 0.12
+    return frame + rng.normal(0, 4, frame.shape)
+
+
+def overexposed(rng):
+    frame = _room(rng, wall=(235, 240, 245), desk=(190, 200, 210)) * 1.25
+    cv2.circle(frame, (WIDTH // 3, HEIGHT // 3), 140, (255, 255, 255), -1)   # window glare
+    return cv2.GaussianBlur(frame, (0, 0), 25)
+
+
+def motion_blur(rng):
+    kernel = np.zeros((1, 41), np.float32)
+    kernel[0, :] = 1.0 / 41
+    return cv2.filter2D(_room(rng, wall=(150, 160, 150)), -1, kernel)
+
+
+def noisy_sensor(rng):
+    frame = _room(rng, wall=(120, 128, 140), desk=(60, 70, 80))
+    return frame + rng.normal(0, 18, frame.shape)
+
+
+SCENES = [empty_desk, dark_room, overexposed, motion_blur, noisy_sensor]
+
+
+def main():
+    os.makedirs(OUT_DIR, exist_ok=True)
+    rng = np.random.default_rng(2024)
+    for index, scene in enumerate(SCENES, 1):
+        frame = np.clip(scene(rng), 0, 255).astype(np.uint8)
+        path = os.path.join(OUT_DIR, f"{index:02d}_{scene.__name__}.jpg")
+        cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        print(f"🖼️ Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
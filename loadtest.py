@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+"""
+Local load-testing harness - simulates a full exam cohort against a running server.
+
+Each simulated candidate:
+  1. logs in through /api/proctor/student_login/
+  2. fetches /api/proctor/questions/
+  3. posts webcam frames to /api/proctor/analyze/ at --fps for --duration seconds
+  4. submits a TestResult to /api/proctor/results/
+
+Reports p50/p95/p99 frame latency, skip rate and DB queries per frame.
+Start the server with PROCTOR_QUERY_COUNT_HEADER=True to get query counts:
+
+    PROCTOR_QUERY_COUNT_HEADER=True python manage.py runserver 8000
+    python loadtest.py --candidates 30 --fps 1 --duration 60 --create-students
+"""
+import argparse
+import base64
+import glob
+import os
+import random
+import threading
+import time
+
+import requests
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def load_frames(image_dir, count=20, size=(1280, 720)):
+    """Recorded JPEGs from `image_dir`, or synthetic webcam-like frames"""
+    if image_dir:
+        paths = sorted(glob.glob(os.path.join(image_dir, '*.jp*g')))
+        if not paths:
+            raise SystemExit(f"No .jpg/.jpeg files found in {image_dir}")
+        frames = []
+        for path in paths:
+            with open(path, 'rb') as fh:
+                frames.append(fh.read())
+        return frames
+
+    import cv2
+    import numpy as np
+    frames = []
+    width, height = size
+    for i in range(count):
+        img = np.full((height, width, 3), 90, np.uint8)
+        cv2.randn(img, (90, 90, 90), (20, 20, 20))
+        # A face-like blob that drifts a little between frames
+        cx, cy = width // 2 + random.randint(-40, 40), height // 2 + random.randint(-20, 20)
+        cv2.ellipse(img, (cx, cy), (110, 140), 0, 0, 360, (140, 170, 210), -1)
+        cv2.circle(img, (cx - 40, cy - 30), 12, (40, 40, 40), -1)
+        cv2.circle(img, (cx + 40, cy - 30), 12, (40, 40, 40), -1)
+        ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        frames.append(buf.tobytes())
+    return frames
+
+
+def create_students(count, email_pattern, password):
+    """Create (or reset) the simulated students directly in the local database"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camera_demo_backend.settings')
+    import django
+    django.setup()
+    from django.contrib.auth.hashers import make_password
+    from proctor.models import Student
+
+    hashed = make_password(password)
+    for n in range(count):
+        email = email_pattern.format(n=n)
+        Student.objects.update_or_create(
+            email=email,
+            defaults={'student_id': f"loadtest-{n}", 'name': f"Load Test {n}", 'password': hashed, 'is_active': True},
+        )
+    print(f"👥 {count} load-test students ready")
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.queries = []
+        self.frames = 0
+        self.skipped = 0
+        self.cached = 0
+        self.stale = 0
+        self.advised = []
+        self.tiers = {}
+        self.errors = 0
+        self.logins = 0
+        self.results = 0
+
+    def frame(self, latency_ms, body, query_count):
+        with self.lock:
+            self.frames += 1
+            self.latencies.append(latency_ms)
+            if query_count is not None:
+                self.queries.append(query_count)
+            if body.get('skipped'):
+                self.skipped += 1
+            if body.get('cached'):
+                self.cached += 1
+            if body.get('stale'):
+                self.stale += 1
+            if body.get('model_tier'):
+                self.tiers[body['model_tier']] = self.tiers.get(body['model_tier'], 0) + 1
+            if body.get('next_capture_ms') is not None:
+                self.advised.append(body['next_capture_ms'])
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+
+def run_candidate(n, args, frames, stats, start_barrier):
+    base = args.url.rstrip('/')
+    http = requests.Session()
+    email = args.email_pattern.format(n=n)
+    candidate_id = email
+
+    start_barrier.wait()
+    try:
+        r = http.post(f"{base}/api/proctor/student_login/", json={'email': email, 'password': args.password}, timeout=30)
+        if r.ok:
+            with stats.lock:
+                stats.logins += 1
+            candidate_id = r.json().get('user', {}).get('email', email)
+        else:
+            stats.error()
+
+        r = http.get(f"{base}/api/proctor/questions/", timeout=30)
+        questions = r.json() if r.ok else []
+        if not r.ok:
+            stats.error()
+    except requests.RequestException:
+        stats.error()
+        return
+
+    interval = 1.0 / args.fps
+    deadline = time.monotonic() + args.duration
+    next_send = time.monotonic() + random.uniform(0, interval)  # spread candidates out
+    i = random.randrange(len(frames))
+    while time.monotonic() < deadline:
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_send += interval
+
+        payload = {
+            'image': 'data:image/jpeg;base64,' + base64.b64encode(frames[i % len(frames)]).decode(),
+            'candidate_id': candidate_id,
+            'mode': 'test',
+            'captured_at': int(time.time() * 1000),
+        }
+        i += 1
+        started = time.perf_counter()
+        try:
+            r = http.post(f"{base}/api/proctor/analyze/", json=payload, timeout=args.timeout)
+        except requests.RequestException:
+            stats.error()
+            continue
+        latency_ms = (time.perf_counter() - started) * 1000
+        if not r.ok:
+            stats.error()
+            continue
+        body = r.json()
+        query_count = r.headers.get('X-DB-Query-Count')
+        stats.frame(latency_ms, body, int(query_count) if query_count is not None else None)
+        if args.adaptive and body.get('next_capture_ms'):
+            # Follow the server-advised capture interval, like the exam client does
+            next_send = max(next_send, time.monotonic() + body['next_capture_ms'] / 1000.0)
+
+    try:
+        total = len(questions) if isinstance(questions, list) else 0
+        r = http.post(f"{base}/api/proctor/results/", json={
+            'student_name': candidate_id,
+            'score': random.randint(0, total) if total else 0,
+            'total_questions': total,
+        }, timeout=30)
+        if r.ok:
+            with stats.lock:
+                stats.results += 1
+        else:
+            stats.error()
+    except requests.RequestException:
+        stats.error()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server base URL')
+    parser.add_argument('--candidates', type=int, default=10, help='Simulated candidates (N)')
+    parser.add_argument('--fps', type=float, default=1.0, help='Frames per second per candidate (K)')
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds of frame traffic per candidate')
+    parser.add_argument('--images', default=None, help='Directory of recorded .jpg frames (default: synthetic)')
+    parser.add_argument('--email-pattern', default='loadtest{n}@example.com', help='Student email, {n} = index')
+    parser.add_argument('--password', default='loadtest-password')
+    parser.add_argument('--create-students', action='store_true', help='Create the students in the local DB first')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Slow down to the server-advised next_capture_ms instead of a fixed --fps')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    args = parser.parse_args()
+
+    if args.create_students:
+        create_students(args.candidates, args.email_pattern, args.password)
+
+    frames = load_frames(args.images)
+    stats = Stats()
+    barrier = threading.Barrier(args.candidates + 1)
+    threads = [
+        threading.Thread(target=run_candidate, args=(n, args, frames, stats, barrier), daemon=True)
+        for n in range(args.candidates)
+    ]
+    for t in threads:
+        t.start()
+
+    print(f"🚀 {args.candidates} candidates x {args.fps} fps for {args.duration}s against {args.url}")
+    barrier.wait()
+    started = time.monotonic()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    expected = int(args.candidates * args.fps * args.duration)
+    print("\n" + "=" * 65)
+    print("📊 LOAD TEST REPORT")
+    print(f"   Logins:          {stats.logins}/{args.candidates}")
+    print(f"   Results posted:  {stats.results}/{args.candidates}")
+    print(f"   Frames answered: {stats.frames} (target {expected}) in {elapsed:.1f}s "
+          f"= {stats.frames / elapsed:.1f} frames/s")
+    print(f"   Latency p50/p95/p99: {percentile(stats.latencies, 50):.0f} / "
+          f"{percentile(stats.latencies, 95):.0f} / {percentile(stats.latencies, 99):.0f} ms")
+    if stats.frames:
+        print(f"   Skip rate:       {stats.skipped / stats.frames * 100:.1f}% "
+              f"(cached: {stats.cached / stats.frames * 100:.1f}%, stale: {stats.stale / stats.frames * 100:.1f}%)")
+    if stats.advised:
+        print(f"   Advised interval p50/max: {percentile(stats.advised, 50):.0f} / {max(stats.advised):.0f} ms")
+    if stats.tiers:
+        print("   Model tiers:     " + ', '.join(f"{tier} {count}" for tier, count in sorted(stats.tiers.items())))
+    if stats.queries:
+        print(f"   DB queries/frame: avg {sum(stats.queries) / len(stats.queries):.1f}, "
+              f"max {max(stats.queries)}")
+    else:
+        print("   DB queries/frame: n/a (start the server with PROCTOR_QUERY_COUNT_HEADER=True)")
+    print(f"   Errors:          {stats.errors}")
+    print("=" * 65)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,115 @@
-from django.contrib import admin
+import base64
+import binascii
+from datetime import timedelta
+
+from django.contrib import admin, messages
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import ExamSession, Screenshot, Violation, Student, Exam, Question, TestResult
+from .admin_pagination import KeysetPaginationMixin
+from .models import ExamSession, Screenshot, Violation, Student, Exam, Question, TestResult, ScreenshotRescore, RetentionPolicy, ViolationSummary, AnswerKey
+
+
+class RecentReasonFilter(admin.SimpleListFilter):
+    """Reason choices seen within `window_days` - SELECT DISTINCT over the whole evidence table is a full scan"""
+    title = 'reason'
+    parameter_name = 'reason'
+    date_field = 'captured_at'
+    window_days = 7
+
+    def lookups(self, request, model_admin):
+        since = timezone.now() - timedelta(days=self.window_days)
+        reasons = set(
+            model_admin.model.objects.filter(**{f'{self.date_field}__gte': since})
+            .order_by().values_list('reason', flat=True).distinct()
+        )
+        if self.value():
+            reasons.add(self.value())
+        return [(reason, reason) for reason in sorted(reasons)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(reason=self.value())
+        return queryset
+
+
+class RecentWindowFilter(admin.SimpleListFilter):
+    """
+    Last 24 hours / 7 days only - the stock date filter's "this year" and "any date"
+    choices scan the whole evidence table. Older rows: page back with "Older rows".
+    """
+    title = 'recorded'
+    parameter_name = 'within'
+    date_field = 'captured_at'
+    windows = {'24h': timedelta(hours=24), '7d': timedelta(days=7)}
+
+    def lookups(self, request, model_admin):
+        return [('24h', 'Last 24 hours'), ('7d', 'Last 7 days')]
+
+    def queryset(self, request, queryset):
+        window = self.windows.get(self.value())
+        if window:
+            return queryset.filter(**{f'{self.date_field}__gte': timezone.now() - window})
+        return queryset
+
+
+class ViolationWindowFilter(RecentWindowFilter):
+    date_field = 'timestamp'
+
+
+class ViolationReasonFilter(RecentReasonFilter):
+    """Violation reasons come from the (small) hourly summary table"""
+
+    def lookups(self, request, model_admin):
+        reasons = set(ViolationSummary.objects.order_by().values_list('reason', flat=True).distinct())
+        if self.value():
+            reasons.add(self.value())
+        return [(reason, reason) for reason in sorted(reasons)]
+
 
 @admin.register(Screenshot)
-class ScreenshotAdmin(admin.ModelAdmin):
+class ScreenshotAdmin(KeysetPaginationMixin, admin.ModelAdmin):
     list_display = ['id', 'session_candidate', 'reason', 'captured_at', 'image_preview']
-    list_filter = ['reason', 'captured_at']
+    list_filter = [RecentReasonFilter, RecentWindowFilter]
+    list_select_related = ['session']
     search_fields = ['session__candidate_id', 'reason']
     readonly_fields = ['image_display']
     
+    def get_queryset(self, request):
+        # The base64 image is by far the widest column - the list loads previews one by one via image_view
+        return super().get_queryset(request).defer('image')
+
+    def get_urls(self):
+        return [
+            path('<int:object_id>/image/', self.admin_site.admin_view(self.image_view),
+                 name='proctor_screenshot_image'),
+        ] + super().get_urls()
+
+    def image_view(self, request, object_id):
+        screenshot = get_object_or_404(Screenshot.objects.only('image'), pk=object_id)
+        header, _, data = screenshot.image.partition(',')
+        if not data:
+            header, data = 'data:image/jpeg;base64', header
+        try:
+            body = base64.b64decode(data)
+        except (binascii.Error, ValueError):
+            raise Http404("Screenshot image is not valid base64")
+        content_type = header[len('data:'):].split(';')[0] if header.startswith('data:') else 'image/jpeg'
+        response = HttpResponse(body, content_type=content_type or 'image/jpeg')
+        response['Cache-Control'] = 'private, max-age=86400'
+        return response
+
     def session_candidate(self, obj):
         return obj.session.candidate_id
     session_candidate.short_description = 'Candidate ID'
     
     def image_preview(self, obj):
         return format_html(
-            '<img src="{}" style="max-width: 100px; max-height: 75px;" />',
-            obj.image
+            '<img src="{}" loading="lazy" style="max-width: 100px; max-height: 75px;" />',
+            reverse('admin:proctor_screenshot_image', args=[obj.pk])
         )
     image_preview.short_description = 'Preview'
     
@@ -30,15 +123,15 @@ class ScreenshotAdmin(admin.ModelAdmin):
 
 @admin.register(ExamSession)
 class ExamSessionAdmin(admin.ModelAdmin):
-    list_display = ['id', 'candidate_id', 'started_at', 'violations', 'completed', 'can_retake', 'retake_requested']
-    list_filter = ['completed', 'can_retake', 'retake_requested', 'terminated', 'started_at']
+    list_display = ['id', 'candidate_id', 'exam', 'started_at', 'violations', 'completed', 'can_retake', 'retake_requested']
+    list_filter = ['exam', 'completed', 'can_retake', 'retake_requested', 'terminated', 'started_at']
     search_fields = ['candidate_id']
     readonly_fields = ['started_at', 'violations']
     actions = ['approve_retake', 'deny_retake', 'reset_for_retake']
     
     fieldsets = (
         ('Session Info', {
-            'fields': ('candidate_id', 'started_at', 'violations', 'terminated', 'completed')
+            'fields': ('candidate_id', 'exam', 'started_at', 'violations', 'terminated', 'completed')
         }),
         ('Retake Management', {
             'fields': ('can_retake', 'retake_requested', 'retake_reason')
@@ -56,8 +149,20 @@ class ExamSessionAdmin(admin.ModelAdmin):
     deny_retake.short_description = "❌ Deny retake requests"
     
     def reset_for_retake(self, request, queryset):
-        count = queryset.update(can_retake=True, retake_requested=False, completed=False, terminated=False)
+        # A candidate can hold only one active session (uniq_active_session_per_candidate)
+        count, skipped = 0, 0
+        for session in queryset.order_by('-started_at'):
+            try:
+                with transaction.atomic():
+                    ExamSession.objects.filter(pk=session.pk).update(
+                        can_retake=True, retake_requested=False, completed=False, terminated=False)
+                count += 1
+            except IntegrityError:
+                skipped += 1
         self.message_user(request, f'{count} session(s) reset for retake.')
+        if skipped:
+            self.message_user(request, f'{skipped} session(s) skipped - candidate already has an active session.',
+                              level=messages.WARNING)
     reset_for_retake.short_description = "🔄 Reset session for retake"
 
 
@@ -91,22 +196,39 @@ class StudentAdmin(admin.ModelAdmin):
 
 
 @admin.register(Violation)
-class ViolationAdmin(admin.ModelAdmin):
-    list_display = ['id', 'session_candidate', 'reason', 'timestamp']
-    list_filter = ['reason', 'timestamp']
+class ViolationAdmin(KeysetPaginationMixin, admin.ModelAdmin):
+    list_display = ['id', 'session_candidate', 'reason', 'timestamp', 'duration', 'frame_count']
+    list_filter = [ViolationReasonFilter, ViolationWindowFilter]
+    list_select_related = ['session']
     search_fields = ['session__candidate_id', 'reason']
-    readonly_fields = ['timestamp']
+    readonly_fields = ['timestamp', 'last_seen_at', 'ended_at', 'frame_count']
     
     def session_candidate(self, obj):
         return obj.session.candidate_id
     session_candidate.short_description = 'Candidate ID'
 
+    def duration(self, obj):
+        if obj.last_seen_at is None:
+            return '-'
+        seconds = int((obj.last_seen_at - obj.timestamp).total_seconds())
+        return f"{seconds}s" if obj.ended_at else f"{seconds}s (ongoing)"
+    duration.short_description = 'Duration'
+
 
 @admin.register(Exam)
 class ExamAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'duration_minutes', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name']
+    actions = ['regrade_submissions']
+
+    def regrade_submissions(self, request, queryset):
+        from .grading import regrade_exam
+        for exam in queryset:
+            stats = regrade_exam(exam.pk)
+            self.message_user(request, f"{exam.name}: {stats['rescored']} of {stats['submissions']} "
+                                       f"submission(s) rescored against key v{stats['answer_key_version']}.")
+    regrade_submissions.short_description = "📝 Regrade submissions against the current answer key"
 
 
 @admin.register(Question)
@@ -125,10 +247,40 @@ class TestResultAdmin(admin.ModelAdmin):
     list_display = ['id', 'student_name', 'exam', 'score', 'total_questions', 'percentage', 'date_taken']
     list_filter = ['exam', 'date_taken']
     search_fields = ['student_name']
-    readonly_fields = ['date_taken']
+    readonly_fields = ['date_taken', 'answers', 'answer_key']
     
     def percentage(self, obj):
         if obj.total_questions > 0:
             return f"{(obj.score / obj.total_questions * 100):.1f}%"
         return "0%"
     percentage.short_description = 'Score %'
+
+
+@admin.register(ScreenshotRescore)
+class ScreenshotRescoreAdmin(admin.ModelAdmin):
+    list_display = ['id', 'run_label', 'screenshot', 'face_count', 'phone_count', 'prohibited_objects', 'error', 'created_at']
+    list_filter = ['run_label']
+    search_fields = ['run_label', 'prohibited_objects']
+    raw_id_fields = ['screenshot']
+
+
+@admin.register(RetentionPolicy)
+class RetentionPolicyAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'exam', 'max_age_days', 'archive', 'archive_by', 'is_active']
+    list_filter = ['is_active', 'archive', 'archive_by']
+    search_fields = ['name', 'exam__name']
+
+
+@admin.register(ViolationSummary)
+class ViolationSummaryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'candidate_id', 'reason', 'hour', 'count']
+    list_filter = ['reason']
+    search_fields = ['candidate_id', 'reason']
+    raw_id_fields = ['session']
+
+
+@admin.register(AnswerKey)
+class AnswerKeyAdmin(admin.ModelAdmin):
+    list_display = ['id', 'exam', 'version', 'created_at']
+    list_filter = ['exam']
+    readonly_fields = ['exam', 'version', 'question_ids', 'answers', 'created_at']
@@ -0,0 +1,103 @@
+# admin_pagination.py - CHANGELISTS FOR MILLION-ROW TABLES
+#
+# The stock admin changelist runs COUNT(*) over the filtered table (twice, with
+# show_full_result_count) and pages with OFFSET, both linear in the table size.
+# For Violation / Screenshot:
+#   - EstimatedCountPaginator reads the planner's row estimate for an unfiltered
+#     PostgreSQL table and caps filtered counts at `count_cap` rows (shown as
+#     "10000+")
+#   - KeysetPaginationMixin adds "older rows" links that restart the changelist
+#     at `?before=<last id>` (an index range scan) instead of deep OFFSETs. The
+#     cursor is a pk, so it only applies to the default newest-first ordering:
+#     sorted by a column header, the changelist pages with the stock OFFSET links
+from django.contrib.admin.views.main import ORDER_VAR
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+KEYSET_PARAM = 'before'
+
+
+def estimated_row_count(model, using='default'):
+    """Planner row estimate for the model's table (PostgreSQL only, else None)"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+        row = cursor.fetchone()
+    # -1 / 0 until the table has been vacuumed or analysed
+    return row[0] if row and row[0] > 0 else None
+
+
+class CappedCount(int):
+    """A count that stopped at the cap - renders as "10000+" in the changelist"""
+
+    def __str__(self):
+        return f"{int(self)}+"
+
+    def __format__(self, spec):
+        return str(self)
+
+
+class EstimatedCountPaginator(Paginator):
+    count_cap = 10000         # exact counts above this are not worth a full scan
+    estimate_threshold = 100000  # below this an exact COUNT(*) is cheap enough
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.estimate_threshold:
+                return estimate
+        # COUNT over a LIMITed subquery stops after count_cap rows
+        count = queryset.order_by().values('pk')[:self.count_cap].count()
+        return CappedCount(count) if count >= self.count_cap else count
+
+
+class KeysetPaginationMixin:
+    """ModelAdmin mixin: `?before=<pk>` restricts the changelist to rows with a smaller pk"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ['-pk']
+    change_list_template = 'admin/proctor/keyset_change_list.html'
+
+    def keyset_applies(self, request):
+        """Only a newest-first pk ordering can resume from a pk"""
+        if request.GET.get(ORDER_VAR):
+            return False
+        ordering = list(self.get_ordering(request) or [])
+        return bool(ordering) and ordering[0] in ('-pk', f'-{self.model._meta.pk.name}')
+
+    def changelist_view(self, request, extra_context=None):
+        # The stock ChangeList rejects unknown query parameters - take ours out first
+        before = request.GET.get(KEYSET_PARAM)
+        if before is not None:
+            request.GET = request.GET.copy()
+            del request.GET[KEYSET_PARAM]
+        keyset = self.keyset_applies(request)
+        try:
+            request.keyset_before = int(before) if before and keyset else None
+        except ValueError:
+            request.keyset_before = None
+
+        response = super().changelist_view(request, extra_context=extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None and keyset:
+            rows = list(changelist.result_list)
+            params = request.GET.copy()
+            params.pop('p', None)
+            if request.keyset_before is not None:
+                response.context_data['keyset_newest_url'] = '?' + params.urlencode()
+            if len(rows) >= changelist.list_per_page:
+                params[KEYSET_PARAM] = rows[-1].pk
+                response.context_data['keyset_older_url'] = '?' + params.urlencode()
+        return response
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        before = getattr(request, 'keyset_before', None)
+        if before is not None:
+            queryset = queryset.filter(pk__lt=before)
+        return queryset
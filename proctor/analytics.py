@@ -0,0 +1,73 @@
+# analytics.py - INCREMENTALLY MAINTAINED VIOLATION SUMMARY
+#
+# Every recorded Violation bumps one (session, reason, hour) counter in
+# ViolationSummary. The analytics endpoint aggregates that table (thousands of
+# rows per semester) plus ExamSession, never Violation itself.
+# Violations and sessions belong to an exam through ExamSession.exam - set when
+# the session starts - so in-progress and terminated sessions count too.
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Q, Sum
+
+from .models import ExamSession, ViolationSummary
+
+
+def record_violation(violation):
+    """Add one violation to its hourly summary bucket (atomic upsert)"""
+    bucket = ViolationSummary.objects.filter(
+        session_id=violation.session_id,
+        reason=violation.reason,
+        hour=violation.timestamp.replace(minute=0, second=0, microsecond=0),
+    )
+    if bucket.update(count=F('count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            ViolationSummary.objects.create(
+                session_id=violation.session_id,
+                candidate_id=violation.session.candidate_id,
+                reason=violation.reason,
+                hour=violation.timestamp.replace(minute=0, second=0, microsecond=0),
+                count=1,
+            )
+    except IntegrityError:
+        # A concurrent request created the bucket first
+        bucket.update(count=F('count') + 1)
+
+
+def violation_analytics(exam_id=None, since=None, until=None, top=20):
+    summary = ViolationSummary.objects.all()
+    sessions = ExamSession.objects.all()
+    if exam_id:
+        summary = summary.filter(session__exam_id=exam_id)
+        sessions = sessions.filter(exam_id=exam_id)
+    if since:
+        summary = summary.filter(hour__gte=since)
+        sessions = sessions.filter(started_at__gte=since)
+    if until:
+        summary = summary.filter(hour__lt=until)
+        sessions = sessions.filter(started_at__lt=until)
+
+    total = Sum('count')
+    session_counts = sessions.aggregate(
+        total=Count('id'),
+        terminated=Count('id', filter=Q(terminated=True, completed=False)),
+        completed=Count('id', filter=Q(completed=True)),
+    )
+    return {
+        'total_violations': summary.aggregate(total=total)['total'] or 0,
+        'by_reason': list(summary.values('reason').annotate(count=total).order_by('-count')),
+        'by_exam': list(
+            summary.values(exam_id=F('session__exam_id'), exam_name=F('session__exam__name'))
+            .annotate(count=total).order_by('-count')
+        ),
+        'by_hour': list(summary.values('hour').annotate(count=total).order_by('hour')),
+        'by_candidate': list(summary.values('candidate_id').annotate(count=total).order_by('-count')[:top]),
+        'sessions_total': session_counts['total'],
+        'sessions_terminated': session_counts['terminated'],
+        'sessions_completed': session_counts['completed'],
+        'avg_violations_per_exam': list(
+            sessions.filter(exam__isnull=False).values('exam_id', exam_name=F('exam__name'))
+            .annotate(sessions=Count('id'), avg_violations=Avg('violations'))
+            .order_by('exam_name')
+        ),
+    }
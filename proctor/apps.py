@@ -5,19 +5,20 @@ class ProctorConfig(AppConfig):
     name = 'proctor'
 
     def ready(self):
+        # Keep the violation analytics summary in step with new violations
+        from . import signals  # noqa: F401
+
         # Pre-load models only in the main worker process, not the reloader wrapper
         import os
         if os.environ.get('RUN_MAIN') == 'true':
             print("="*60)
             print("🚀 PRE-LOADING PROCTORING MODELS...")
             try:
-                from proctor.detector import get_object_model
-                get_object_model()
-                print("✅ OBJECT DETECTION MODEL PRE-LOADED")
-                
-                from proctor.mobile_phone_detector import MobilePhoneDetector
-                MobilePhoneDetector.get_instance()
-                print("✅ MOBILE PHONE MODEL PRE-LOADED")
+                # Dev server only: gunicorn / manage.py workers load the
+                # inference stack lazily on the first analyze_frame call
+                from proctor import inference
+                inference.get_detector()
+                print("✅ OBJECT DETECTION + MOBILE PHONE MODELS PRE-LOADED")
             except Exception as e:
                 print(f"⚠️ WARNING: Model pre-loading failed: {e}")
                 print("The models will attempt to load again upon the first request.")
@@ -0,0 +1,166 @@
+# backpressure.py - SERVER-ADVISED CAPTURE RATE AND MODEL TIERS
+#
+# Each detector replica runs one frame at a time. Instead of silently dropping frames
+# when the detector is busy, every response tells the client how long to wait
+# before the next capture, derived from how many candidates share this worker
+# and what a frame currently costs. Clients then slow down smoothly under load.
+#
+# Under sustained load (deep queue or p95 latency over budget) the YOLO stages
+# step down to a lighter model tier (e.g. yolov5s -> yolov5n) and step back up
+# once load recedes: during exam-start peaks we lose some accuracy, not frames.
+# With a single configured tier (PROCTOR_MODEL_TIERS) the advised capture rate
+# is the only lever.
+import threading
+import time
+from collections import deque
+
+# Slowest capture rate ever advised (seconds between frames) - a candidate's frames may
+# legitimately be this far apart, see episodes.py
+MAX_CAPTURE_INTERVAL = 10.0
+
+
+class LoadMonitor:
+    def __init__(self, window=10.0, cost_alpha=0.2, headroom=1.25,
+                 min_interval=0.5, max_interval=MAX_CAPTURE_INTERVAL,
+                 tiers=('yolov5s',), max_queue=2, latency_budget=0.35,
+                 downgrade_dwell=2.0, upgrade_dwell=15.0, latency_samples=50):
+        self.window = window              # seconds a candidate counts as active
+        self.cost_alpha = cost_alpha      # EWMA weight of the newest frame cost
+        self.headroom = headroom          # keep the worker below 100% busy
+        self.min_interval = min_interval  # seconds
+        self.max_interval = max_interval  # seconds
+
+        # Model tiers, heaviest (most accurate) first
+        self.tiers = list(tiers)
+        self.max_queue = max_queue            # frames in flight / waiting per replica before stepping down
+        self.latency_budget = latency_budget  # seconds, p95 of the current tier
+        self.downgrade_dwell = downgrade_dwell  # min seconds on a tier before stepping down
+        self.upgrade_dwell = upgrade_dwell      # min seconds on a tier before stepping up
+
+        self.replicas = 1         # detectors serving frames in parallel (see pool.py)
+
+        self.lock = threading.Lock()
+        self.in_flight = 0        # frames inside analyze_frame (running or bounced)
+        self.waiting = 0          # frames waiting to check out a detector replica
+        self.frame_cost = None    # EWMA seconds per analysed frame
+        self.last_seen = {}       # candidate_id -> monotonic time of last frame
+        self.tier_index = 0
+        self.tier_since = time.monotonic()
+        self.tier_switches = 0
+        self.tier_cost = {}       # tier -> EWMA seconds per frame
+        self.recent_costs = {tier: deque(maxlen=latency_samples) for tier in self.tiers}
+
+    def enter(self, candidate_id):
+        with self.lock:
+            self.in_flight += 1
+            self.last_seen[candidate_id] = time.monotonic()
+
+    def wait_started(self, candidate_id):
+        with self.lock:
+            self.waiting += 1
+            self.last_seen[candidate_id] = time.monotonic()
+
+    def wait_finished(self):
+        with self.lock:
+            self.waiting = max(0, self.waiting - 1)
+
+    def queue_depth(self):
+        return self.in_flight + self.waiting
+
+    def exit(self, cost=None, tier=None):
+        """`cost` is the wall time of a real analysis; None for a bounced frame"""
+        with self.lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if cost is not None:
+                self.frame_cost = self._ewma(self.frame_cost, cost)
+                if tier in self.recent_costs:
+                    self.tier_cost[tier] = self._ewma(self.tier_cost.get(tier), cost)
+                    self.recent_costs[tier].append(cost)
+
+    def _ewma(self, average, value):
+        if average is None:
+            return value
+        return average + self.cost_alpha * (value - average)
+
+    def active_candidates(self):
+        cutoff = time.monotonic() - self.window
+        with self.lock:
+            for candidate_id in [c for c, seen in self.last_seen.items() if seen < cutoff]:
+                del self.last_seen[candidate_id]
+            return len(self.last_seen)
+
+    def advised_interval(self):
+        """Seconds each candidate should wait so the worker keeps up with all of them"""
+        active = self.active_candidates()
+        with self.lock:
+            cost = self.frame_cost or 0.0
+            demand = max(active, self.queue_depth(), 1) / self.replicas
+        interval = cost * demand * self.headroom
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def next_capture_ms(self):
+        return int(round(self.advised_interval() * 1000))
+
+    # ============ MODEL TIERS ============
+
+    def _p95(self, tier):
+        costs = sorted(self.recent_costs.get(tier, ()))
+        if not costs:
+            return None
+        return costs[min(len(costs) - 1, int(len(costs) * 0.95))]
+
+    def select_tier(self):
+        """Model tier for the next frame - steps down under load, back up once it recedes"""
+        with self.lock:
+            if len(self.tiers) == 1:
+                return self.tiers[0]
+            now = time.monotonic()
+            dwell = now - self.tier_since
+            tier = self.tiers[self.tier_index]
+            p95 = self._p95(tier)
+
+            overloaded = self.queue_depth() > self.max_queue * self.replicas or (p95 is not None and p95 > self.latency_budget)
+            if overloaded and self.tier_index < len(self.tiers) - 1 and dwell >= self.downgrade_dwell:
+                self._switch_tier(self.tier_index + 1, now, f"queue {self.queue_depth()}, p95 {self._ms(p95)}")
+            elif not overloaded and self.tier_index > 0 and dwell >= self.upgrade_dwell and self.queue_depth() <= self.replicas:
+                # Predict the heavier tier's latency from the cost ratio seen so far (assume 2x if unknown)
+                heavier = self.tiers[self.tier_index - 1]
+                ratio = 2.0
+                if self.tier_cost.get(heavier) and self.tier_cost.get(tier):
+                    ratio = self.tier_cost[heavier] / self.tier_cost[tier]
+                if p95 is not None and p95 * ratio < self.latency_budget * 0.8:
+                    self._switch_tier(self.tier_index - 1, now, f"predicted p95 {self._ms(p95 * ratio)}")
+            return self.tiers[self.tier_index]
+
+    def _switch_tier(self, index, now, reason):
+        print(f"🔀 Model tier {self.tiers[self.tier_index]} -> {self.tiers[index]} ({reason})")
+        self.tier_index = index
+        self.tier_since = now
+        self.tier_switches += 1
+        # Samples from an earlier stay on this tier belong to a different load level
+        self.recent_costs[self.tiers[index]].clear()
+
+    @staticmethod
+    def _ms(seconds):
+        return f"{seconds * 1000:.0f}ms" if seconds is not None else "n/a"
+
+    def snapshot(self):
+        """Worker load and tier state for the metrics endpoint"""
+        active = self.active_candidates()
+        next_capture_ms = self.next_capture_ms()
+        with self.lock:
+            tier = self.tiers[self.tier_index]
+            p95 = self._p95(tier)
+            return {
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'replicas': self.replicas,
+                'active_candidates': active,
+                'frame_cost_ms': round(self.frame_cost * 1000, 2) if self.frame_cost is not None else None,
+                'p95_ms': round(p95 * 1000, 2) if p95 is not None else None,
+                'next_capture_ms': next_capture_ms,
+                'model_tier': tier,
+                'model_tiers': list(self.tiers),
+                'tier_switches': self.tier_switches,
+                'tier_cost_ms': {t: round(c * 1000, 2) for t, c in self.tier_cost.items()},
+            }
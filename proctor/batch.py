@@ -0,0 +1,116 @@
+# batch.py - OFFLINE BATCH RE-ANALYSIS OF STORED EVIDENCE
+#
+# Runs inside ProcessPoolExecutor workers started by `manage.py rescore_screenshots`.
+# Kept free of heavy top-level imports: the parent process only pickles
+# references to these functions, each worker loads OpenCV / Torch itself.
+import os
+
+_worker = None
+
+
+def init_worker(torch_threads=1):
+    """Process initializer: set up Django and load the detectors once per worker"""
+    global _worker
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camera_demo_backend.settings')
+    import django
+    django.setup()
+
+    import cv2
+    import torch
+    # One process per core - keep each worker single-threaded to avoid oversubscription
+    torch.set_num_threads(torch_threads)
+    cv2.setNumThreads(1)
+
+    _worker = BatchDetector()
+
+
+def rescore_chunk(rows, batch_size=16):
+    """
+    rows: list of (screenshot_id, data_url). Returns a list of dicts with the
+    fields of ScreenshotRescore (minus run_label) - one per input row.
+    """
+    results = []
+    for start in range(0, len(rows), batch_size):
+        results.extend(_worker.rescore(rows[start:start + batch_size]))
+    return results
+
+
+class BatchDetector:
+    """
+    Stateless, batched version of ProctorDetector's detection stage. Uses the
+    same networks and thresholds as the live path but none of the trackers,
+    locks or wall-clock grace periods.
+    """
+
+    def __init__(self):
+        from .detector import ProctorDetector, model_tiers
+        # Offline audits always use the most accurate tier
+        detector = ProctorDetector(tiers=model_tiers()[:1])
+        self.face_net = detector.face_net if detector.use_dnn_face else None
+        self.object_model = detector.object_model
+        self.phone_detector = detector.mobile_phone_detector
+        self.phone_model = detector.mobile_phone_detector.model
+        self.prohibited_items = detector.prohibited_items
+        self.required_side = detector.preprocessor.required_side
+
+    def rescore(self, rows):
+        import base64
+        import cv2
+        import numpy as np
+        from .inference import jpeg_size, pick_decode_flag
+
+        frames, factors, out = [], [], []
+        for screenshot_id, image in rows:
+            record = {'screenshot_id': screenshot_id, 'face_count': 0, 'phone_count': 0,
+                      'phone_confidence': None, 'prohibited_objects': '', 'error': ''}
+            try:
+                data = base64.b64decode(image.split(';base64,', 1)[-1])
+                size = jpeg_size(data)
+                flag, factor = pick_decode_flag(size, self.required_side)
+                frame = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+                if frame is None:
+                    raise ValueError('Failed to decode image')
+            except Exception as e:
+                record['error'] = str(e)[:255]
+                out.append(record)
+                continue
+            frames.append(frame)
+            factors.append(factor)
+            out.append(record)
+
+        if not frames:
+            return out
+        decoded = [r for r in out if not r['error']]
+
+        # Faces: one blob for the whole batch, column 0 of each detection is the image index
+        if self.face_net is not None:
+            blob = cv2.dnn.blobFromImages(frames, 1.0, (300, 300), [104, 117, 123], False, False)
+            self.face_net.setInput(blob)
+            detections = self.face_net.forward()[0, 0]
+            confident = detections[detections[:, 2] > 0.65]
+            for image_index in confident[:, 0].astype(int):
+                decoded[image_index]['face_count'] += 1
+
+        # YOLO: AutoShape batches a list of RGB images into one forward pass
+        rgb = [f[..., ::-1] for f in frames]
+        if self.phone_model is not None:
+            for record, frame, factor, det in zip(decoded, frames, factors, self.phone_model(rgb).xyxy):
+                # Same size / aspect ratio / confidence filters as the live phone detector, in source pixels
+                frame_shape = (frame.shape[0] * factor, frame.shape[1] * factor)
+                confidences = [
+                    float(conf) for *box, conf, cls in det.cpu().numpy()
+                    if int(cls) in (67, 77)
+                    and self.phone_detector.plausible_phone(*(int(v * factor) for v in box), conf, frame_shape)[0]
+                ]
+                record['phone_count'] = len(confidences)
+                if confidences:
+                    record['phone_confidence'] = round(max(confidences), 3)
+        if self.object_model is not None:
+            for record, det in zip(decoded, self.object_model(rgb).xyxy):
+                names = []
+                for cls in det[:, 5].cpu().numpy().astype(int):
+                    item = self.prohibited_items.get(int(cls))
+                    if item and item['priority'] > 1 and item['name'] not in names:
+                        names.append(item['name'])
+                record['prohibited_objects'] = ','.join(names)[:255]
+        return out
@@ -0,0 +1,85 @@
+# deadlines.py - CAPTURE TIMESTAMPS AND FRAME DEADLINES
+#
+# Clients send `captured_at` with every frame (epoch milliseconds, as from
+# Date.now(), or an ISO 8601 string). Client clocks can't be trusted to match
+# ours, so each candidate's capture times are mapped onto the server clock
+# using the smallest (arrival - capture) gap seen recently: the fastest
+# delivery stands in for "no queueing". A frame's age is then the time it has
+# spent beyond that best case - in the browser, on the network, in our queue.
+#
+# Frames older than PROCTOR_FRAME_MAX_AGE_MS are answered with the last real
+# result without being decoded or analysed, and trackers / grace periods run
+# on capture time, so a frame that sat in a queue can't stretch a countdown.
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+
+def max_age():
+    """Seconds a frame may age before it is dropped"""
+    return getattr(settings, 'PROCTOR_FRAME_MAX_AGE_MS', 2000) / 1000.0
+
+
+def parse_captured_at(value):
+    """Epoch seconds from epoch milliseconds or an ISO 8601 timestamp; None if missing / invalid"""
+    if value in (None, ''):
+        return None
+    try:
+        return float(value) / 1000.0
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = parse_datetime(str(value))
+    except ValueError:
+        return None
+    if parsed is None or parsed.tzinfo is None:
+        return None
+    return parsed.timestamp()
+
+
+class CaptureClock:
+    def __init__(self, samples=30, idle_after=600.0):
+        self.samples = samples        # recent (arrival - capture) gaps kept per candidate
+        self.idle_after = idle_after  # seconds before a silent candidate's offsets are forgotten
+        self.lock = threading.Lock()
+        self.offsets = {}             # candidate_id -> deque of gaps (seconds)
+        self.last_seen = {}
+        self.calls = 0
+
+    def server_time(self, candidate_id, captured_at, arrival=None):
+        """Capture time of a frame on the server clock (arrival time when the client sent none)"""
+        arrival = time.time() if arrival is None else arrival
+        if captured_at is None:
+            return arrival
+        with self.lock:
+            gaps = self.offsets.get(candidate_id)
+            if gaps is None:
+                gaps = self.offsets[candidate_id] = deque(maxlen=self.samples)
+            gaps.append(arrival - captured_at)
+            self.last_seen[candidate_id] = arrival
+            offset = min(gaps)
+            self.calls += 1
+            if self.calls % 1000 == 0:
+                self._forget_idle(arrival)
+        return min(arrival, captured_at + offset)
+
+    def _forget_idle(self, now):
+        for candidate_id in [c for c, seen in self.last_seen.items() if now - seen > self.idle_after]:
+            del self.offsets[candidate_id]
+            del self.last_seen[candidate_id]
+
+
+capture_clock = CaptureClock()
+
+
+def frame_deadline(candidate_id, raw_captured_at):
+    """(capture time on the server clock, deadline) for an incoming frame"""
+    captured_at = capture_clock.server_time(candidate_id, parse_captured_at(raw_captured_at))
+    return captured_at, captured_at + max_age()
+
+
+def expired(deadline, now=None):
+    return deadline is not None and (time.time() if now is None else now) > deadline
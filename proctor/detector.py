@@ -1,33 +1,68 @@
+import copy
 import cv2
 import numpy as np
 import torch
 import time
-from collections import deque, defaultdict
+from collections import defaultdict
 import threading
 import os
 from .mobile_phone_detector import MobilePhoneDetector
+from .preprocessing import FramePreprocessor, yolo_detect, hash_distance, share_weights
+from .motion import MotionModel
+from .backpressure import LoadMonitor
+from .stages import StageExecutor
+from .state import get_state_store
 
 
 # ============ GLOBAL OBJECT MODEL CACHE ============
-_OBJECT_MODEL = None
+# One model per tier - { 'yolov5s': model, 'yolov5n': model }
+_OBJECT_MODELS = {}
 _OBJECT_MODEL_LOCK = threading.Lock()
 
-def get_object_model(device='cpu'):
-    global _OBJECT_MODEL
-    if _OBJECT_MODEL is None:
+def idle_after():
+    """Seconds without a frame before a candidate's worker-local caches are dropped"""
+    from django.conf import settings
+    return getattr(settings, 'PROCTOR_STATE_TTL', 300)
+
+def model_tiers():
+    """YOLO model tiers, heaviest first - lighter tiers are used under load"""
+    from django.conf import settings
+    return list(getattr(settings, 'PROCTOR_MODEL_TIERS', None) or ['yolov5s'])
+
+def face_net_files():
+    """(prototxt, caffemodel) of the face net, in the backend root directory"""
+    from django.conf import settings
+    return (os.path.join(settings.BASE_DIR, 'deploy.prototxt'),
+            os.path.join(settings.BASE_DIR, 'res10_300x300_ssd_iter_140000.caffemodel'))
+
+def face_boxes(detections, width, height, min_confidence=0.65):
+    """Caffe face net output -> [(x, y, w, h, conf)] in source pixels"""
+    faces = []
+    for i in range(detections.shape[2]):
+        confidence = detections[0, 0, i, 2]
+        # Set to 0.65 for strict proctoring (less ghost detection)
+        if confidence > min_confidence:
+            # Normalized box -> source frame pixels
+            x1, y1, x2, y2 = detections[0, 0, i, 3:7] * (width, height, width, height)
+            faces.append((int(x1), int(y1), int(x2 - x1), int(y2 - y1), float(confidence)))
+    return faces
+
+def get_object_model(device='cpu', tier='yolov5s'):
+    if tier not in _OBJECT_MODELS:
         with _OBJECT_MODEL_LOCK:
-            if _OBJECT_MODEL is None:
+            if tier not in _OBJECT_MODELS:
                 print("="*60)
-                print(f"⏳ LOADING OBJECT DETECTION MODEL on {device} (this happens once)...")
+                print(f"⏳ LOADING OBJECT DETECTION MODEL {tier} on {device} (this happens once)...")
                 print("="*60)
+                model = None
                 
                 import os
                 current_dir = os.path.dirname(os.path.abspath(__file__))
                 backend_dir = os.path.dirname(current_dir)
                 possible_weights = [
-                    os.path.join(current_dir, 'yolov5s.pt'),
-                    os.path.join(backend_dir, 'yolov5s.pt'),
-                    'yolov5s.pt'
+                    os.path.join(current_dir, f'{tier}.pt'),
+                    os.path.join(backend_dir, f'{tier}.pt'),
+                    f'{tier}.pt'
                 ]
                 
                 weights_path = None
@@ -39,43 +74,48 @@ def get_object_model(device='cpu'):
                 try:
                     if weights_path:
                         print(f"Found local weights for Object Detection at {weights_path}, loading...")
-                        _OBJECT_MODEL = torch.hub.load('ultralytics/yolov5', 'custom', path=weights_path, verbose=False, _verbose=False)
+                        model = torch.hub.load('ultralytics/yolov5', 'custom', path=weights_path, verbose=False, _verbose=False)
                     else:
                         print("Local weights not found, downloading from hub...")
-                        _OBJECT_MODEL = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True, verbose=False, _verbose=False)
+                        model = torch.hub.load('ultralytics/yolov5', tier, pretrained=True, verbose=False, _verbose=False)
                     
-                    _OBJECT_MODEL.conf = 0.4
-                    _OBJECT_MODEL.iou = 0.45
+                    model.conf = 0.4
+                    model.iou = 0.45
                     # COCO classes: 0=person, 67=cell phone, 73=laptop, 74=book, 77=cell phone, 84=book
-                    _OBJECT_MODEL.classes = [0, 67, 73, 74, 77, 84, 62, 72, 66, 64]
-                    _OBJECT_MODEL.to(device)
-                    _OBJECT_MODEL.eval()
-                    print("✅ OBJECT DETECTION MODEL LOADED SUCCESSFULLY!")
+                    model.classes = [0, 67, 73, 74, 77, 84, 62, 72, 66, 64]
+                    model.to(device)
+                    model.eval()
+                    print(f"✅ OBJECT DETECTION MODEL {tier} LOADED SUCCESSFULLY!")
                 except Exception as e:
-                    print(f"Error loading YOLOv5: {e}")
+                    print(f"Error loading YOLOv5 ({tier}): {e}")
                     import traceback
                     traceback.print_exc()
-                    _OBJECT_MODEL = None
-    return _OBJECT_MODEL
+                    model = None
+                _OBJECT_MODELS[tier] = model
+    return _OBJECT_MODELS[tier]
 
 class ProctorDetector:
-    def __init__(self, device='cpu'):
+    def __init__(self, device='cpu', stage_threads=1, torch_threads=None, clock=time.time, tiers=None,
+                 state_store=None):
         self.device = device
+        # Wall clock for trackers and grace periods - injectable for replaying frame sequences
+        self.clock = clock
         self.frame_count = 0
         self.stable_frames_required = 5
 
-        # Load YOLOv5 for object detection
-        self.object_model = get_object_model(device)
+        # Load YOLOv5 for object detection - one model per tier, tiers that fail to load are dropped
+        tiers = tiers or model_tiers()
+        self.object_models = {tier: get_object_model(device, tier) for tier in tiers}
+        self.tiers = [tier for tier in tiers if self.object_models[tier] is not None] or tiers[:1]
+        if len(self.tiers) == 1:
+            print(f"⚠️ Only model tier {self.tiers[0]} available - no lighter model to fall back to under load")
+        self.object_model = self.object_models[self.tiers[0]]
 
         
         # Face detection
-        import os
-        from django.conf import settings
-        
-        # Construct absolute paths to model files in the backend root directory
-        model_file = os.path.join(settings.BASE_DIR, 'res10_300x300_ssd_iter_140000.caffemodel')
-        config_file = os.path.join(settings.BASE_DIR, 'deploy.prototxt')
+        config_file, model_file = face_net_files()
         
+        self.face_net_files = (config_file, model_file)
         if os.path.exists(model_file) and os.path.exists(config_file):
             print(f"Loading FaceNet (Caffe) from {model_file}...")
             self.face_net = cv2.dnn.readNetFromCaffe(config_file, model_file)
@@ -85,15 +125,20 @@ class ProctorDetector:
             self.use_dnn_face = False
             self.face_net = None
         
-        self.prev_gray = None
-        self.movement_history = deque(maxlen=10)
+        # Running-average background per candidate - keyed by candidate_id
+        self.motion_models = defaultdict(MotionModel)
         
-        # Buffering for stable violations - keyed by candidate_id
+        # Face buffers, object and phone trackers per candidate - read and written back
+        # once per analysed frame, so any worker can serve any candidate (see state.py)
+        self.state_store = state_store or get_state_store()
+        # Face buffers as of this process's latest frame per candidate - only used for scheduling
         # { 'candidate_id': {'no_face': 0, 'multiple_faces': 0} }
-        self.buffers = defaultdict(lambda: {'no_face': 0, 'multiple_faces': 0})
+        self.buffers = {}
         
         self.frame_skip = 1
-        self.resize_dim = (416, 416)
+        self.resize_dim = (160, 120)  # movement scoring resolution
+        # Per-worker buffers: face blob, motion gray and YOLO letterbox built once per frame
+        self.preprocessor = FramePreprocessor(face_size=(300, 300), motion_size=self.resize_dim)
         
         self.prohibited_items = {
             73: {'name': '💻 Laptop', 'priority': 2, 'grace_period': 5},
@@ -107,37 +152,70 @@ class ProctorDetector:
             67: {'name': 'Mobile Phone', 'priority': 1, 'grace_period': 3}, # Re-adding for redundancy if needed, but primary check is specialized
         }
         
-        self.object_tracker = defaultdict(lambda: {
-            'first_seen': 0,
-            'last_seen': 0,
-            'confidence_scores': [],
-            'violation_logged': False,
-            'correction_start_time': None,
-            'grace_remaining': 0
-        })
+        self.max_confidence_scores = 5  # per tracked object
         
         self.current_violations = []
         self.correction_timer = {}
 
-        self.mobile_phone_detector = MobilePhoneDetector(device=device)
+        # Perceptual-hash result cache - keyed by candidate_id
+        # { 'candidate_id': {'phash': int, 'faces': [...], 'phones': ndarray, 'objects': ndarray, 'analyzed_at': float} }
+        # Near-identical frames reuse the cached detections; trackers still advance
+        self.detection_cache = {}
+        self.hash_distance_threshold = 4      # bits out of 64
+        self.force_full_analysis_interval = 5  # seconds
+
+        self.mobile_phone_detector = MobilePhoneDetector(device=device, clock=clock, tiers=self.tiers)
+
+        # Last real result per candidate - served (with its age) while the detector is busy
+        # { 'candidate_id': (result, analyzed_at) }
+        self.last_results = {}
+        self.load_monitor = LoadMonitor(tiers=self.tiers)
+
+        # Face / phone / object networks run side by side when stage_threads > 1
+        self.stages = StageExecutor(stage_threads, torch_threads=torch_threads)
+        
+        # Per-candidate caches above (motion models, detection cache, last results,
+        # buffers) are dropped once a candidate sends nothing for idle_after seconds
+        self.idle_after = idle_after()
+        self.calls = 0
         
         self.lock = threading.Lock()
+
+    def replica(self):
+        """
+        Another detector for concurrent inference (see pool.py). Shares the torch
+        weights, state store, per-candidate caches and load monitor with this one;
+        rebuilds what can't be used from two threads at once - the Caffe net,
+        preprocessing buffers, stage threads and the replica lock.
+        """
+        clone = copy.copy(self)
+        if self.use_dnn_face:
+            clone.face_net = cv2.dnn.readNetFromCaffe(*self.face_net_files)
+        clone.object_models = {tier: share_weights(model) for tier, model in self.object_models.items()}
+        clone.object_model = clone.object_models[self.tiers[0]]
+        if self.mobile_phone_detector:
+            clone.mobile_phone_detector = self.mobile_phone_detector.replica()
+        clone.preprocessor = FramePreprocessor(
+            face_size=self.preprocessor.face_size,
+            motion_size=self.preprocessor.motion_size,
+            yolo_size=self.preprocessor.yolo_size,
+            yolo_stride=self.preprocessor.yolo_stride,
+        )
+        clone.stages = StageExecutor(self.stages.max_workers, torch_threads=self.stages.torch_threads)
+        clone.lock = threading.Lock()
+        return clone
         
-    def analyze_frame(self, frame, candidate_id='guest_user'):
+    def analyze_frame(self, frame, candidate_id='guest_user', scale=1, captured_at=None):
+        """`captured_at`: when the frame was taken (server clock) - trackers run on it instead of analysis time"""
+        self.load_monitor.enter(candidate_id)
         if not self.lock.acquire(blocking=False):
-            # PROCTORING NEUTRAL: If busy, don't trigger violations
-            return {
-                "face_detected": True,
-                "multiple_faces": False,
-                "heavy_movement": False,
-                "object_detected": False,
-                "mobile_phone_detected": False,
-                "processing_time": 0,
-                "skipped": True
-            }
+            self.load_monitor.exit()
+            return self._busy_result(candidate_id)
             
-        start_time = time.time()
-        current_time = start_time
+        start_time = time.perf_counter()
+        current_time = self.clock() if captured_at is None else captured_at
+        tier = None
+        state = None
         # Initialize results
         result = {
             "face_count": 0,
@@ -157,44 +235,60 @@ class ProctorDetector:
         
         try:
             try:
-                frame_resized = cv2.resize(frame, self.resize_dim)
+                prepared = self.preprocessor.prepare(frame, scale=scale)
             except Exception:
+                result["next_capture_ms"] = self.load_monitor.next_capture_ms()
                 return result
-                
-            h, w = frame_resized.shape[:2]
-        
-            faces = []
-            if self.use_dnn_face and self.face_net:
-                try:
-                    blob = cv2.dnn.blobFromImage(frame_resized, 1.0, (300, 300), 
-                                                [104, 117, 123], False, False)
-                    self.face_net.setInput(blob)
-                    detections = self.face_net.forward()
-                    
-                    for i in range(detections.shape[2]):
-                        confidence = detections[0, 0, i, 2]
-                        # Set to 0.65 for strict proctoring (less ghost detection)
-                        if confidence > 0.65:
-                            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                            x1, y1, x2, y2 = box.astype(int)
-                            
-                            scale_x = frame.shape[1] / self.resize_dim[0]
-                            scale_y = frame.shape[0] / self.resize_dim[1]
-                            
-                            faces.append((
-                                int(x1 * scale_x),
-                                int(y1 * scale_y),
-                                int((x2 - x1) * scale_x),
-                                int((y2 - y1) * scale_y),
-                                float(confidence)
-                            ))
-                except Exception as e:
-                    print(f"Face Detection Error: {e}")
 
+            tier = self.load_monitor.select_tier()
+            run_objects = self.object_model is not None and self.frame_count > self.stable_frames_required
+            cached = self.detection_cache.get(candidate_id)
+            reuse = (
+                cached is not None and
+                (cached['objects'] is not None or not run_objects) and
+                current_time - cached['analyzed_at'] < self.force_full_analysis_interval and
+                hash_distance(prepared.phash, cached['phash']) <= self.hash_distance_threshold
+            )
+
+            if reuse:
+                # Unchanged frame: skip all three networks, only advance trackers
+                faces = cached['faces']
+                phone_detections = cached['phones']
+                object_detections = cached['objects'] if run_objects else None
+                result["model_tier"] = cached['tier']
+                result["cached"] = True
+                tier = None  # no model ran - keep this frame out of the tier latency stats
+            else:
+                self.preprocessor.prepare_inference(prepared)
+                stages = {'faces': lambda: self._detect_faces(prepared)}
+                if self.mobile_phone_detector:
+                    stages['phones'] = lambda: self.mobile_phone_detector.infer(frame, prepared, tier=tier)
+                if run_objects:
+                    stages['objects'] = lambda: self._detect_objects(prepared, tier)
+                outputs = self.stages.run(stages)
+                faces = outputs['faces']
+                phone_detections = outputs.get('phones')
+                object_detections = outputs.get('objects')
+                self.detection_cache[candidate_id] = {
+                    'phash': prepared.phash,
+                    'faces': faces,
+                    'phones': phone_detections,
+                    'objects': object_detections,
+                    'tier': tier,
+                    'analyzed_at': current_time
+                }
+                result["model_tier"] = tier
+
+            # Buffers and trackers live in the state store - locked for this candidate until written back
+            state = self.state_store.acquire(candidate_id)
+            if state['clock'] is not None and current_time < state['clock']:
+                # Overtook a newer frame on another replica / worker - never run a candidate's timers backwards
+                current_time = state['clock']
+            state['clock'] = current_time
             result["face_count"] = len(faces)
             
             # --- Buffer Logic for Stable Results (Candidate Isolated) ---
-            buffer = self.buffers[candidate_id]
+            buffer = state['buffers']
             
             if len(faces) == 0:
                 buffer['no_face'] += 1
@@ -230,29 +324,20 @@ class ProctorDetector:
             # --- FRAME STATUS LOG ---
             status_line = f"[Frame {self.frame_count}] Faces: {len(faces)} | Buffer: (NF:{buffer['no_face']}, MF:{buffer['multiple_faces']})"
             
-            gray = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2GRAY)
-            gray = cv2.GaussianBlur(gray, (5, 5), 0)
-            
-            if self.prev_gray is not None and self.frame_count > self.stable_frames_required:
-                diff = cv2.absdiff(self.prev_gray, gray)
-                _, thresh = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
-                movement = (np.count_nonzero(thresh) / thresh.size) * 100
+            movement, heavy_movement = self.motion_models[candidate_id].update(prepared.motion_gray)
+            if movement is not None:
                 result["movement_score"] = float(round(movement, 2))
+                result["heavy_movement"] = bool(heavy_movement)
                 status_line += f" | Movement: {result['movement_score']}%"
-                self.movement_history.append(movement)
-                
-                if len(self.movement_history) > 5:
-                    avg_movement = np.mean(self.movement_history)
-                    result["heavy_movement"] = bool(movement > max(35, avg_movement * 1.8))
-                    if result["heavy_movement"]:
-                        status_line += " [!] HEAVY MOVEMENT"
+                if heavy_movement:
+                    status_line += " [!] HEAVY MOVEMENT"
             
             print(status_line)
-            
-            self.prev_gray = gray.copy()
 
             if self.mobile_phone_detector:
-                mobile_phones = self.mobile_phone_detector.detect_phones(frame, candidate_id=candidate_id)
+                mobile_phones = self.mobile_phone_detector.detect_phones(frame, candidate_id=candidate_id, prepared=prepared,
+                                                                          detections=phone_detections, current_time=current_time,
+                                                                          phone_tracker=state['phones'])
                 if mobile_phones:
                     result["mobile_phone_detected"] = True
                     result["mobile_phone_count"] = len(mobile_phones)
@@ -278,14 +363,13 @@ class ProctorDetector:
                             "confidence": phone_violation['confidence']
                         })
             
-            if self.object_model and self.frame_count > self.stable_frames_required:
+            if object_detections is not None:
                 try:
-                    results = self.object_model(frame)
-                    
                     objects_detected = []
                     current_object_ids = set()
+                    object_tracker = state['objects']
                     
-                    for *box, conf, cls in results.xyxy[0].cpu().numpy():
+                    for *box, conf, cls in object_detections:
                         cls_id = int(cls)
                         
                         if cls_id in self.prohibited_items:
@@ -297,19 +381,27 @@ class ProctorDetector:
                             obj_id = f"{cls_id}_{x1}_{y1}_{x2}_{y2}"
                             current_object_ids.add(obj_id)
                             
-                            if obj_id not in self.object_tracker:
-                                self.object_tracker[obj_id]['first_seen'] = current_time
-                                self.object_tracker[obj_id]['grace_remaining'] = item_info['grace_period']
+                            if obj_id not in object_tracker:
+                                object_tracker[obj_id] = {
+                                    'first_seen': current_time,
+                                    'last_seen': current_time,
+                                    'confidence_scores': [],
+                                    'violation_logged': False,
+                                    'correction_start_time': None,
+                                    'grace_remaining': item_info['grace_period']
+                                }
                             
-                            self.object_tracker[obj_id]['last_seen'] = current_time
-                            self.object_tracker[obj_id]['confidence_scores'].append(float(conf))
+                            object_tracker[obj_id]['last_seen'] = current_time
+                            scores = object_tracker[obj_id]['confidence_scores']
+                            scores.append(float(conf))
+                            del scores[:-self.max_confidence_scores]
                             
-                            time_visible = current_time - self.object_tracker[obj_id]['first_seen']
+                            time_visible = current_time - object_tracker[obj_id]['first_seen']
                             
                             violation_triggered = False
                             grace_remaining = None
                             
-                            if not self.object_tracker[obj_id]['violation_logged']:
+                            if not object_tracker[obj_id]['violation_logged']:
                                 if item_info['priority'] == 1:  # Mobile phones - immediate (handled by separate detector now)
                                     pass 
                                 elif item_info['priority'] == 2:  # Books/Laptops
@@ -321,8 +413,8 @@ class ProctorDetector:
                                         violation_triggered = True
                                         grace_remaining = 3  # 3 seconds to correct
                             
-                            if self.object_tracker[obj_id]['correction_start_time']:
-                                elapsed = current_time - self.object_tracker[obj_id]['correction_start_time']
+                            if object_tracker[obj_id]['correction_start_time']:
+                                elapsed = current_time - object_tracker[obj_id]['correction_start_time']
                                 grace_remaining = max(0, item_info['grace_period'] - elapsed)
                             
                             object_detail = {
@@ -356,18 +448,18 @@ class ProctorDetector:
                                     "near_face": bool(near_face)
                                 })
                                 
-                                self.object_tracker[obj_id]['violation_logged'] = True
+                                object_tracker[obj_id]['violation_logged'] = True
                                 
-                                if not self.object_tracker[obj_id]['correction_start_time']:
-                                    self.object_tracker[obj_id]['correction_start_time'] = current_time
+                                if not object_tracker[obj_id]['correction_start_time']:
+                                    object_tracker[obj_id]['correction_start_time'] = current_time
                     
                     objects_to_remove = []
-                    for obj_id, track_info in self.object_tracker.items():
+                    for obj_id, track_info in object_tracker.items():
                         if current_time - track_info['last_seen'] > 2.0:
                             objects_to_remove.append(obj_id)
                     
                     for obj_id in objects_to_remove:
-                        del self.object_tracker[obj_id]
+                        del object_tracker[obj_id]
                     
                     # Update result
                     if objects_detected:
@@ -379,13 +471,87 @@ class ProctorDetector:
                     import traceback
                     traceback.print_exc()
             
+            self.buffers[candidate_id] = dict(buffer)
             self.frame_count += 1
-            result["processing_time"] = round((time.time() - start_time) * 1000, 2)
+            result["processing_time"] = round((time.perf_counter() - start_time) * 1000, 2)
+            self.last_results[candidate_id] = (result, current_time)
+            result["next_capture_ms"] = self.load_monitor.next_capture_ms()
+            self.calls += 1
+            if self.calls % 1000 == 0:
+                self._forget_idle(current_time)
             
             return result
         finally:
+            if state is not None:
+                self.state_store.release(candidate_id, state)
+            self.load_monitor.exit(time.perf_counter() - start_time, tier=tier)
             self.lock.release()
+
+    def _forget_idle(self, now):
+        """Drop caches of candidates whose last analysed frame is older than idle_after (exam over)"""
+        caches = (self.motion_models, self.detection_cache, self.last_results, self.buffers)
+        known = set().union(*(list(cache) for cache in caches))
+        idle = [c for c in known if now - self.last_results.get(c, (None, float('-inf')))[1] > self.idle_after]
+        for candidate_id in idle:
+            for cache in caches:
+                cache.pop(candidate_id, None)
+        if idle:
+            print(f"🧹 Dropped cached state of {len(idle)} idle candidate(s)")
+
+    def needs_attention(self, candidate_id):
+        """Mid-countdown: a phone / object grace period running or a face buffer one frame from triggering"""
+        buffer = self.buffers.get(candidate_id)
+        if buffer and (0 < buffer['no_face'] < 2 or 0 < buffer['multiple_faces'] < 2):
+            return True
+        last = self.last_results.get(candidate_id)
+        if last is None:
+            return False
+        result = last[0]
+        return bool(result.get('phone_warnings') or result.get('grace_remaining') or result.get('correction_time_remaining'))
+
+    def _busy_result(self, candidate_id):
+        """Detector busy: repeat the candidate's last real result instead of guessing"""
+        last = self.last_results.get(candidate_id)
+        if last is None:
+            # PROCTORING NEUTRAL: nothing analysed yet, don't trigger violations
+            result = {
+                "face_detected": True,
+                "multiple_faces": False,
+                "heavy_movement": False,
+                "object_detected": False,
+                "mobile_phone_detected": False,
+            }
+        else:
+            previous, analyzed_at = last
+            result = dict(previous)
+            result["result_age_ms"] = int(round((self.clock() - analyzed_at) * 1000))
+        result["processing_time"] = 0
+        result["skipped"] = True
+        result["next_capture_ms"] = self.load_monitor.next_capture_ms()
+        return result
     
+    def _detect_faces(self, prepared):
+        """Run the Caffe face net on the prepared blob - (x, y, w, h, conf) in source pixels"""
+        faces = []
+        if not (self.use_dnn_face and self.face_net):
+            return faces
+        try:
+            self.face_net.setInput(prepared.face_blob)
+            faces = face_boxes(self.face_net.forward(), prepared.width, prepared.height)
+        except Exception as e:
+            print(f"Face Detection Error: {e}")
+        return faces
+
+    def _detect_objects(self, prepared, tier=None):
+        """Raw prohibited-object detections (N, 6) in source pixels, None on failure"""
+        try:
+            return yolo_detect(self.object_models.get(tier) or self.object_model, prepared)
+        except Exception as e:
+            print(f"YOLO Object Detection Error: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+
     def _is_near_face(self, obj_bbox, faces):
         """Check if object is near face (within 1.5x face width)"""
         ox, oy, ow, oh = obj_bbox
@@ -429,11 +595,13 @@ class ProctorDetector:
         return False
     
     def reset(self):
-        self.prev_gray = None
         self.frame_count = 0
-        self.movement_history.clear()
-        self.object_tracker.clear()
+        self.motion_models.clear()
+        self.buffers.clear()
+        self.state_store.clear()
         self.current_violations.clear()
         self.correction_timer.clear()
+        self.detection_cache.clear()
+        self.last_results.clear()
         if self.mobile_phone_detector:
             self.mobile_phone_detector.reset()
\ No newline at end of file
@@ -0,0 +1,116 @@
+# episodes.py - VIOLATION EPISODES
+#
+# A candidate out of frame for 30 seconds is one violation, not one per
+# analysed frame. Each (session, reason) has at most one open episode - a
+# Violation row with ended_at NULL:
+#   - the frame that opens it writes the Violation row and its one Screenshot
+#     and counts towards session.violations
+#   - later frames with the same finding only extend it (last_seen_at, frame_count)
+#   - frames answered without analysis (busy, stale) keep it alive (last_seen_at)
+#   - it ends on the first analysed frame without the finding, or once no frame
+#     at all has arrived for episode_gap() seconds
+#
+# The open rows are the only record of which episodes are open, so every worker
+# sees the same episodes. Frames with something to record lock the session row
+# first: concurrent frames of one candidate on different workers apply one after
+# the other instead of each opening its own episode. A clean frame with nothing
+# open costs one lookup on the partial index of open episodes.
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .backpressure import MAX_CAPTURE_INTERVAL
+from .models import ExamSession, Screenshot, Violation
+
+
+def episode_gap():
+    """Seconds without any frame after which an episode ends - longer than the slowest advised capture rate"""
+    configured = getattr(settings, 'PROCTOR_EPISODE_GAP_S', 0)
+    if configured:
+        return configured
+    max_age = getattr(settings, 'PROCTOR_FRAME_MAX_AGE_MS', 2000) / 1000.0
+    return MAX_CAPTURE_INTERVAL + max_age + 5.0
+
+
+def _open_rows(session_id):
+    return Violation.objects.filter(session_id=session_id, ended_at__isnull=True)
+
+
+def frame_findings(result):
+    """Violation reason -> screenshot label for what one analysed frame shows"""
+    findings = {}
+
+    # 1. Mobile Phone (High Priority) - only once the grace period turned it into a violation
+    if result.get('mobile_phone_detected'):
+        if result.get('object_violation') and result.get('violation_type') == 'Mobile Phone':
+            details = "Mobile Phone Detected"
+            if result.get('mobile_phone_details'):
+                part = result['mobile_phone_details'][0].get('phone_part', 'Mobile Phone')
+                details = f"Mobile Phone Detected: {part}"
+            findings[details] = "Mobile Phone"
+
+    # 2. Multiple faces detected
+    if result.get('multiple_faces'):
+        findings["Multiple faces detected"] = "Multiple Faces"
+
+    # 3. Face is not visible (Strict independent check)
+    if not result.get('face_detected'):
+        findings["Face is not visible"] = "No Face Detected"
+
+    # 4. Other Prohibited Objects
+    if result.get('object_violation') and result.get('violation_type') != 'Mobile Phone':
+        v_type = result.get('violation_type', 'Prohibited Object')
+        findings[f"Prohibited Object: {v_type}"] = f"Object: {v_type}"
+    return findings
+
+
+def record_frame(session, findings, image_data, now=None):
+    """
+    Advance the session's episodes with one analysed frame. `findings` maps
+    violation reason -> screenshot label for what this frame shows. Returns
+    the reasons whose episode opened on this frame - the new violations.
+    """
+    if not findings and not _open_rows(session.id).exists():
+        return []  # the common case - nothing to record, nothing to end
+
+    now = timezone.now() if now is None else now
+    cutoff = now - timedelta(seconds=episode_gap())
+    opened = []
+    with transaction.atomic():
+        # One candidate's frames apply one at a time, whichever worker analysed them
+        ExamSession.objects.select_for_update().filter(id=session.id).first()
+        episodes = {reason: (violation_id, last_seen_at) for violation_id, reason, last_seen_at
+                    in _open_rows(session.id).values_list('id', 'reason', 'last_seen_at')}
+
+        ended = [violation_id for reason, (violation_id, last_seen_at) in episodes.items()
+                 if reason not in findings or last_seen_at is None or last_seen_at < cutoff]
+        if ended:
+            Violation.objects.filter(id__in=ended).update(ended_at=F('last_seen_at'))
+
+        extended = []
+        for reason, label in findings.items():
+            violation_id, last_seen_at = episodes.get(reason, (None, None))
+            if violation_id is not None and violation_id not in ended:
+                extended.append(violation_id)
+                continue
+            violation = Violation.objects.create(session=session, reason=reason, last_seen_at=now)
+            Screenshot.objects.create(session=session, violation=violation, image=image_data, reason=label)
+            opened.append(reason)
+        if extended:
+            Violation.objects.filter(id__in=extended).update(frame_count=F('frame_count') + 1, last_seen_at=now)
+    return opened
+
+
+def touch_episodes(session_id, now=None):
+    """A frame answered with the last result instead of being analysed - its episodes are still running"""
+    now = timezone.now() if now is None else now
+    cutoff = now - timedelta(seconds=episode_gap())
+    _open_rows(session_id).filter(last_seen_at__gte=cutoff).update(last_seen_at=now)
+
+
+def end_episodes(session_ids):
+    """Close every open episode of finished sessions - no more frames will end them"""
+    Violation.objects.filter(session_id__in=session_ids, ended_at__isnull=True).update(ended_at=F('last_seen_at'))
@@ -0,0 +1,133 @@
+# exports.py - STREAMING CSV / XLSX EXPORTS PER EXAM
+#
+# Staff exports of results, sessions and violations. Rows are read with
+# values_list().iterator(chunk_size) - no model instances, no nested
+# serializers - and written out as they arrive:
+#   - CSV streams straight into a StreamingHttpResponse: memory stays flat
+#     and the first bytes go out at once, however many rows an exam has
+#   - XLSX is NOT streamed: an .xlsx is a zip that can only be sent once it is
+#     complete. An openpyxl write-only workbook spools the rows to a temp file
+#     (not memory), which is sent once closed - so the request takes as long as
+#     writing the whole file. Each file is therefore capped at
+#     PROCTOR_EXPORT_XLSX_MAX_ROWS rows; when more remain the response carries
+#     X-Export-Next-After and the next file is fetched with ?after=<that id>.
+#     Use CSV for full dumps of big exams.
+# Sessions and violations belong to an exam through ExamSession.exam, so
+# in-progress and terminated sessions without a result are exported too.
+import csv
+import tempfile
+from datetime import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ExamSession, TestResult, Violation
+
+# kind -> (header, queryset for an exam, columns)
+EXPORTS = {
+    'results': (
+        ['Result ID', 'Student', 'Score', 'Total Questions', 'Date Taken', 'Session ID', 'Candidate ID',
+         'Session Violations', 'Terminated'],
+        lambda exam_id: TestResult.objects.filter(exam_id=exam_id),
+        ['id', 'student_name', 'score', 'total_questions', 'date_taken', 'session_id', 'session__candidate_id',
+         'session__violations', 'session__terminated'],
+    ),
+    'sessions': (
+        ['Session ID', 'Candidate ID', 'Started At', 'Violations', 'Terminated', 'Completed', 'Can Retake',
+         'Score', 'Total Questions'],
+        lambda exam_id: ExamSession.objects.filter(exam_id=exam_id),
+        ['id', 'candidate_id', 'started_at', 'violations', 'terminated', 'completed', 'can_retake',
+         'testresult__score', 'testresult__total_questions'],
+    ),
+    'violations': (
+        ['Violation ID', 'Session ID', 'Candidate ID', 'Reason', 'Timestamp', 'Last Seen', 'Ended At', 'Frames'],
+        lambda exam_id: Violation.objects.filter(session__exam_id=exam_id),
+        ['id', 'session_id', 'session__candidate_id', 'reason', 'timestamp', 'last_seen_at', 'ended_at',
+         'frame_count'],
+    ),
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def chunk_size():
+    return getattr(settings, 'PROCTOR_EXPORT_CHUNK_SIZE', 2000)
+
+
+def xlsx_max_rows():
+    return getattr(settings, 'PROCTOR_EXPORT_XLSX_MAX_ROWS', 50000)
+
+
+def export_rows(kind, exam_id, after=None, limit=None):
+    """
+    Header, then one tuple per row, read from the database in chunks. `after`
+    skips rows up to that id, `limit` stops after that many (ids are the first column).
+    """
+    header, queryset, columns = EXPORTS[kind]
+    yield header
+    rows = queryset(exam_id).order_by('id')
+    if after is not None:
+        rows = rows.filter(id__gt=after)
+    rows = rows.values_list(*columns)
+    if limit is not None:
+        rows = rows[:limit]
+    yield from rows.iterator(chunk_size=chunk_size())
+
+
+def has_rows_after(kind, exam_id, after):
+    _, queryset, _ = EXPORTS[kind]
+    return queryset(exam_id).filter(id__gt=after).exists()
+
+
+class LastId:
+    """Pass rows through, remembering the id of the last one"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.last = None
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            if self.count:
+                self.last = row[0]
+            self.count += 1
+            yield row
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield '\ufeff'  # BOM so Excel opens UTF-8 (emoji reasons) correctly
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def _excel_value(value):
+    # Excel has no time zones - write local wall-clock time
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def write_xlsx(rows, title):
+    """Write-only workbook spooled to a temporary file; returns the file rewound to the start"""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title)
+    for row in rows:
+        sheet.append([_excel_value(value) for value in row])
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,194 @@
+# grading.py - SERVER-SIDE GRADING AGAINST CACHED ANSWER KEYS
+#
+# An exam's answer key is precomputed into an AnswerKey row (question ids +
+# one correct letter each) and held per process as numpy arrays. A submission
+# is stored compactly as one letter per key question ('-' = unanswered), so
+# grading is a byte-wise comparison against the key.
+#
+# When questions or correct answers change, the key is rebuilt as a new
+# version (on commit of the edit, see signals.py). Every worker checks the exam's
+# latest version - one indexed lookup - before trusting the key it cached, so
+# no process keeps grading against an old version. `regrade_exam` then
+# re-scores every submission of the exam in batches:
+# answers are stacked into a (submissions x questions) uint8 matrix, remapped to
+# the new question order if needed, and compared in one numpy operation. Scores
+# are written back with one UPDATE per distinct score value.
+import threading
+from collections import defaultdict
+
+import numpy as np
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import AnswerKey, Question, TestResult
+
+UNANSWERED = '-'
+LETTERS = ('A', 'B', 'C', 'D')
+# Key letter for a question whose correct answer isn't one of LETTERS - no submission matches it
+NO_ANSWER = '?'
+
+# AnswerKey id -> (question ids, {question id: column}, correct letters as uint8)
+_key_arrays = {}
+_key_lock = threading.Lock()
+
+
+def _cache_key(exam_id):
+    # v2: keys are normalised with key_letter - ids cached before that are not trusted
+    return f"answer_key:v2:{exam_id}"
+
+
+def invalidate_answer_key(exam_id):
+    """Called when an exam's questions change - the next grading rebuilds the key"""
+    cache.delete(_cache_key(exam_id))
+
+
+def refresh_answer_key(exam_id):
+    """Rebuild the key now, so workers whose cache still holds the old version see a newer one"""
+    invalidate_answer_key(exam_id)
+    return current_answer_key(exam_id)
+
+
+def key_letter(answer):
+    """Correct answer as stored on the Question -> one key letter ('b ' -> 'B', anything else -> NO_ANSWER)"""
+    letter = str(answer or '').strip().upper()[:1]
+    return letter if letter in LETTERS else NO_ANSWER
+
+
+def current_answer_key(exam_id):
+    """The exam's up-to-date AnswerKey id, writing a new version if the questions changed"""
+    latest_id = AnswerKey.objects.filter(exam_id=exam_id).order_by('-version').values_list('id', flat=True).first()
+    key_id = cache.get(_cache_key(exam_id))
+    if key_id is not None and key_id == latest_id:
+        return key_id
+
+    questions = list(Question.objects.filter(exam_id=exam_id).order_by('id').values_list('id', 'correct_answer'))
+    question_ids = ','.join(str(qid) for qid, _ in questions)
+    answers = ''.join(key_letter(answer) for _, answer in questions)
+    if NO_ANSWER in answers:
+        print(f"⚠️ Exam {exam_id}: {answers.count(NO_ANSWER)} question(s) without a valid correct answer (A-D)")
+    latest = AnswerKey.objects.filter(exam_id=exam_id).order_by('-version').first()
+    if latest is not None and latest.question_ids == question_ids and latest.answers == answers:
+        key = latest
+    else:
+        try:
+            with transaction.atomic():
+                key = AnswerKey.objects.create(exam_id=exam_id, version=(latest.version + 1 if latest else 1),
+                                               question_ids=question_ids, answers=answers)
+            print(f"🔑 Answer key v{key.version} for exam {exam_id}: {len(answers)} question(s)")
+        except IntegrityError:
+            # Another worker wrote this version first
+            key = AnswerKey.objects.filter(exam_id=exam_id).order_by('-version').first()
+    cache.set(_cache_key(exam_id), key.id)
+    return key.id
+
+
+def key_arrays(key_id):
+    with _key_lock:
+        arrays = _key_arrays.get(key_id)
+    if arrays is None:
+        key = AnswerKey.objects.get(id=key_id)
+        question_ids = [int(qid) for qid in key.question_ids.split(',') if qid]
+        arrays = (question_ids, {qid: i for i, qid in enumerate(question_ids)},
+                  np.frombuffer(key.answers.encode('ascii'), dtype=np.uint8))
+        with _key_lock:
+            _key_arrays[key_id] = arrays
+    return arrays
+
+
+def answer_sheet(key_id, submitted):
+    """Compact answer string for `submitted` ({question id: letter}) in the key's question order"""
+    question_ids, column, _ = key_arrays(key_id)
+    sheet = [UNANSWERED] * len(question_ids)
+    for qid, letter in submitted.items():
+        letter = str(letter).strip().upper()[:1]
+        try:
+            index = column[int(qid)]
+        except (KeyError, TypeError, ValueError):
+            continue  # not a question of this exam
+        if letter in LETTERS:
+            sheet[index] = letter
+    return ''.join(sheet)
+
+
+def score_sheets(key_id, sheets):
+    """Scores of equal-length answer strings against the key, as one numpy comparison"""
+    _, _, correct = key_arrays(key_id)
+    if not sheets or not len(correct):
+        return np.zeros(len(sheets), dtype=np.int64)
+    matrix = np.frombuffer(''.join(sheets).encode('ascii'), dtype=np.uint8).reshape(len(sheets), len(correct))
+    return (matrix == correct).sum(axis=1)
+
+
+def grade_submission(exam_id, submitted):
+    """(answer string, score, total questions, key id) for one candidate's answers"""
+    key_id = current_answer_key(exam_id)
+    sheet = answer_sheet(key_id, submitted)
+    return sheet, int(score_sheets(key_id, [sheet])[0]), len(sheet), key_id
+
+
+def _remap(sheets, from_key_id, to_key_id):
+    """Re-align answer strings written against an older key version to the current question order"""
+    old_ids, _, _ = key_arrays(from_key_id)
+    _, new_column, new_correct = key_arrays(to_key_id)
+    old = np.frombuffer(''.join(sheets).encode('ascii'), dtype=np.uint8).reshape(len(sheets), len(old_ids))
+    new = np.full((len(sheets), len(new_correct)), ord(UNANSWERED), dtype=np.uint8)
+    kept = [(i, new_column[qid]) for i, qid in enumerate(old_ids) if qid in new_column]
+    if kept:
+        src, dst = zip(*kept)
+        new[:, list(dst)] = old[:, list(src)]
+    return [row.tobytes().decode('ascii') for row in new]
+
+
+def regrade_exam(exam_id, batch_size=5000):
+    """Re-score every server-graded submission of an exam against its current key"""
+    invalidate_answer_key(exam_id)
+    key_id = current_answer_key(exam_id)
+    total = len(key_arrays(key_id)[2])
+    submissions = (TestResult.objects.filter(exam_id=exam_id, answer_key__isnull=False)
+                   .order_by('id').values_list('id', 'answers', 'answer_key_id', 'score', 'total_questions'))
+    stats = {'submissions': 0, 'rescored': 0, 'remapped': 0, 'answer_key_version': None}
+
+    batch = []
+    for row in submissions.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _regrade_batch(batch, key_id, total, stats)
+            batch = []
+    if batch:
+        _regrade_batch(batch, key_id, total, stats)
+    stats['answer_key_version'] = AnswerKey.objects.values_list('version', flat=True).get(id=key_id)
+    print(f"📝 Regraded exam {exam_id} against key v{stats['answer_key_version']}: "
+          f"{stats['rescored']}/{stats['submissions']} score(s) changed, {stats['remapped']} re-aligned")
+    return stats
+
+
+def _regrade_batch(rows, key_id, total, stats):
+    stats['submissions'] += len(rows)
+    by_key = defaultdict(list)
+    for row in rows:
+        by_key[row[2]].append(row)
+
+    changed = defaultdict(list)  # new score -> result ids
+    for from_key_id, group in by_key.items():
+        ids = [row[0] for row in group]
+        sheets = [row[1] for row in group]
+        if from_key_id != key_id and key_arrays(from_key_id)[0] == key_arrays(key_id)[0]:
+            # Same questions, only correct answers changed - the stored strings still line up
+            TestResult.objects.filter(id__in=ids).update(answer_key_id=key_id)
+        elif from_key_id != key_id:
+            sheets = _remap(sheets, from_key_id, key_id)
+            with transaction.atomic():
+                TestResult.objects.bulk_update(
+                    [TestResult(id=i, answers=s, answer_key_id=key_id) for i, s in zip(ids, sheets)],
+                    ['answers', 'answer_key'], batch_size=1000,
+                )
+            stats['remapped'] += len(ids)
+        scores = score_sheets(key_id, sheets)
+        for row, score in zip(group, scores.tolist()):
+            if score != row[3] or row[4] != total:
+                changed[score].append(row[0])
+
+    with transaction.atomic():
+        for score, ids in changed.items():
+            TestResult.objects.filter(id__in=ids).update(score=score, total_questions=total)
+            stats['rescored'] += len(ids)
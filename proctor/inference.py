@@ -0,0 +1,121 @@
+# inference.py - HEAVY INFERENCE STACK (OpenCV / NumPy / Torch)
+#
+# Everything that needs cv2, numpy or torch lives behind this module so that
+# views.py, admin, auth and `manage.py` commands never import it. It is loaded
+# lazily by `analyze_frame` on the first frame a worker receives.
+import base64
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+from django.conf import settings
+
+from .detector import ProctorDetector
+from .pool import DetectorPool
+from .tuning import configure_threads
+from .verification import VerificationChecker
+
+# Global detector pool - replicas of one ProctorDetector sharing weights and candidate state,
+# fed round-robin by the pool's frame scheduler
+detector = None
+detector_lock = threading.Lock()
+
+def get_detector():
+    global detector
+    if detector is None:
+        with detector_lock:
+            if detector is None:
+                split = configure_threads()
+                detector = DetectorPool(
+                    ProctorDetector(
+                        stage_threads=split['stage_threads'],
+                        torch_threads=split['torch_threads'],
+                    ),
+                    size=split['replicas'],
+                    checkout_timeout=getattr(settings, 'PROCTOR_CHECKOUT_TIMEOUT_MS', 1000) / 1000.0,
+                    min_rate=getattr(settings, 'PROCTOR_MIN_ANALYSIS_FPS', 0.5),
+                )
+    return detector
+
+# Pre-exam camera checks - face net and image quality only, independent of the detector pool
+verifier = None
+
+def get_verifier():
+    global verifier
+    if verifier is None:
+        with detector_lock:
+            if verifier is None:
+                verifier = VerificationChecker()
+    return verifier
+
+def verify_frame(imgstr, quality=True):
+    """Verification-mode result for a base64 payload, None if it doesn't decode"""
+    checker = get_verifier()
+    frame, scale = decode_image(imgstr, checker.required_side)
+    if frame is None:
+        return None
+    return checker.check(frame, scale=scale, quality=quality)
+
+# DCT-domain downscaling factors libjpeg can apply while decoding
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# SOFn markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) do not
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def jpeg_size(data):
+    """Read (width, height) from a JPEG header without decoding. None if not a JPEG."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        if marker == 0xD9 or marker == 0xDA:  # EOI / start of scan before any SOF
+            return None
+        segment_length = struct.unpack('>H', data[i + 2:i + 4])[0]
+        i += 2 + segment_length
+    return None
+
+def pick_decode_flag(size, required_side):
+    """
+    Largest reduced-decode factor that still leaves the long side at or above
+    `required_side`. Returns (imread_flag, factor).
+    """
+    if size:
+        long_side = max(size)
+        for factor, flag in REDUCED_DECODE_FLAGS:
+            if long_side // factor >= required_side:
+                return flag, factor
+    return cv2.IMREAD_COLOR, 1
+
+def decode_image(imgstr, required_side=None):
+    """
+    Decode a base64 payload (without the data-URL prefix) into a BGR frame.
+    Oversized JPEGs are decoded at 1/2, 1/4 or 1/8 resolution - no larger than
+    the biggest input any detector stage needs. Returns (frame, scale) where
+    `scale` maps decoded pixels back to source pixels (None frame on failure).
+    """
+    data = base64.b64decode(imgstr)
+    size = jpeg_size(data)
+    required_side = required_side or get_detector().preprocessor.required_side
+    flag, factor = pick_decode_flag(size, required_side)
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    if frame is None:
+        return None, 1
+    if size:
+        # Reduced decodes round up odd sizes - use the exact ratio
+        return frame, max(size) / max(frame.shape[:2])
+    return frame, factor
@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+import queue
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from proctor import tuning
+from proctor.preprocessing import GRAD_MODES
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the detectors on this host over Torch / OpenCV thread counts, "
+        "stage concurrency, autograd mode and rescore batch sizes, and write the "
+        "fastest configuration to the inference profile loaded by every worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=getattr(settings, 'PROCTOR_WORKER_PROCESSES', 1),
+                            help='Inference processes sharing this host (gunicorn --workers)')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Measurement time per configuration')
+        parser.add_argument('--batch-sizes', default='1,4,8,16,32',
+                            help='Comma-separated rescore batch sizes to try')
+        parser.add_argument('--min-gain', type=float, default=0.03,
+                            help='Relative speed-up a change must bring to be kept (filters noise)')
+        parser.add_argument('--dry-run', action='store_true', help='Report only, do not write the profile')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        seconds = options['seconds']
+        cores = os.cpu_count() or 1
+        replicas = max(1, getattr(settings, 'PROCTOR_DETECTOR_REPLICAS', 1))
+        per_replica = max(1, cores // processes // replicas)
+        self.context = multiprocessing.get_context('spawn')
+
+        self.stdout.write(f"🔧 Auto-tuning inference for {processes} process(es) x {replicas} replica(s) "
+                          f"on {cores} core(s)...")
+
+        # Coordinate descent from the current split: sweep one setting at a time, keep the winner
+        best = tuning.thread_split(cores, processes=processes)
+        best_fps = self._measure(best, processes, seconds)
+        threads = sorted({1, 2, 4, 8, 16, per_replica} & set(range(1, per_replica + 1)))
+        sweeps = {
+            'stage_threads': [1, 3],
+            'torch_threads': threads,
+            'interop_threads': [1, 2],
+            'cv2_threads': sorted({1, max(1, per_replica // 4), max(1, per_replica // 2)}),
+            'grad_mode': list(GRAD_MODES),
+        }
+        for key, values in sweeps.items():
+            for value in values:
+                if value == best[key]:
+                    continue
+                trial = dict(best, **{key: value})
+                fps = self._measure(trial, processes, seconds)
+                if fps > best_fps * (1 + options['min_gain']):
+                    best, best_fps = trial, fps
+                    self.stdout.write(self.style.SUCCESS(f"   ✅ {key}={value} is faster"))
+
+        batch_sizes = [int(size) for size in options['batch_sizes'].split(',') if size.strip()]
+        rates = self._measure_batches(batch_sizes, seconds)
+        if rates:
+            best['batch_size'] = max(rates, key=rates.get)
+            for size, rate in sorted(rates.items()):
+                self.stdout.write(f"   batch_size={size}: {rate:.1f} frames/s per rescore worker")
+
+        profile = {key: best[key] for key in tuning.PROFILE_KEYS}
+        profile.update({
+            'host_cores': cores,
+            'worker_processes': processes,
+            'frames_per_second': round(best_fps, 2),
+            'tuned_at': timezone.now().isoformat(),
+        })
+
+        self.stdout.write(f"🏁 Best: {profile} -> {best_fps:.1f} frames/s across {processes} process(es)")
+        if options['dry_run']:
+            return
+        path = tuning.save_profile(profile)
+        self.stdout.write(self.style.SUCCESS(f"✅ Inference profile written to {path} (restart workers to apply)"))
+
+    def _measure(self, config, processes, seconds):
+        """Total frames/sec of `processes` concurrent detector processes running `config`"""
+        barrier = self.context.Barrier(processes)
+        results = self.context.Queue()
+        workers = [
+            self.context.Process(target=tuning.benchmark_worker, args=(config, seconds, barrier, results))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+
+        total, errors = 0.0, []
+        try:
+            for _ in workers:
+                status, value = results.get(timeout=seconds + 600)
+                if status == 'ok':
+                    total += value
+                else:
+                    errors.append(value)
+        except queue.Empty:
+            errors.append('benchmark process timed out')
+        finally:
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+
+        if errors:
+            raise CommandError(f"Benchmark failed for {config}: {errors[0]}")
+        self.stdout.write(
+            f"   stage={config['stage_threads']} torch={config['torch_threads']} "
+            f"interop={config['interop_threads']} opencv={config['cv2_threads']} "
+            f"{config['grad_mode']}: {total:.1f} frames/s"
+        )
+        return total
+
+    def _measure_batches(self, batch_sizes, seconds):
+        if not batch_sizes:
+            return {}
+        results = self.context.Queue()
+        worker = self.context.Process(target=tuning.benchmark_batch_worker, args=(batch_sizes, seconds, results))
+        worker.start()
+        try:
+            status, value = results.get(timeout=seconds * len(batch_sizes) + 600)
+        except queue.Empty:
+            status, value = 'error', 'batch benchmark timed out'
+        finally:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        if status != 'ok':
+            self.stdout.write(self.style.WARNING(f"⚠️ Batch size benchmark failed: {value}"))
+            return {}
+        return value
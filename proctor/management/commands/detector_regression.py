@@ -0,0 +1,303 @@
+import base64
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Violation categories scored per frame. A frame's categories come from the
+# reasons the live view would record for it (episodes.frame_findings).
+CATEGORIES = ['no_face', 'multiple_faces', 'phone', 'back_camera', 'book', 'laptop', 'other_object']
+
+# label (sub-directory of the frame set) -> categories its frames are expected to raise,
+# unless labels.json lists the frame with its own expected categories
+DEFAULT_EXPECTED = {
+    'empty': ['no_face'],
+    'clear': [],
+    'no_face': ['no_face'],
+    'multiple_faces': ['multiple_faces'],
+    'phone': ['phone'],
+    'back_camera': ['phone', 'back_camera'],
+    'book': ['book'],
+    'laptop': ['laptop'],
+}
+
+MANIFEST = 'labels.json'
+
+
+def reason_categories(reason, result):
+    """Map one recorded violation reason (and the frame's result) to its categories"""
+    if reason == "Face is not visible":
+        return ['no_face']
+    if reason == "Multiple faces detected":
+        return ['multiple_faces']
+    if reason.startswith("Mobile Phone Detected"):
+        if any(p.get('camera_module') for p in result.get('mobile_phone_details', [])):
+            return ['phone', 'back_camera']
+        return ['phone']
+    if 'Book' in reason:
+        return ['book']
+    if 'Laptop' in reason:
+        return ['laptop']
+    return ['other_object']
+
+
+def category_scores(frames):
+    """
+    Per-category precision / recall over frames, each a dict with `expected`
+    and `got` category lists. A score is None when it is undefined - no frame
+    expected the category (recall) or none raised it (precision).
+    """
+    scores = {}
+    for category in CATEGORIES:
+        tp = sum(1 for f in frames if category in f['expected'] and category in f['got'])
+        fp = sum(1 for f in frames if category not in f['expected'] and category in f['got'])
+        fn = sum(1 for f in frames if category in f['expected'] and category not in f['got'])
+        scores[category] = {
+            'tp': tp, 'fp': fp, 'fn': fn,
+            'precision': round(tp / (tp + fp), 3) if tp + fp else None,
+            'recall': round(tp / (tp + fn), 3) if tp + fn else None,
+        }
+    return scores
+
+
+def score_problems(scores, baseline=None, min_precision=1.0, min_recall=1.0, tolerance=0.0):
+    """Categories whose precision / recall is under its floor or dropped below the baseline run"""
+    baseline = baseline or {}
+    problems = []
+    for category, stats in scores.items():
+        for metric, floor in (('precision', min_precision), ('recall', min_recall)):
+            value = stats[metric]
+            before = baseline.get(category, {}).get(metric)
+            if value is None:
+                if before is not None and metric == 'recall':
+                    problems.append(f"{category}: no frames expect it any more (baseline recall {before:.0%})")
+                continue
+            if value < floor:
+                problems.append(f"{category}: {metric} {value:.0%} < {floor:.0%}")
+            elif before is not None and value < before - tolerance:
+                problems.append(f"{category}: {metric} dropped {before:.0%} -> {value:.0%}")
+    return problems
+
+
+class SimulatedClock:
+    """Injected into the detectors so grace periods elapse per frame, not per wall second"""
+
+    def __init__(self, start=1_000_000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a labelled golden frame set through ProctorDetector / MobilePhoneDetector "
+        "on a simulated clock, compare the violation reasons each frame raises with its "
+        "expected ones and check per-category precision / recall and the latency budget. "
+        "Frames live in <frames>/<label>/*.jpg with labels: " + ', '.join(DEFAULT_EXPECTED)
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--frames', default=os.path.join(settings.BASE_DIR, 'golden_frames'),
+                            help='Golden frame set directory')
+        parser.add_argument('--repeat', type=int, default=10,
+                            help='Times each frame is replayed as a sequence (buffers and grace periods)')
+        parser.add_argument('--fps', type=float, default=1.0, help='Simulated capture rate of a sequence')
+        parser.add_argument('--budget-ms', type=float, default=500.0,
+                            help='p95 latency budget for a fully analysed frame (decode + detection)')
+        parser.add_argument('--min-precision', type=float, default=1.0,
+                            help='Minimum precision of every category the run raised')
+        parser.add_argument('--min-recall', type=float, default=1.0,
+                            help='Minimum recall of every category some frame expects')
+        parser.add_argument('--tolerance', type=float, default=0.0,
+                            help='Allowed precision / recall drop against --baseline')
+        parser.add_argument('--require-coverage', action='store_true',
+                            help='Fail when a category has no frame expecting it')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Disable the near-duplicate detection cache (every frame fully analysed)')
+        parser.add_argument('--output', default=None, help='Write the report as JSON to this file')
+        parser.add_argument('--baseline', default=None,
+                            help='Earlier --output report; fail when a category scores worse than it did')
+
+    def handle(self, *args, **options):
+        from proctor import inference
+        from proctor.detector import ProctorDetector
+        from proctor.state import LocalStateStore
+        from proctor.tuning import configure_threads
+
+        frame_sets = self._frame_sets(options['frames'])
+        manifest = self._manifest(options['frames'])
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+
+        clock = SimulatedClock()
+        split = configure_threads()
+        # Replayed sequences run on a simulated clock - keep their trackers out of the shared store
+        detector = ProctorDetector(stage_threads=split['stage_threads'],
+                                   torch_threads=split['torch_threads'], clock=clock,
+                                   state_store=LocalStateStore())
+        if options['no_cache']:
+            detector.hash_distance_threshold = -1
+        # Without the models nothing is raised and every false-positive check passes - refuse instead
+        missing = [name for name, loaded in (('face net', detector.use_dnn_face),
+                                             ('YOLOv5', detector.object_model is not None)) if not loaded]
+        if missing:
+            raise CommandError(f"{' and '.join(missing)} not loaded - run download_models.py "
+                               f"(and let torch.hub fetch YOLOv5) before replaying golden frames")
+
+        self.stdout.write(f"🎯 Replaying {sum(len(p) for p in frame_sets.values())} golden frame(s) "
+                          f"x {options['repeat']} at {options['fps']} fps (simulated)...")
+
+        report = {'labels': {}, 'frames': []}
+        all_latencies = []
+        for label, paths in frame_sets.items():
+            latencies = []
+            for index, path in enumerate(paths):
+                name = os.path.relpath(path, options['frames']).replace(os.sep, '/')
+                with open(path, 'rb') as fh:
+                    imgstr = base64.b64encode(fh.read()).decode()
+                reasons, got, frame_latencies = self._replay(detector, inference, imgstr, clock, options,
+                                                             candidate_id=f"golden-{label}-{index}")
+                latencies.extend(frame_latencies)
+                report['frames'].append({
+                    'file': name, 'label': label,
+                    'expected': sorted(manifest.get(name, DEFAULT_EXPECTED[label])),
+                    'got': sorted(got), 'reasons': sorted(reasons or []), 'decoded': reasons is not None,
+                })
+            all_latencies.extend(latencies)
+            report['labels'][label] = {
+                'frames': len(paths),
+                'p50_ms': round(percentile(latencies, 50), 1),
+                'p95_ms': round(percentile(latencies, 95), 1),
+            }
+        report['categories'] = category_scores(report['frames'])
+        report['p95_ms'] = round(percentile(all_latencies, 95), 1)
+        report['config'] = {
+            'repeat': options['repeat'], 'fps': options['fps'], 'no_cache': options['no_cache'],
+            'face_size': detector.preprocessor.face_size, 'yolo_size': detector.preprocessor.yolo_size,
+            **split,
+        }
+
+        self._print_report(report, baseline, options)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, default=str)
+            self.stdout.write(f"📝 Report written to {options['output']}")
+
+        problems = [f"{f['file']}: could not be decoded" for f in report['frames'] if not f['decoded']]
+        problems += score_problems(report['categories'], baseline.get('categories'),
+                                   options['min_precision'], options['min_recall'], options['tolerance'])
+        uncovered = [c for c, stats in report['categories'].items() if stats['recall'] is None]
+        if uncovered and options['require_coverage']:
+            problems.append(f"no frames expect {', '.join(uncovered)}")
+        if report['p95_ms'] > options['budget_ms']:
+            problems.append(f"p95 latency {report['p95_ms']}ms over the {options['budget_ms']}ms budget")
+        if problems:
+            raise CommandError("Detector regression: " + '; '.join(problems))
+        self.stdout.write(self.style.SUCCESS("✅ Golden frames raise their expected reasons within the latency budget"))
+
+    def _frame_sets(self, root):
+        if not os.path.isdir(root):
+            raise CommandError(f"Golden frame set not found at {root}")
+        frame_sets = {}
+        for label in sorted(os.listdir(root)):
+            directory = os.path.join(root, label)
+            if not os.path.isdir(directory) or label.startswith(('.', '__')):
+                continue
+            if label not in DEFAULT_EXPECTED:
+                self.stdout.write(self.style.WARNING(f"⚠️ Skipping unknown label directory '{label}'"))
+                continue
+            paths = sorted(
+                os.path.join(directory, name) for name in os.listdir(directory)
+                if name.lower().endswith(('.jpg', '.jpeg', '.png'))
+            )
+            if paths:
+                frame_sets[label] = paths
+        if not frame_sets:
+            raise CommandError(f"No labelled frames under {root} (expected <label>/*.jpg)")
+        return frame_sets
+
+    def _manifest(self, root):
+        """Per-frame expected categories from <frames>/labels.json: {"<label>/<file>": [categories]}"""
+        path = os.path.join(root, MANIFEST)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as fh:
+            manifest = json.load(fh)
+        for name, categories in manifest.items():
+            unknown = set(categories) - set(CATEGORIES)
+            if unknown:
+                raise CommandError(f"{MANIFEST}: {name} expects unknown categories {sorted(unknown)}")
+        return manifest
+
+    def _replay(self, detector, inference, imgstr, clock, options, candidate_id):
+        """
+        Feed one frame `repeat` times as a fresh candidate. Returns the violation
+        reasons the sequence raised, their categories and the per-frame latencies.
+        """
+        import time
+        from proctor.episodes import frame_findings
+
+        detector.reset()
+        reasons, categories = set(), set()
+        latencies = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            frame, scale = inference.decode_image(imgstr, detector.preprocessor.required_side)
+            if frame is None:
+                return None, [], latencies
+            result = detector.analyze_frame(frame, candidate_id=candidate_id, scale=scale)
+            if not result.get('cached'):
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            for reason in frame_findings(result):
+                reasons.add(reason)
+                categories.update(reason_categories(reason, result))
+            clock.advance(1.0 / options['fps'])
+        return reasons, categories, latencies
+
+    def _print_report(self, report, baseline, options):
+        before_categories = baseline.get('categories', {})
+        before_labels = baseline.get('labels', {})
+
+        def pct(value):
+            return '   -' if value is None else f"{value:>4.0%}"
+
+        self.stdout.write("\n" + "=" * 65)
+        self.stdout.write("📊 DETECTOR REGRESSION REPORT")
+        for category, stats in report['categories'].items():
+            line = (f"   {category:<15} precision {pct(stats['precision'])} | recall {pct(stats['recall'])} "
+                    f"| TP {stats['tp']} FP {stats['fp']} FN {stats['fn']}")
+            before = before_categories.get(category)
+            if before:
+                line += f" | before {pct(before['precision'])} / {pct(before['recall'])}"
+            if stats['recall'] is None:
+                line += " (no frames)"
+            self.stdout.write(line)
+        for label, stats in report['labels'].items():
+            line = f"   {label:<15} {stats['frames']:>3} frame(s) | p50 {stats['p50_ms']:>7.1f}ms | p95 {stats['p95_ms']:>7.1f}ms"
+            if label in before_labels:
+                line += f" | Δ p95 {stats['p95_ms'] - before_labels[label]['p95_ms']:+.1f}ms"
+            self.stdout.write(line)
+        self.stdout.write(f"   overall p95: {report['p95_ms']}ms (budget {options['budget_ms']}ms)")
+        for frame in report['frames']:
+            if frame['expected'] != frame['got']:
+                self.stdout.write(self.style.ERROR(
+                    f"   ❌ {frame['file']}: expected {frame['expected'] or 'nothing'}, "
+                    f"got {frame['got'] or 'nothing'} {frame['reasons'] or ''}"
+                ))
+        self.stdout.write("=" * 65)
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from proctor import retention
+from proctor.models import RetentionPolicy
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply RetentionPolicy rules: archive old sessions' Violation / Screenshot "
+        "evidence to compressed files and delete it in bounded batches. On PostgreSQL "
+        "with partitioned tables, whole expired months are dropped as partitions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows deleted per statement')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be purged')
+        parser.add_argument('--setup-partitions', action='store_true',
+                            help='PostgreSQL only: convert the evidence tables to monthly range partitions')
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Monthly partitions to pre-create beyond the current month')
+
+    def handle(self, *args, **options):
+        log = self.stdout.write
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        if options['setup_partitions']:
+            if not retention.partitioning_supported():
+                raise CommandError("--setup-partitions requires PostgreSQL")
+            retention.partition_evidence_tables(months_ahead=options['months_ahead'], log=log)
+
+        policies = list(RetentionPolicy.objects.filter(is_active=True).select_related('exam'))
+        if not policies:
+            log("No active retention policies - nothing to purge.")
+            return
+
+        # 1. Whole months older than every policy: drop partitions (PostgreSQL only)
+        if retention.partitioning_supported():
+            if not dry_run:
+                retention.ensure_partitions(months_ahead=options['months_ahead'])
+            cutoff = retention.global_cutoff()
+            if cutoff is not None:
+                retention.drop_expired_partitions(
+                    cutoff, archive=any(p.archive for p in policies),
+                    batch_size=batch_size, dry_run=dry_run, log=log,
+                )
+
+        # 2. Everything else: per-policy archive + batched delete
+        for policy in policies:
+            retention.apply_policy(policy, batch_size=batch_size, dry_run=dry_run, log=log)
+
+        self.stdout.write(self.style.SUCCESS("✅ Retention run complete"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from proctor.models import Exam
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild an exam's answer key from its questions and re-score every "
+        "server-graded submission (TestResult with stored answers) against it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_ids', nargs='+', type=int, help='Exam id(s) to regrade')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Submissions scored per numpy batch')
+
+    def handle(self, *args, **options):
+        from proctor.grading import regrade_exam
+
+        exams = {exam.pk: exam for exam in Exam.objects.filter(pk__in=options['exam_ids'])}
+        missing = [str(pk) for pk in options['exam_ids'] if pk not in exams]
+        if missing:
+            raise CommandError(f"Exam(s) not found: {', '.join(missing)}")
+
+        for pk in options['exam_ids']:
+            stats = regrade_exam(pk, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {exams[pk].name}: key v{stats['answer_key_version']}, {stats['submissions']} submission(s), "
+                f"{stats['rescored']} score(s) changed, {stats['remapped']} re-aligned to new questions"
+            ))
@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from proctor import batch, tuning
+from proctor.models import Screenshot, ScreenshotRescore
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run detection over stored Screenshot evidence (e.g. after changing "
+        "thresholds or models) and store per-screenshot scores in ScreenshotRescore."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--run', default=None,
+                            help='Label for this audit run (default: current timestamp)')
+        parser.add_argument('--session', type=int, default=None, help='Only this ExamSession id')
+        parser.add_argument('--since', default=None, help='Only screenshots captured at/after this ISO datetime')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Decode/inference processes (default: all cores)')
+        parser.add_argument('--chunk-size', type=int, default=256,
+                            help='Screenshots fetched per DB round trip and sent per task')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Frames per network forward pass (default: tuned profile, else 16)')
+
+    def handle(self, *args, **options):
+        run_label = options['run'] or timezone.now().strftime('rescore-%Y%m%d-%H%M%S')
+        chunk_size = options['chunk_size']
+        workers = max(1, options['workers'])
+        batch_size = options['batch_size'] or tuning.load_profile().get('batch_size', 16)
+
+        queryset = Screenshot.objects.all()
+        if options['session']:
+            queryset = queryset.filter(session_id=options['session'])
+        if options['since']:
+            try:
+                since = parse_datetime(options['since'])
+            except ValueError:
+                since = None
+            if since is None:
+                raise CommandError(f"--since must be an ISO datetime, e.g. 2024-05-01T00:00:00, not {options['since']!r}")
+            queryset = queryset.filter(captured_at__gte=since)
+        # Resumable: skip screenshots this run already scored
+        queryset = queryset.exclude(rescores__run_label=run_label).order_by('id')
+
+        self.stdout.write(f"🔁 Rescoring screenshots as run '{run_label}' with {workers} worker(s)...")
+
+        written = errors = 0
+        # Bound the number of in-flight chunks so memory stays flat for any table size
+        pending = deque()
+        max_pending = workers * 2
+        context = multiprocessing.get_context('spawn')
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=batch.init_worker) as pool:
+            rows = queryset.values_list('id', 'image').iterator(chunk_size=chunk_size)
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    pending.append(pool.submit(batch.rescore_chunk, chunk, batch_size))
+                    chunk = []
+                    while len(pending) >= max_pending:
+                        w, e = self._write(pending.popleft().result(), run_label)
+                        written, errors = written + w, errors + e
+            if chunk:
+                pending.append(pool.submit(batch.rescore_chunk, chunk, batch_size))
+            while pending:
+                w, e = self._write(pending.popleft().result(), run_label)
+                written, errors = written + w, errors + e
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rescored {written} screenshot(s) for run '{run_label}' ({errors} could not be decoded)"
+        ))
+
+    def _write(self, records, run_label):
+        ScreenshotRescore.objects.bulk_create(
+            [ScreenshotRescore(run_label=run_label, **record) for record in records],
+            ignore_conflicts=True,
+        )
+        errors = sum(1 for record in records if record['error'])
+        self.stdout.write(f"   ... {len(records)} scored")
+        return len(records), errors
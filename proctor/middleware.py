@@ -0,0 +1,30 @@
+from django.db import connections
+
+
+class QueryCountMiddleware:
+    """
+    Adds an `X-DB-Query-Count` header with the number of SQL queries a request ran.
+    Enabled with PROCTOR_QUERY_COUNT_HEADER=True - used by loadtest.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = [0]
+
+        def count_query(execute, sql, params, many, context):
+            counter[0] += 1
+            return execute(sql, params, many, context)
+
+        wrappers = [connections[alias].execute_wrapper(count_query) for alias in connections]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            response = self.get_response(request)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+
+        response['X-DB-Query-Count'] = str(counter[0])
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-19 10:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctor', '0006_student_examsession_can_retake_examsession_completed_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScreenshotRescore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_label', models.CharField(db_index=True, max_length=100)),
+                ('face_count', models.IntegerField(default=0)),
+                ('phone_count', models.IntegerField(default=0)),
+                ('phone_confidence', models.FloatField(blank=True, null=True)),
+                ('prohibited_objects', models.CharField(blank=True, max_length=255)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('screenshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rescores', to='proctor.screenshot')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('screenshot', 'run_label'), name='uniq_rescore_per_run')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.11 on 2026-10-19 10:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctor', '0007_screenshotrescore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('max_age_days', models.PositiveIntegerField(default=180)),
+                ('archive', models.BooleanField(default=True)),
+                ('archive_by', models.CharField(choices=[('day', 'One file per day'), ('exam', 'One file per exam')], default='day', max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('exam', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='retention_policy', to='proctor.exam')),
+            ],
+        ),
+    ]
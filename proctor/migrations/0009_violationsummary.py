@@ -0,0 +1,48 @@
+# Generated by Django 5.2.11 on 2026-10-19 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+
+def backfill_summary(apps, schema_editor):
+    Violation = apps.get_model('proctor', 'Violation')
+    ViolationSummary = apps.get_model('proctor', 'ViolationSummary')
+    buckets = (
+        Violation.objects
+        .annotate(hour=TruncHour('timestamp'))
+        .values('session_id', 'session__candidate_id', 'reason', 'hour')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    ViolationSummary.objects.bulk_create(
+        (ViolationSummary(session_id=b['session_id'], candidate_id=b['session__candidate_id'],
+                          reason=b['reason'], hour=b['hour'], count=b['count']) for b in buckets.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctor', '0008_retentionpolicy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViolationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('candidate_id', models.CharField(db_index=True, max_length=100)),
+                ('reason', models.CharField(max_length=255)),
+                ('hour', models.DateTimeField(db_index=True)),
+                ('count', models.IntegerField(default=0)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='proctor.examsession')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('session', 'reason', 'hour'), name='uniq_violation_summary_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
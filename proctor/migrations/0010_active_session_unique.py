@@ -0,0 +1,35 @@
+# Generated by Django 5.2.11 on 2026-10-19 10:57
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def terminate_duplicate_sessions(apps, schema_editor):
+    """Keep each candidate's newest active session; terminate the older duplicates"""
+    ExamSession = apps.get_model('proctor', 'ExamSession')
+    duplicated = (
+        ExamSession.objects.filter(terminated=False)
+        .values('candidate_id')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+        .values_list('candidate_id', flat=True)
+    )
+    for candidate_id in list(duplicated):
+        active = ExamSession.objects.filter(candidate_id=candidate_id, terminated=False).order_by('-started_at', '-id')
+        keep = active.values_list('id', flat=True).first()
+        active.exclude(id=keep).update(terminated=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctor', '0009_violationsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(terminate_duplicate_sessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='examsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('terminated', False)), fields=('candidate_id',), name='uniq_active_session_per_candidate'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctor', '0010_active_session_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testresult',
+            name='answers',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.CreateModel(
+            name='AnswerKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('question_ids', models.TextField()),
+                ('answers', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_keys', to='proctor.exam')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='testresult',
+            name='answer_key',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='proctor.answerkey'),
+        ),
+        migrations.AddConstraint(
+            model_name='answerkey',
+            constraint=models.UniqueConstraint(fields=('exam', 'version'), name='uniq_answer_key_version'),
+        ),
+    ]
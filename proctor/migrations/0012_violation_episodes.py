@@ -0,0 +1,46 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def close_existing_violations(apps, schema_editor):
+    """Rows written per frame before episodes existed become closed one-frame episodes"""
+    Violation = apps.get_model('proctor', 'Violation')
+    Violation.objects.filter(ended_at__isnull=True).update(last_seen_at=F('timestamp'), ended_at=F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctor', '0011_answer_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='screenshot',
+            name='violation',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='screenshots', to='proctor.violation'),
+        ),
+        migrations.AddField(
+            model_name='violation',
+            name='ended_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='violation',
+            name='frame_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='violation',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(close_existing_violations, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='violation',
+            index=models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['session', 'reason'], name='violation_open_episode_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.11 on 2026-10-19 11:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_session_exam(apps, schema_editor):
+    """Sessions that already have a result were for that result's exam"""
+    ExamSession = apps.get_model('proctor', 'ExamSession')
+    TestResult = apps.get_model('proctor', 'TestResult')
+    results = TestResult.objects.filter(session__isnull=False, exam__isnull=False).values_list('session_id', 'exam_id')
+    by_exam = {}
+    for session_id, exam_id in results.iterator(chunk_size=2000):
+        by_exam.setdefault(exam_id, []).append(session_id)
+    for exam_id, session_ids in by_exam.items():
+        for start in range(0, len(session_ids), 1000):
+            ExamSession.objects.filter(id__in=session_ids[start:start + 1000]).update(exam_id=exam_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctor', '0012_violation_episodes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examsession',
+            name='exam',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sessions', to='proctor.exam'),
+        ),
+        migrations.RunPython(backfill_session_exam, migrations.RunPython.noop),
+    ]
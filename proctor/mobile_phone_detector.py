@@ -3,28 +3,35 @@ import torch
 import time
 import cv2
 import numpy as np
+import copy
+from .preprocessing import yolo_detect, share_weights
 
 class MobilePhoneDetector:
-    def __init__(self, device='cpu'):
+    def __init__(self, device='cpu', clock=time.time, tiers=('yolov5s',)):
         self.device = device
+        self.clock = clock
         
         # ============ EXAM PROCTORING SETTINGS ============
         print(f"📱 Loading Mobile Phone Detector for Exam Proctoring...")
         
-        try:
-            self.model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True, verbose=False)
-        except Exception as e:
-            print(f"Error loading YOLOv5: {e}")
-            self.model = None
+        # One model per tier (heaviest first) - the load monitor picks the tier per frame
+        self.models = {}
+        for tier in tiers:
+            try:
+                model = torch.hub.load('ultralytics/yolov5', tier, pretrained=True, verbose=False)
+            except Exception as e:
+                print(f"Error loading YOLOv5 ({tier}): {e}")
+                continue
 
-        if self.model:
             # Only detect mobile phones
-            self.model.classes = [67, 77]
+            model.classes = [67, 77]
             # Lowered slightly to 0.30 for better reliability in varying light
-            self.model.conf = 0.30  
-            self.model.iou = 0.45   # Standard NMS
-            self.model.to(device)
-            self.model.eval()
+            model.conf = 0.30  
+            model.iou = 0.45   # Standard NMS
+            model.to(device)
+            model.eval()
+            self.models[tier] = model
+        self.model = next(iter(self.models.values()), None)
         
         # ============ TRACKING SETTINGS ============
         self.phone_tracker = {}
@@ -33,67 +40,87 @@ class MobilePhoneDetector:
         self.violation_count = 0
         self.consecutive_detections_required = 2  # Must see phone in 2 frames
         
-    def detect_phones(self, frame, candidate_id='guest_user'):
+    def replica(self):
+        """Copy for a detector replica: same weights, private model caches"""
+        clone = copy.copy(self)
+        clone.models = {tier: share_weights(model) for tier, model in self.models.items()}
+        clone.model = next(iter(clone.models.values()), None)
+        return clone
+
+    def infer(self, frame, prepared=None, tier=None):
+        """
+        Raw phone detections as an (N, 6) [x1, y1, x2, y2, conf, cls] array.
+        Stateless - no tracking or grace period state is touched.
+        """
+        model = self.models.get(tier) or self.model
+        if model is None:
+            return np.zeros((0, 6), np.float32)
+        try:
+            if prepared is not None:
+                return yolo_detect(model, prepared)
+            return model(frame).xyxy[0].cpu().numpy()
+        except Exception as e:
+            print(f"Detection error: {e}")
+            import traceback
+            traceback.print_exc()
+            return np.zeros((0, 6), np.float32)
+
+    def detect_phones(self, frame, candidate_id='guest_user', prepared=None, detections=None, current_time=None,
+                      phone_tracker=None):
         """
         Detect mobile phones for exam proctoring
         - 3 second grace period to remove phone
         - Requires 2 consecutive detections
         - Only triggers on CLEAR phone detections
+        - Reuses the shared letterboxed tensor when `prepared` is given
+        - Boxes and size checks are in source pixels, even for reduced decodes
+        - Pass `detections` (from infer) to advance tracking without inference
+        - `current_time` is the frame's capture time (defaults to the clock)
+        - `phone_tracker` is the candidate's tracker from the state store
+          (defaults to this detector's own)
         """
         if self.model is None:
             return []
 
+        if phone_tracker is None:
+            phone_tracker = self.phone_tracker
         results = []
-        current_time = time.time()
+        current_time = self.clock() if current_time is None else current_time
         self.frame_count += 1
         
         try:
             # Run detection
-            detections = self.model(frame)
+            if detections is None:
+                detections = self.infer(frame, prepared)
+            if prepared is not None:
+                frame_shape = (prepared.height, prepared.width)
+            else:
+                frame_shape = frame.shape[:2]
             
-            for *box, conf, cls in detections.xyxy[0].cpu().numpy():
+            for *box, conf, cls in detections:
                 if int(cls) in [67, 77]:
                     x1, y1, x2, y2 = map(int, box)
                     width = x2 - x1
                     height = y2 - y1
                     
                     # ============ CHECK FOR BACK CAMERA MODULE ============
-                    is_camera, camera_type = self._is_back_camera_module(x1, y1, x2, y2, frame)
+                    plausible, is_camera, camera_type, area_percentage = self.plausible_phone(
+                        x1, y1, x2, y2, conf, frame_shape)
                     active_grace = self.grace_period
                     
                     if is_camera:
                         active_grace = 1 # Strict: 1 second
                         print(f"🚨🚨🚨 CHEATING ATTEMPT: BACK CAMERA MODULE detected ({camera_type})")
                     
-                    # ============ VALIDATION CHECKS ============
-                    # 1. Size check - phone should be reasonable size
-                    frame_area = frame.shape[0] * frame.shape[1]
-                    area = width * height
-                    area_percentage = (area / frame_area) * 100
-                    
-                    # Too small check - Skip if NOT a camera module
-                    if not is_camera and area_percentage < 0.2:
-                        continue
-                    
-                    # Too large (> 50% of frame) - likely too close
-                    if area_percentage > 50:
-                        continue
-                    
-                    # 2. Aspect ratio check - Skip if NOT a camera module
-                    aspect_ratio = width / height if height > 0 else 0
-                    if not is_camera and (aspect_ratio < 0.2 or aspect_ratio > 3.0):
-                        continue
-                    
-                    # 3. Confidence check
-                    if conf < 0.30:
+                    if not plausible:
                         continue
                     
                     # Generate ID based on proximity
                     phone_id = f"phone_{int(x1/20)}_{int(y1/20)}" 
                     
                     # Track phone across frames
-                    if phone_id not in self.phone_tracker:
-                        self.phone_tracker[phone_id] = {
+                    if phone_id not in phone_tracker:
+                        phone_tracker[phone_id] = {
                             'first_seen': current_time,
                             'last_seen': current_time,
                             'detection_count': 1,
@@ -103,22 +130,22 @@ class MobilePhoneDetector:
                             'phone_part': camera_type if is_camera else self._identify_phone_part(width, height, area_percentage)
                         }
                     else:
-                        self.phone_tracker[phone_id]['last_seen'] = current_time
-                        self.phone_tracker[phone_id]['detection_count'] += 1
+                        phone_tracker[phone_id]['last_seen'] = current_time
+                        phone_tracker[phone_id]['detection_count'] += 1
                         if is_camera: # Keep overriding part if camera is clear
-                             self.phone_tracker[phone_id]['phone_part'] = camera_type
+                             phone_tracker[phone_id]['phone_part'] = camera_type
                     
                     # Need consecutive detections
-                    detection_count = self.phone_tracker[phone_id]['detection_count']
+                    detection_count = phone_tracker[phone_id]['detection_count']
                     
                     # Calculate time visible
-                    time_visible = current_time - self.phone_tracker[phone_id]['first_seen']
+                    time_visible = current_time - phone_tracker[phone_id]['first_seen']
                     
                     # ============ GRACE PERIOD LOGIC ============
                     violation = False
                     grace_remaining = None
                     warning_message = None
-                    tracker = self.phone_tracker[phone_id]  # Initialize tracker here for all code paths
+                    tracker = phone_tracker[phone_id]  # Initialize tracker here for all code paths
                     
                     if detection_count >= self.consecutive_detections_required:
                         
@@ -160,11 +187,12 @@ class MobilePhoneDetector:
                         'violation': violation,
                         'warning': warning_message,
                         'detection_count': detection_count,
-                        'phone_part': self.phone_tracker[phone_id]['phone_part']
+                        'phone_part': phone_tracker[phone_id]['phone_part'],
+                        'camera_module': bool(is_camera)
                     })
             
             # Cleanup old detections
-            self._cleanup(current_time)
+            self._cleanup(current_time, phone_tracker)
             
             return results
             
@@ -217,7 +245,42 @@ class MobilePhoneDetector:
         else:
             return "Mobile Phone"
 
-    def _is_back_camera_module(self, x1, y1, x2, y2, frame):
+    def plausible_phone(self, x1, y1, x2, y2, conf, frame_shape):
+        """
+        Size / aspect ratio / confidence checks a phone box (source pixels) must pass.
+        Returns (plausible, is_camera, camera_type, area_percentage) - back camera
+        modules are exempt from the too-small and aspect ratio checks.
+        """
+        width = x2 - x1
+        height = y2 - y1
+        is_camera, camera_type = self._is_back_camera_module(x1, y1, x2, y2, frame_shape)
+        
+        # ============ VALIDATION CHECKS ============
+        # 1. Size check - phone should be reasonable size
+        frame_area = frame_shape[0] * frame_shape[1]
+        area = width * height
+        area_percentage = (area / frame_area) * 100
+        
+        # Too small check - Skip if NOT a camera module
+        if not is_camera and area_percentage < 0.2:
+            return False, is_camera, camera_type, area_percentage
+        
+        # Too large (> 50% of frame) - likely too close
+        if area_percentage > 50:
+            return False, is_camera, camera_type, area_percentage
+        
+        # 2. Aspect ratio check - Skip if NOT a camera module
+        aspect_ratio = width / height if height > 0 else 0
+        if not is_camera and (aspect_ratio < 0.2 or aspect_ratio > 3.0):
+            return False, is_camera, camera_type, area_percentage
+        
+        # 3. Confidence check
+        if conf < 0.30:
+            return False, is_camera, camera_type, area_percentage
+        
+        return True, is_camera, camera_type, area_percentage
+
+    def _is_back_camera_module(self, x1, y1, x2, y2, frame_shape):
         """
         Detect if the object is a BACK CAMERA MODULE pointing at the screen
         This is the most common cheating method - phone held up to show answers
@@ -264,8 +327,8 @@ class MobilePhoneDetector:
         )
         
         # ============ POSITION ANALYSIS ============
-        frame_height = frame.shape[0]
-        frame_width = frame.shape[1]
+        frame_height = frame_shape[0]
+        frame_width = frame_shape[1]
         
         # Camera module is typically in UPPER half
         is_upper_position = y1 < frame_height * 0.5
@@ -294,15 +357,17 @@ class MobilePhoneDetector:
             
         return is_back_camera, camera_type
 
-    def _cleanup(self, current_time):
+    def _cleanup(self, current_time, phone_tracker=None):
         """Remove old tracking entries"""
+        if phone_tracker is None:
+            phone_tracker = self.phone_tracker
         to_delete = []
-        for pid, info in self.phone_tracker.items():
+        for pid, info in phone_tracker.items():
             if current_time - info['last_seen'] > 2.0:
                 to_delete.append(pid)
         
         for pid in to_delete:
-            del self.phone_tracker[pid]
+            del phone_tracker[pid]
 
     def reset(self):
         """Reset for new exam session"""
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
 class ExamSession(models.Model):
     candidate_id = models.CharField(max_length=100, db_index=True)
@@ -9,31 +9,111 @@ class ExamSession(models.Model):
     can_retake = models.BooleanField(default=False)
     retake_requested = models.BooleanField(default=False, db_index=True)
     retake_reason = models.TextField(blank=True, null=True)
+    # Exam being taken - known before any result exists, so in-progress and terminated
+    # sessions still show up in per-exam exports and analytics
+    exam = models.ForeignKey('Exam', on_delete=models.SET_NULL, null=True, blank=True, related_name='sessions')
     
     class Meta:
         indexes = [
             models.Index(fields=['candidate_id', 'terminated']),
             models.Index(fields=['candidate_id', 'completed']),
         ]
+        constraints = [
+            # At most one active session per candidate - also the index behind active lookups
+            models.UniqueConstraint(fields=['candidate_id'], condition=models.Q(terminated=False),
+                                    name='uniq_active_session_per_candidate'),
+        ]
     
     def __str__(self):
         return f"Session {self.candidate_id}"
 
+    @classmethod
+    def active_for(cls, candidate_id):
+        """The candidate's active (not terminated) session, or None"""
+        return cls.objects.filter(candidate_id=candidate_id, terminated=False).first()
+
+    @staticmethod
+    def _known_exam(exam_id):
+        """exam_id as sent by the client, if it names an exam; else None"""
+        try:
+            exam_id = int(exam_id)
+        except (TypeError, ValueError):
+            return None
+        return exam_id if Exam.objects.filter(id=exam_id).exists() else None
+
+    @classmethod
+    def acquire_active(cls, candidate_id, exam_id=None):
+        """
+        Fetch the candidate's active session, creating it if there is none.
+        Returns (session, created). Concurrent first frames race on the partial
+        unique constraint: the loser's insert fails and it fetches the winner's row.
+        A new session is for `exam_id`, else the first active exam (as QuestionViewSet).
+        """
+        session = cls.active_for(candidate_id)
+        if session is not None:
+            if session.exam_id is None:
+                exam_id = cls._known_exam(exam_id)
+                if exam_id:
+                    cls.objects.filter(id=session.id).update(exam_id=exam_id)
+                    session.exam_id = exam_id
+            return session, False
+        exam_id = cls._known_exam(exam_id)
+        if not exam_id:
+            exam_id = Exam.objects.filter(is_active=True).values_list('id', flat=True).first()
+        try:
+            with transaction.atomic():
+                return cls.objects.create(candidate_id=candidate_id, exam_id=exam_id), True
+        except IntegrityError:
+            return cls.objects.get(candidate_id=candidate_id, terminated=False), False
+
 class Violation(models.Model):
+    """
+    One violation episode (see proctor.episodes): opened at `timestamp` by the
+    first frame showing it, extended by every later frame that still does.
+    """
     session = models.ForeignKey(ExamSession, on_delete=models.CASCADE, db_index=True)
     reason = models.CharField(max_length=255)
     timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_seen_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(null=True, blank=True)  # None while the episode is open
+    frame_count = models.PositiveIntegerField(default=1)
     
     class Meta:
         indexes = [
             models.Index(fields=['session', 'timestamp']),
+            models.Index(fields=['session', 'reason'], condition=models.Q(ended_at__isnull=True),
+                         name='violation_open_episode_idx'),
         ]
     
     def __str__(self):
         return f"{self.reason} at {self.timestamp}"
 
+class ViolationSummary(models.Model):
+    """
+    Hourly violation counts per session and reason, maintained incrementally as
+    violations are recorded (proctor.analytics). Analytics read this table
+    instead of scanning Violation, and it outlives evidence purges.
+    """
+    session = models.ForeignKey(ExamSession, on_delete=models.CASCADE)
+    candidate_id = models.CharField(max_length=100, db_index=True)
+    reason = models.CharField(max_length=255)
+    hour = models.DateTimeField(db_index=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'reason', 'hour'], name='uniq_violation_summary_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate_id} - {self.reason} @ {self.hour}: {self.count}"
+
 class Screenshot(models.Model):
     session = models.ForeignKey(ExamSession, on_delete=models.CASCADE, db_index=True)
+    # Episode this is the evidence for - no database constraint, since either table may be
+    # range-partitioned and purged by dropping partitions (see proctor.retention)
+    violation = models.ForeignKey(Violation, on_delete=models.DO_NOTHING, null=True, blank=True,
+                                  db_constraint=False, related_name='screenshots')
     image = models.TextField()
     reason = models.CharField(max_length=255)
     captured_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -67,6 +147,25 @@ class Question(models.Model):
     def __str__(self):
         return self.text[:50]
 
+class AnswerKey(models.Model):
+    """
+    Snapshot of an exam's answer key, precomputed for grading (see proctor.grading).
+    A new version is written whenever the exam's questions or correct answers change.
+    """
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='answer_keys')
+    version = models.PositiveIntegerField()
+    question_ids = models.TextField()  # comma-separated Question ids, in grading order
+    answers = models.TextField()       # one correct letter per question, same order
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['exam', 'version'], name='uniq_answer_key_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.exam} key v{self.version} ({len(self.answers)} questions)"
+
 class TestResult(models.Model):
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, null=True, blank=True)
     session = models.OneToOneField(ExamSession, on_delete=models.SET_NULL, null=True, blank=True)
@@ -74,6 +173,9 @@ class TestResult(models.Model):
     score = models.IntegerField()
     total_questions = models.IntegerField()
     date_taken = models.DateTimeField(auto_now_add=True)
+    # Server-graded submissions: the chosen letter per question of `answer_key` ('-' = unanswered)
+    answers = models.TextField(blank=True, default='')
+    answer_key = models.ForeignKey(AnswerKey, on_delete=models.SET_NULL, null=True, blank=True)
     
     def __str__(self):
         return f"{self.student_name} - {self.score}/{self.total_questions}"
@@ -95,3 +197,44 @@ class Student(models.Model):
     
     def __str__(self):
         return f"{self.student_id} - {self.name}"
+
+class ScreenshotRescore(models.Model):
+    """Offline re-analysis of stored evidence (see `manage.py rescore_screenshots`)"""
+    screenshot = models.ForeignKey(Screenshot, on_delete=models.CASCADE, related_name='rescores')
+    run_label = models.CharField(max_length=100, db_index=True)
+    face_count = models.IntegerField(default=0)
+    phone_count = models.IntegerField(default=0)
+    phone_confidence = models.FloatField(null=True, blank=True)
+    prohibited_objects = models.CharField(max_length=255, blank=True)  # comma-separated item names
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['screenshot', 'run_label'], name='uniq_rescore_per_run'),
+        ]
+
+    def __str__(self):
+        return f"Rescore {self.run_label}: screenshot {self.screenshot_id}"
+
+class RetentionPolicy(models.Model):
+    """
+    How long Violation / Screenshot evidence is kept (see `manage.py purge_evidence`).
+    A policy with no exam is the default for every session not covered by an
+    exam-specific policy.
+    """
+    ARCHIVE_BY_DAY = 'day'
+    ARCHIVE_BY_EXAM = 'exam'
+
+    name = models.CharField(max_length=200)
+    exam = models.OneToOneField(Exam, on_delete=models.CASCADE, null=True, blank=True, related_name='retention_policy')
+    max_age_days = models.PositiveIntegerField(default=180)
+    archive = models.BooleanField(default=True)  # Write evidence to compressed archive files before deleting
+    archive_by = models.CharField(max_length=10, default=ARCHIVE_BY_DAY,
+                                  choices=[(ARCHIVE_BY_DAY, 'One file per day'), (ARCHIVE_BY_EXAM, 'One file per exam')])
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        target = self.exam.name if self.exam else 'All exams'
+        return f"{self.name} ({target}: {self.max_age_days} days)"
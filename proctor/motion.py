@@ -0,0 +1,78 @@
+# motion.py - INCREMENTAL BACKGROUND MODEL FOR MOVEMENT DETECTION
+import cv2
+import numpy as np
+
+
+class MotionModel:
+    """
+    Per-candidate running-average background on a small blurred gray frame.
+    Movement is the percentage of pixels that differ from the background.
+    Heavy movement keeps the original trigger: the score exceeds
+    max(35, 1.8 x the average of the last `history_size` scores, current
+    included), once more than `min_history` scores have been seen. The
+    window lives in a fixed ring with a running sum, so each frame costs
+    O(1) beyond one small absdiff.
+    """
+
+    def __init__(self, background_alpha=0.3, pixel_threshold=25, warmup_frames=5,
+                 history_size=10, min_history=5):
+        self.background_alpha = background_alpha
+        self.pixel_threshold = pixel_threshold
+        self.warmup_frames = warmup_frames
+        self.min_history = min_history
+
+        self.background = None
+        self._background_u8 = None
+        self._diff = None
+        self.samples = 0
+        self._history = np.zeros(history_size, dtype=np.float64)
+        self._history_len = 0
+        self._history_pos = 0
+        self._history_sum = 0.0
+
+    def update(self, gray):
+        """
+        Feed one gray frame. Returns (movement_score, heavy_movement), or
+        (None, False) while the model is still warming up.
+        """
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self._background_u8 = np.empty_like(gray)
+            self._diff = np.empty_like(gray)
+            self.samples = 0
+            self._reset_history()
+            return None, False
+
+        cv2.convertScaleAbs(self.background, dst=self._background_u8)
+        cv2.absdiff(gray, self._background_u8, dst=self._diff)
+        cv2.threshold(self._diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+        movement = cv2.countNonZero(self._diff) * 100.0 / self._diff.size
+        cv2.accumulateWeighted(gray, self.background, self.background_alpha)
+
+        warmed_up = self.samples >= self.warmup_frames
+        self.samples += 1
+        if not warmed_up:
+            return None, False
+
+        self._push(movement)
+        heavy = self._history_len > self.min_history and movement > max(35, self.mean * 1.8)
+        return movement, heavy
+
+    @property
+    def mean(self):
+        return self._history_sum / self._history_len if self._history_len else 0.0
+
+    def _push(self, movement):
+        if self._history_len == len(self._history):
+            self._history_sum -= self._history[self._history_pos]
+        else:
+            self._history_len += 1
+        self._history[self._history_pos] = movement
+        self._history_sum += movement
+        self._history_pos = (self._history_pos + 1) % len(self._history)
+
+    def _reset_history(self):
+        self._history.fill(0.0)
+        self._history_len = 0
+        self._history_pos = 0
+        self._history_sum = 0.0
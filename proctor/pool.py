@@ -0,0 +1,224 @@
+# pool.py - DETECTOR REPLICA POOL AND FAIR FRAME SCHEDULER
+#
+# cv2.dnn.Net and the torch models can't be called from two threads on one
+# instance, so a single ProctorDetector serves one frame at a time. The pool
+# holds a bounded number of replicas that share the torch weights and the
+# candidate state store (see ProctorDetector.replica and state.py), each driven
+# by its own worker thread.
+#
+# Request threads don't race for a replica. They drop their frame into the
+# candidate's slot in the FrameScheduler - one slot per candidate holding only
+# the latest frame; an older frame still waiting there is superseded - and the
+# workers take candidates in turn:
+#   1. candidates not analysed for longer than 1 / min_rate seconds, most overdue first
+#   2. candidates mid-countdown (phone grace period, face buffer about to trigger)
+#   3. everyone else, round-robin
+# A client sending 5 fps then gets no more analysis than one sending 1 fps.
+# Frames whose deadline (see deadlines.py) passed while queued are dropped, not analysed,
+# and so are frames whose request stopped waiting: every analysed frame has a
+# request that records its violations. Once a frame is being analysed its request
+# waits until the frame's deadline (at least one typical frame's cost), never for
+# ever: a hung inference answers with the last result instead of holding the
+# request thread - the next frame showing the same finding records it.
+import threading
+import time
+from collections import deque
+
+from .deadlines import expired
+
+
+class FrameSlot:
+    __slots__ = ('frame', 'scale', 'captured_at', 'deadline', 'started', 'done', 'superseded', 'result', 'error')
+
+    def __init__(self, frame, scale, captured_at=None, deadline=None):
+        self.frame = frame
+        self.scale = scale
+        self.captured_at = captured_at  # server-clock capture time (None: analysis time)
+        self.deadline = deadline        # epoch seconds after which the frame is dropped
+        self.started = threading.Event()  # picked up by a worker, superseded or dropped
+        self.done = threading.Event()
+        self.superseded = False
+        self.result = None
+        self.error = None
+
+    def supersede(self):
+        """Not analysed - a newer frame took the slot, or the deadline passed"""
+        self.superseded = True
+        self.frame = None
+        self.started.set()
+        self.done.set()
+
+
+class FrameScheduler:
+    def __init__(self, load_monitor, min_rate=0.5):
+        self.load_monitor = load_monitor
+        self.min_interval = 1.0 / min_rate if min_rate > 0 else float('inf')  # seconds
+        self.cond = threading.Condition()
+        self.pending = {}        # candidate_id -> FrameSlot (latest frame, not started)
+        self.order = deque()     # candidates with a pending frame, round-robin order
+        self.last_served = {}    # candidate_id -> monotonic time its last frame was picked
+        self.superseded = 0
+        self.stale = 0
+        self.overran = 0         # started frames their request stopped waiting for
+        self.picks = 0
+
+    def submit(self, candidate_id, frame, scale=1, captured_at=None, deadline=None):
+        slot = FrameSlot(frame, scale, captured_at, deadline)
+        self.load_monitor.wait_started(candidate_id)
+        with self.cond:
+            previous = self.pending.get(candidate_id)
+            if previous is not None:
+                # Keep the candidate's place in the rotation, analyse the newer frame
+                previous.supersede()
+                self.superseded += 1
+                self.load_monitor.wait_finished()
+            else:
+                self.order.append(candidate_id)
+                self.last_served.setdefault(candidate_id, time.monotonic())
+            self.pending[candidate_id] = slot
+            self.cond.notify()
+        return slot
+
+    def next_slot(self, boosted=None):
+        """Block until a frame is pending; returns (candidate_id, slot) of the candidate to serve next"""
+        with self.cond:
+            while not self.pending:
+                self.cond.wait()
+            now = time.monotonic()
+            candidate_id = self._pick(now, boosted)
+            self.order.remove(candidate_id)
+            slot = self.pending.pop(candidate_id)
+            self.last_served[candidate_id] = now
+            self.picks += 1
+            if self.picks % 1000 == 0:
+                self._forget_idle(now)
+        self.load_monitor.wait_finished()
+        slot.started.set()
+        return candidate_id, slot
+
+    def cancel(self, candidate_id, slot):
+        """Withdraw a frame nobody is waiting for any more - False if a worker already took it"""
+        with self.cond:
+            if self.pending.get(candidate_id) is not slot:
+                return slot.superseded
+            del self.pending[candidate_id]
+            self.order.remove(candidate_id)
+            slot.supersede()
+        self.load_monitor.wait_finished()
+        return True
+
+    def _pick(self, now, boosted):
+        overdue = max(self.order, key=lambda c: now - self.last_served[c])
+        if now - self.last_served[overdue] > self.min_interval:
+            return overdue
+        if boosted is not None:
+            for candidate_id in self.order:
+                if boosted(candidate_id):
+                    return candidate_id
+        return self.order[0]
+
+    def _forget_idle(self, now):
+        # Candidates that stopped sending (exam over) - a returning one starts a fresh rotation
+        cutoff = now - max(self.load_monitor.window, self.min_interval if self.min_interval != float('inf') else 0)
+        for candidate_id in [c for c, t in self.last_served.items() if t < cutoff and c not in self.pending]:
+            del self.last_served[candidate_id]
+
+    def clear(self):
+        with self.cond:
+            for slot in self.pending.values():
+                slot.supersede()
+                self.load_monitor.wait_finished()
+            self.pending.clear()
+            self.order.clear()
+            self.last_served.clear()
+
+    def snapshot(self):
+        with self.cond:
+            now = time.monotonic()
+            return {
+                'pending_candidates': len(self.pending),
+                'superseded_frames': self.superseded,
+                'stale_frames': self.stale,
+                'overran_frames': self.overran,
+                'max_wait_ms': round(max((now - self.last_served[c] for c in self.order), default=0) * 1000),
+            }
+
+
+class DetectorPool:
+    def __init__(self, primary, size=1, checkout_timeout=1.0, min_rate=0.5, analysis_timeout=5.0):
+        self.primary = primary
+        self.replicas = [primary] + [primary.replica() for _ in range(size - 1)]
+        self.checkout_timeout = checkout_timeout  # seconds a request waits for its frame to be picked up
+        self.analysis_timeout = analysis_timeout  # seconds a started frame without a deadline is waited for
+
+        self.load_monitor = primary.load_monitor
+        self.load_monitor.replicas = len(self.replicas)
+        self.scheduler = FrameScheduler(self.load_monitor, min_rate=min_rate)
+        for index, replica in enumerate(self.replicas):
+            threading.Thread(target=self._work, args=(replica,), daemon=True,
+                             name=f"proctor-frame-worker-{index}").start()
+        print(f"🧩 Detector pool ready with {len(self.replicas)} replica(s), "
+              f"min {min_rate} analysed frame(s)/s per candidate")
+
+    @property
+    def preprocessor(self):
+        return self.primary.preprocessor
+
+    def _work(self, replica):
+        while True:
+            candidate_id, slot = self.scheduler.next_slot(boosted=self.primary.needs_attention)
+            if expired(slot.deadline):
+                # Too old to be worth analysing - the request answers with the last result
+                self.scheduler.stale += 1
+                slot.supersede()
+                continue
+            try:
+                slot.result = replica.analyze_frame(slot.frame, candidate_id=candidate_id, scale=slot.scale,
+                                                    captured_at=slot.captured_at)
+            except Exception as e:
+                print(f"❌ Frame worker error for {candidate_id}: {e}")
+                slot.error = e
+            finally:
+                slot.frame = None
+                slot.done.set()
+
+    def analyze_frame(self, frame, candidate_id='guest_user', scale=1, timeout=None, captured_at=None, deadline=None):
+        slot = self.scheduler.submit(candidate_id, frame, scale, captured_at, deadline)
+        timeout = self.checkout_timeout if timeout is None else timeout
+        if deadline is not None:
+            timeout = max(0.0, min(timeout, deadline - time.time()))
+        if not slot.started.wait(timeout) and self.scheduler.cancel(candidate_id, slot):
+            # Not our turn yet: the frame is withdrawn - analysing it with nobody left to record
+            # its violations would mark them logged in the trackers and lose them - and this
+            # request answers with the candidate's last real result
+            return self.primary._busy_result(candidate_id)
+        if not slot.done.wait(self._analysis_wait(deadline)):
+            with self.scheduler.cond:
+                self.scheduler.overran += 1
+            print(f"⏱️ Analysis of {candidate_id}'s frame overran its deadline - answering with the last result")
+            return self.primary._busy_result(candidate_id)
+        if slot.superseded:
+            # A newer frame from this candidate took the slot, or it went stale in the queue
+            return self.primary._busy_result(candidate_id)
+        if slot.error is not None:
+            raise slot.error
+        return slot.result
+
+    def _analysis_wait(self, deadline):
+        """Seconds to wait for a started frame: until its deadline, but at least one typical frame"""
+        if deadline is None:
+            return self.analysis_timeout
+        return max(deadline - time.time(), self.load_monitor.frame_cost or 0.0)
+
+    def stale_result(self, candidate_id, captured_at):
+        """Frame already past its deadline on arrival: last real result, frame left undecoded"""
+        self.scheduler.stale += 1
+        result = self.primary._busy_result(candidate_id)
+        result["stale"] = True
+        result["frame_age_ms"] = int(round((time.time() - captured_at) * 1000))
+        return result
+
+    def reset(self):
+        self.scheduler.clear()
+        for replica in self.replicas:
+            replica.reset()
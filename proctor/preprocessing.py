@@ -0,0 +1,218 @@
+# preprocessing.py - SINGLE-PASS FRAME PREPROCESSING
+#
+# Builds every view of a frame the detectors need exactly once, into buffers
+# that are allocated on first use and reused for every following frame:
+#   - face blob (1x3x300x300 float32, mean-subtracted) for the Caffe face net
+#   - small blurred grayscale image for movement scoring
+#   - letterboxed RGB tensor (1x3xHxW float32, 0-1) shared by both YOLO models
+#   - 64-bit difference hash (dHash) used to skip inference on unchanged frames
+import copy
+import itertools
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import torch
+import torchvision
+
+
+HASH_SIZE = 8
+
+# Autograd context for YOLO forwards - chosen per host by `manage.py autotune_inference`
+GRAD_MODES = {
+    'inference_mode': torch.inference_mode,
+    'no_grad': torch.no_grad,
+}
+_grad_mode = torch.inference_mode
+
+
+def set_grad_mode(name):
+    global _grad_mode
+    _grad_mode = GRAD_MODES[name]
+
+
+def share_weights(model):
+    """
+    Copy of a torch model whose parameters and buffers are the original tensors.
+    Weights stay in memory once; per-call caches (e.g. YOLO's grid) are private.
+    """
+    if model is None:
+        return None
+    memo = {id(t): t for t in itertools.chain(model.parameters(), model.buffers())}
+    return copy.deepcopy(model, memo)
+
+
+def hash_distance(a, b):
+    """Hamming distance between two 64-bit perceptual hashes"""
+    return bin(a ^ b).count('1')
+
+
+class PreparedFrame:
+    """Views of one decoded frame, backed by the preprocessor's buffers"""
+    __slots__ = ('frame', 'width', 'height', 'scale', 'face_blob', 'motion_gray', 'phash',
+                 'yolo_tensor', 'yolo_ratio', 'yolo_pad')
+
+    def to_frame_coords(self, boxes):
+        """
+        Map xyxy boxes from letterboxed YOLO space back to source pixels (in place).
+        Source pixels are those of the image the client sent, even when it was
+        decoded at reduced resolution (see `scale`).
+        """
+        pad_x, pad_y = self.yolo_pad
+        boxes[:, [0, 2]] -= pad_x
+        boxes[:, [1, 3]] -= pad_y
+        boxes *= self.scale / self.yolo_ratio
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, self.width)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, self.height)
+        return boxes
+
+
+class FramePreprocessor:
+    """
+    Per-worker preprocessing stage. NOT thread-safe: each detector owns one
+    and only uses it while holding its lock.
+    """
+    FACE_MEAN = (104.0, 117.0, 123.0)
+    LETTERBOX_COLOR = 114
+    MAX_YOLO_SHAPES = 8   # distinct webcam resolutions with letterbox buffers kept
+
+    def __init__(self, face_size=(300, 300), motion_size=(160, 120), yolo_size=640, yolo_stride=32):
+        self.face_size = face_size
+        self.motion_size = motion_size
+        self.yolo_size = yolo_size
+        self.yolo_stride = yolo_stride
+        # Largest side any stage resizes to - decoding above this is wasted work
+        self.required_side = max(yolo_size, max(face_size), max(motion_size))
+
+        fw, fh = face_size
+        mw, mh = motion_size
+        self._face_bgr = np.empty((fh, fw, 3), np.uint8)
+        self._face_blob = np.empty((1, 3, fh, fw), np.float32)
+        self._face_mean = np.array(self.FACE_MEAN, np.float32).reshape(3, 1, 1)
+        self._motion_bgr = np.empty((mh, mw, 3), np.uint8)
+        self._motion_gray = np.empty((mh, mw), np.uint8)
+        self._motion_blur = np.empty((mh, mw), np.uint8)
+
+        self._hash_thumb = np.empty((HASH_SIZE, HASH_SIZE + 1), np.uint8)
+
+        # Letterbox buffers depend on the source aspect ratio, which is stable
+        # per webcam - keyed by source (h, w) and allocated once per shape; only
+        # the most recently used shapes are kept
+        self._yolo_buffers = OrderedDict()
+
+    def prepare(self, frame, scale=1):
+        """
+        Cheap views every frame needs: motion gray and perceptual hash.
+        `scale` is the source-to-decoded size factor when the frame was decoded
+        at reduced resolution; width/height and boxes are reported at source size.
+        """
+        prepared = PreparedFrame()
+        prepared.frame = frame
+        prepared.scale = scale
+        h, w = frame.shape[:2]
+        prepared.height, prepared.width = int(h * scale), int(w * scale)
+        prepared.motion_gray = self._prepare_motion(frame)
+        prepared.phash = self._dhash(prepared.motion_gray)
+        prepared.face_blob = None
+        prepared.yolo_tensor = None
+        return prepared
+
+    def prepare_inference(self, prepared):
+        """Network inputs - only built when the frame actually goes through inference"""
+        prepared.face_blob = self._prepare_face(prepared.frame)
+        self._prepare_yolo(prepared.frame, prepared)
+        return prepared
+
+    def _prepare_face(self, frame):
+        # Same as blobFromImage(frame, 1.0, (300, 300), mean, swapRB=False) without allocating
+        cv2.resize(frame, self.face_size, dst=self._face_bgr)
+        np.subtract(self._face_bgr.transpose(2, 0, 1), self._face_mean, out=self._face_blob[0])
+        return self._face_blob
+
+    def _prepare_motion(self, frame):
+        cv2.resize(frame, self.motion_size, dst=self._motion_bgr, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._motion_bgr, cv2.COLOR_BGR2GRAY, dst=self._motion_gray)
+        cv2.GaussianBlur(self._motion_gray, (5, 5), 0, dst=self._motion_blur)
+        return self._motion_blur
+
+    def _dhash(self, gray):
+        # Horizontal gradient signs of a 9x8 thumbnail packed into a 64-bit int
+        cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), dst=self._hash_thumb, interpolation=cv2.INTER_AREA)
+        bits = self._hash_thumb[:, 1:] > self._hash_thumb[:, :-1]
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+    def _prepare_yolo(self, frame, prepared):
+        h, w = frame.shape[:2]
+        buffers = self._yolo_buffers.get((h, w))
+        if buffers is None:
+            buffers = self._allocate_yolo_buffers(h, w)
+            self._yolo_buffers[(h, w)] = buffers
+            if len(self._yolo_buffers) > self.MAX_YOLO_SHAPES:
+                self._yolo_buffers.popitem(last=False)
+        else:
+            self._yolo_buffers.move_to_end((h, w))
+        resized, letterbox, letterbox_t, tensor, ratio, (left, top) = buffers
+
+        nh, nw = resized.shape[:2]
+        cv2.resize(frame, (nw, nh), dst=resized, interpolation=cv2.INTER_LINEAR)
+        letterbox[top:top + nh, left:left + nw] = resized
+
+        # BGR (OpenCV) -> RGB (YOLOv5), HWC uint8 -> CHW float 0-1
+        for c in range(3):
+            tensor[0, c].copy_(letterbox_t[:, :, 2 - c])
+        tensor.mul_(1.0 / 255)
+
+        prepared.yolo_tensor = tensor
+        prepared.yolo_ratio = ratio
+        prepared.yolo_pad = (left, top)
+
+    def _allocate_yolo_buffers(self, h, w):
+        # Mirrors YOLOv5 AutoShape: longest side -> yolo_size, pad up to stride multiple
+        ratio = self.yolo_size / max(h, w)
+        nh, nw = max(1, round(h * ratio)), max(1, round(w * ratio))
+        lh = int(np.ceil(nh / self.yolo_stride) * self.yolo_stride)
+        lw = int(np.ceil(nw / self.yolo_stride) * self.yolo_stride)
+        top, left = (lh - nh) // 2, (lw - nw) // 2
+
+        resized = np.empty((nh, nw, 3), np.uint8)
+        letterbox = np.full((lh, lw, 3), self.LETTERBOX_COLOR, np.uint8)
+        letterbox_t = torch.from_numpy(letterbox)  # shares memory with letterbox
+        tensor = torch.empty((1, 3, lh, lw), dtype=torch.float32)
+        return resized, letterbox, letterbox_t, tensor, ratio, (left, top)
+
+
+def yolo_detect(model, prepared, max_det=1000):
+    """
+    Run a YOLOv5 AutoShape model on the shared letterboxed tensor.
+    Applies the model's own conf / iou / classes settings and returns an
+    (N, 6) array of [x1, y1, x2, y2, conf, cls] in source pixel coordinates.
+    """
+    with _grad_mode():
+        out = model(prepared.yolo_tensor)
+    pred = out[0] if isinstance(out, (list, tuple)) else out
+    pred = pred[0]
+
+    pred = pred[pred[:, 4] > model.conf]
+    if not len(pred):
+        return np.zeros((0, 6), np.float32)
+
+    scores = pred[:, 5:] * pred[:, 4:5]
+    conf, cls = scores.max(1)
+    keep = conf > model.conf
+    if model.classes is not None:
+        keep &= torch.isin(cls, torch.as_tensor(model.classes, device=cls.device))
+    pred, conf, cls = pred[keep], conf[keep], cls[keep]
+    if not len(pred):
+        return np.zeros((0, 6), np.float32)
+
+    # xywh -> xyxy
+    boxes = torch.empty_like(pred[:, :4])
+    boxes[:, 0] = pred[:, 0] - pred[:, 2] / 2
+    boxes[:, 1] = pred[:, 1] - pred[:, 3] / 2
+    boxes[:, 2] = pred[:, 0] + pred[:, 2] / 2
+    boxes[:, 3] = pred[:, 1] + pred[:, 3] / 2
+
+    i = torchvision.ops.batched_nms(boxes, conf, cls, model.iou)[:max_det]
+    detections = torch.cat((boxes[i], conf[i, None], cls[i, None].float()), 1).cpu().numpy()
+    prepared.to_frame_coords(detections[:, :4])
+    return detections
@@ -0,0 +1,120 @@
+# renderers.py - COMPACT ANALYZE RESPONSES
+#
+# analyze_frame answers every webcam frame. Its JSON carries float-heavy
+# nested detail lists with repeated emoji type names. Clients that send
+#   Accept: application/vnd.proctor.compact+json   (or ?format=compact)
+#   Accept: application/msgpack                     (or ?format=msgpack, needs `msgpack`)
+# get the compact profile below instead, rendered with a plain json.dumps /
+# msgpack.packb rather than DRF's generic encoder.
+#
+# Compact profile (v1):
+#   - fields at their neutral default are omitted (face_detected: true, other
+#     flags false, zero counts, null, empty lists)
+#   - violation_type / detail "type" -> TYPE_CODES, severity -> SEVERITY_CODES
+#   - detail dicts -> rows, columns in DETAIL_COLUMNS order; confidence in
+#     whole percent, bbox as ints, booleans as 0/1
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import msgpack
+except ImportError:  # optional - the msgpack format is only offered when installed
+    msgpack = None
+
+COMPACT_VERSION = 1
+
+TYPE_CODES = {
+    'Mobile Phone': 1,
+    '📱 Mobile Phone': 1,
+    '💻 Laptop': 2,
+    '📚 Book/Notes': 3,
+    '📚 Book': 3,
+    '📺 TV/Monitor': 4,
+    '⌨️ Keyboard': 5,
+    '🖱️ Remote': 6,
+}
+
+SEVERITY_CODES = {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3}
+
+# Fields omitted while they hold this value
+DEFAULTS = {'face_detected': True}
+
+DETAIL_COLUMNS = {
+    'violation_details': ('type', 'severity', 'confidence', 'bbox', 'time_visible', 'grace_remaining'),
+    'object_details': ('class_id', 'confidence', 'bbox', 'time_visible', 'grace_remaining', 'violation', 'near_face'),
+    'mobile_phone_details': ('confidence', 'bbox', 'time_visible', 'grace_remaining', 'violation', 'camera_module'),
+    'phone_warnings': ('grace_remaining', 'bbox'),
+}
+
+
+def _compact_value(key, value):
+    if value is None:
+        return None
+    if key in ('type', 'violation_type'):
+        return TYPE_CODES.get(value, 0)
+    if key in ('severity', 'violation_severity'):
+        return SEVERITY_CODES.get(value, 0)
+    if key == 'confidence':
+        return int(round(value * 100))
+    if key == 'bbox':
+        return [int(v) for v in value]
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, float):
+        return round(value, 1)
+    return value
+
+
+def compact_result(data):
+    """Compact profile of an analyze_frame result (other payloads pass through)"""
+    if not isinstance(data, dict) or 'face_detected' not in data:
+        return data
+    out = {'v': COMPACT_VERSION}
+    for key, value in data.items():
+        if key in DETAIL_COLUMNS:
+            if value:
+                out[key] = [[_compact_value(c, row.get(c)) for c in DETAIL_COLUMNS[key]] for row in value]
+        elif key in DEFAULTS:
+            if value != DEFAULTS[key]:
+                out[key] = value
+        elif value is None or value is False or value == 0 or value == [] or value == {}:
+            continue
+        elif key in ('violation_type', 'violation_severity'):
+            out[key] = _compact_value(key, value)
+        elif isinstance(value, float):
+            out[key] = round(value, 1)
+        else:
+            out[key] = value
+    return out
+
+
+class CompactJSONRenderer(BaseRenderer):
+    media_type = 'application/vnd.proctor.compact+json'
+    format = 'compact'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(compact_result(data), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class MsgPackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(compact_result(data), use_bin_type=True)
+
+
+def analyze_renderers():
+    """Renderers for analyze_frame: plain JSON by default, compact formats on request"""
+    renderers = [JSONRenderer, CompactJSONRenderer]
+    if msgpack is not None:
+        renderers.append(MsgPackRenderer)
+    return renderers
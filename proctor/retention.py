@@ -0,0 +1,331 @@
+# retention.py - EVIDENCE RETENTION, ARCHIVAL AND PARTITIONING
+#
+# Violation / Screenshot rows for sessions older than their RetentionPolicy are
+# written to gzip-compressed JSON-lines archives (one file per day or per exam)
+# and deleted in bounded batches, so no single statement holds long locks.
+#
+# On PostgreSQL both tables can optionally be range-partitioned by month on
+# their timestamp column (`partition_evidence_tables`); purging whole months
+# then becomes `DROP TABLE` on a partition instead of a row-by-row delete.
+#
+# Both paths purge by the same rule: a session's evidence is due once the
+# session started before the cutoff and is either
+#   - terminated (submitted, reset, removed), or
+#   - abandoned: no violation or screenshot at or after the cutoff
+# A candidate who walked away never terminates their session - it is purged
+# once it has been quiet for the policy's max age. A partition is only dropped
+# when none of its rows belongs to a session that is not due yet.
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from .models import ExamSession, RetentionPolicy, Screenshot, ScreenshotRescore, Violation
+
+# table -> partition key column
+PARTITIONED_TABLES = {
+    Violation._meta.db_table: 'timestamp',
+    Screenshot._meta.db_table: 'captured_at',
+}
+
+
+def archive_dir():
+    path = getattr(settings, 'PROCTOR_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# ============ ROW-LEVEL PURGE (ANY DATABASE) ============
+
+def active_since(cutoff):
+    """Condition on ExamSession: it has a violation or screenshot at or after `cutoff`"""
+    violations = Violation.objects.filter(session=OuterRef('pk')).filter(
+        Q(timestamp__gte=cutoff) | Q(last_seen_at__gte=cutoff))
+    screenshots = Screenshot.objects.filter(session=OuterRef('pk'), captured_at__gte=cutoff)
+    return Exists(violations) | Exists(screenshots)
+
+
+def due_at(cutoff):
+    """Sessions whose evidence may go at `cutoff` - terminated or abandoned (see top of file)"""
+    return ExamSession.objects.filter(started_at__lt=cutoff).filter(Q(terminated=True) | ~active_since(cutoff))
+
+
+def sessions_due(policy, now=None):
+    """Sessions covered by `policy` whose evidence is older than its max age"""
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=policy.max_age_days)
+    sessions = due_at(cutoff)
+    if policy.exam_id:
+        return sessions.filter(exam_id=policy.exam_id)
+    # Default policy: everything not governed by an exam-specific policy
+    exam_ids = RetentionPolicy.objects.filter(is_active=True, exam__isnull=False).values_list('exam_id', flat=True)
+    return sessions.exclude(exam_id__in=list(exam_ids))
+
+
+def apply_policy(policy, now=None, batch_size=500, dry_run=False, log=print):
+    """Archive (optionally) and delete evidence for every session due under `policy`"""
+    totals = {'sessions': 0, 'violations': 0, 'screenshots': 0}
+    session_ids = sessions_due(policy, now).order_by('id').values_list('id', flat=True)
+
+    last_id = 0
+    while True:
+        # Keyset pagination over session ids - stable while rows are being deleted
+        batch = list(session_ids.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1]
+        totals['sessions'] += len(batch)
+        exam_by_session = dict(ExamSession.objects.filter(id__in=batch).values_list('id', 'exam_id'))
+
+        for model, key in ((Violation, 'violations'), (Screenshot, 'screenshots')):
+            totals[key] += _purge_rows(model, batch, policy, exam_by_session, batch_size, dry_run)
+
+    log(f"🗄️  {policy}: {totals['sessions']} session(s), {totals['violations']} violation(s), "
+        f"{totals['screenshots']} screenshot(s){' (dry run)' if dry_run else ''}")
+    return totals
+
+
+def _purge_rows(model, session_ids, policy, exam_by_session, batch_size, dry_run):
+    queryset = model.objects.filter(session_id__in=session_ids).select_related('session').order_by('id')
+    if dry_run:
+        return queryset.count()
+
+    purged = 0
+    while True:
+        rows = list(queryset[:batch_size])
+        if not rows:
+            return purged
+        if policy.archive:
+            write_archive(rows, policy.archive_by, exam_by_session)
+        with transaction.atomic():
+            if model is Screenshot:
+                ScreenshotRescore.objects.filter(screenshot_id__in=[r.id for r in rows]).delete()
+            model.objects.filter(id__in=[r.id for r in rows])._raw_delete(model.objects.db)
+        purged += len(rows)
+
+
+# ============ ARCHIVE FILES ============
+
+def archive_record(row):
+    session = row.session
+    if isinstance(row, Screenshot):
+        return {
+            'type': 'screenshot', 'id': row.id, 'session_id': row.session_id,
+            'candidate_id': session.candidate_id, 'reason': row.reason,
+            'captured_at': row.captured_at.isoformat(), 'image': row.image,
+            'violation_id': row.violation_id,
+        }
+    return {
+        'type': 'violation', 'id': row.id, 'session_id': row.session_id,
+        'candidate_id': session.candidate_id, 'reason': row.reason,
+        'timestamp': row.timestamp.isoformat(),
+        'last_seen_at': row.last_seen_at.isoformat() if row.last_seen_at else None,
+        'ended_at': row.ended_at.isoformat() if row.ended_at else None,
+        'frame_count': row.frame_count,
+    }
+
+
+def write_archive(rows, archive_by, exam_by_session=None):
+    """Append rows to their gzip JSON-lines archive file (gzip members concatenate safely)"""
+    exam_by_session = exam_by_session or {}
+    groups = {}
+    for row in rows:
+        if archive_by == RetentionPolicy.ARCHIVE_BY_EXAM:
+            key = f"exam-{exam_by_session.get(row.session_id) or 'none'}"
+        else:
+            moment = row.captured_at if isinstance(row, Screenshot) else row.timestamp
+            key = moment.date().isoformat()
+        groups.setdefault(key, []).append(row)
+
+    directory = archive_dir()
+    for key, group in groups.items():
+        with gzip.open(os.path.join(directory, f"{key}.jsonl.gz"), 'at', encoding='utf-8') as fh:
+            for row in group:
+                fh.write(json.dumps(archive_record(row)) + '\n')
+
+
+# ============ POSTGRES RANGE PARTITIONING (OPTIONAL) ============
+
+def partitioning_supported():
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned(table):
+    if not partitioning_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [table])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def _month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(moment):
+    return _month_start(moment + timedelta(days=32))
+
+
+def _partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def partition_evidence_tables(months_ahead=3, log=print):
+    """
+    One-time conversion of the Violation / Screenshot tables into tables
+    range-partitioned by month. The primary key becomes (id, <timestamp>), so
+    database-level foreign keys *into* these tables (ScreenshotRescore) are
+    dropped; the ORM still cascades deletes, and `drop_expired_partitions`
+    removes dependent rescores before dropping a partition.
+    """
+    if not partitioning_supported():
+        raise RuntimeError("Range partitioning is only available on PostgreSQL")
+
+    for table, column in PARTITIONED_TABLES.items():
+        if is_partitioned(table):
+            log(f"✅ {table} is already partitioned")
+            continue
+        old = f"{table}_unpartitioned"
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'SELECT MIN("{column}") FROM "{table}"')
+            oldest = cursor.fetchone()[0] or timezone.now()
+
+            cursor.execute("""
+                SELECT con.conname, rel.relname FROM pg_constraint con
+                JOIN pg_class rel ON rel.oid = con.conrelid
+                WHERE con.contype = 'f' AND con.confrelid = %s::regclass
+            """, [table])
+            for constraint, referencing in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE "{referencing}" DROP CONSTRAINT "{constraint}"')
+
+            cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+            cursor.execute(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING IDENTITY) '
+                           f'PARTITION BY RANGE ("{column}")')
+            cursor.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, "{column}")')
+            cursor.execute(f'ALTER TABLE "{table}" ADD FOREIGN KEY (session_id) '
+                           f'REFERENCES "{ExamSession._meta.db_table}" (id) DEFERRABLE INITIALLY DEFERRED')
+            cursor.execute(f'CREATE INDEX ON "{table}" (session_id, "{column}")')
+            cursor.execute(f'CREATE INDEX ON "{table}" ("{column}")')
+            if table == Violation._meta.db_table:
+                # Open episode lookups (see proctor.episodes)
+                cursor.execute(f'CREATE INDEX ON "{table}" (session_id, reason) WHERE ended_at IS NULL')
+            else:
+                cursor.execute(f'CREATE INDEX ON "{table}" (violation_id)')
+            cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+            _create_partitions(cursor, table, _month_start(oldest), months_ahead)
+
+            cursor.execute(f'INSERT INTO "{table}" OVERRIDING SYSTEM VALUE SELECT * FROM "{old}"')
+            cursor.execute(f"SELECT pg_get_serial_sequence('{table}', 'id')")
+            sequence = cursor.fetchone()[0]
+            if sequence:
+                # Identity column: the copied identity got a fresh sequence - continue after existing ids
+                cursor.execute(f'SELECT setval(%s, COALESCE(MAX(id), 0) + 1, false) FROM "{table}"', [sequence])
+            else:
+                # serial column: keep using the old sequence once its table is gone
+                cursor.execute(f"SELECT pg_get_serial_sequence('{old}', 'id')")
+                sequence = cursor.fetchone()[0]
+                if sequence:
+                    cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY "{table}".id')
+            cursor.execute(f'DROP TABLE "{old}"')
+        log(f"✅ {table} partitioned by month on {column}")
+
+
+def ensure_partitions(months_ahead=3):
+    """Create monthly partitions up to `months_ahead` months from now"""
+    with connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(table):
+                _create_partitions(cursor, table, _month_start(timezone.now()), months_ahead)
+
+
+def _create_partitions(cursor, table, start, months_ahead):
+    end = _month_start(timezone.now())
+    for _ in range(months_ahead + 1):
+        end = _next_month(end)
+    month = start
+    while month < end:
+        upper = _next_month(month)
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{_partition_name(table, month)}" PARTITION OF "{table}" '
+            f'FOR VALUES FROM (%s) TO (%s)', [month, upper]
+        )
+        month = upper
+
+
+def drop_expired_partitions(cutoff, archive=True, batch_size=500, dry_run=False, log=print):
+    """
+    Drop monthly partitions that lie entirely before `cutoff`, archiving their
+    rows first. Partitions still holding rows of a session that isn't due at
+    `cutoff` (open and active since) are kept. Returns the names of dropped partitions.
+    """
+    dropped = []
+    not_due = ExamSession.objects.filter(terminated=False).filter(active_since(cutoff)).values('id')
+    with connection.cursor() as cursor:
+        for table, column in PARTITIONED_TABLES.items():
+            if not is_partitioned(table):
+                continue
+            cursor.execute("""
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = %s AND child.relname LIKE %s
+                ORDER BY child.relname
+            """, [table, f"{table}_p%"])
+            for (partition,) in cursor.fetchall():
+                year, month = partition.rsplit('_p', 1)[1].split('_')
+                lower = timezone.make_aware(datetime(int(year), int(month), 1))
+                upper = _next_month(lower)
+                if upper > cutoff:
+                    continue
+                model = Violation if table == Violation._meta.db_table else Screenshot
+                rows = model.objects.filter(**{f'{column}__gte': lower, f'{column}__lt': upper})
+                if rows.filter(session_id__in=not_due).exists():
+                    log(f"🗄️  Keeping {partition}: it holds evidence of sessions still active since the cutoff")
+                    continue
+                if dry_run:
+                    log(f"🗄️  Would drop {partition}")
+                    dropped.append(partition)
+                    continue
+
+                if archive:
+                    _archive_in_batches(rows, batch_size)
+                if model is Screenshot:
+                    ScreenshotRescore.objects.filter(
+                        screenshot_id__in=rows.values('id')
+                    )._raw_delete(ScreenshotRescore.objects.db)
+                cursor.execute(f'DROP TABLE "{partition}"')
+                dropped.append(partition)
+                log(f"🗄️  Dropped partition {partition}")
+    return dropped
+
+
+def _archive_in_batches(queryset, batch_size):
+    exam_by_session = {}
+    rows = []
+    for row in queryset.select_related('session').order_by('id').iterator(chunk_size=batch_size):
+        rows.append(row)
+        if len(rows) >= batch_size:
+            write_archive(rows, RetentionPolicy.ARCHIVE_BY_DAY, exam_by_session)
+            rows = []
+    if rows:
+        write_archive(rows, RetentionPolicy.ARCHIVE_BY_DAY, exam_by_session)
+
+
+def global_cutoff(now=None):
+    """
+    Newest instant before which *every* active policy has expired evidence.
+    None unless a default (all exams) policy exists - without one, exams that
+    have no policy keep their evidence forever and no partition may be dropped.
+    """
+    now = now or timezone.now()
+    policies = RetentionPolicy.objects.filter(is_active=True)
+    if not policies.filter(exam__isnull=True).exists():
+        return None
+    longest = policies.aggregate(days=Max('max_age_days'))['days']
+    return now - timedelta(days=longest)
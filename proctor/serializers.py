@@ -19,7 +19,7 @@ class ScreenshotSerializer(serializers.ModelSerializer):
 class ViolationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Violation
-        fields = ['id', 'reason', 'timestamp']
+        fields = ['id', 'reason', 'timestamp', 'last_seen_at', 'ended_at', 'frame_count']
 
 class ExamSessionSerializer(serializers.ModelSerializer):
     violations_list = ViolationSerializer(many=True, read_only=True, source='violation_set')
@@ -27,7 +27,7 @@ class ExamSessionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ExamSession
-        fields = ['id', 'candidate_id', 'violations', 'terminated', 'started_at', 'violations_list', 'screenshots']
+        fields = ['id', 'candidate_id', 'exam', 'violations', 'terminated', 'started_at', 'violations_list', 'screenshots']
 
 class TestResultSerializer(serializers.ModelSerializer):
     session = ExamSessionSerializer(read_only=True)
@@ -36,3 +36,5 @@ class TestResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = TestResult
         fields = '__all__'
+        # Graded on the server (TestResultViewSet.submit) - never written by clients
+        read_only_fields = ['score', 'total_questions', 'answers', 'answer_key']
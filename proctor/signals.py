@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.db import transaction
+from django.dispatch import receiver
+
+from .analytics import record_violation
+from .models import Question, Violation
+
+
+@receiver(post_save, sender=Violation)
+def update_violation_summary(sender, instance, created, **kwargs):
+    if created:
+        record_violation(instance)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_answer_key(sender, instance, **kwargs):
+    if instance.exam_id:
+        # grading pulls in numpy - only import it once questions are actually edited
+        from .grading import refresh_answer_key
+        exam_id = instance.exam_id
+        # Write the new key version once the edit is committed - other workers compare their cached
+        # key against the latest version; a bulk edit in one transaction writes one new version
+        transaction.on_commit(lambda: refresh_answer_key(exam_id))
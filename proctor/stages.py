@@ -0,0 +1,39 @@
+# stages.py - CONCURRENT DETECTION STAGES
+#
+# The face net, phone YOLO and object YOLO only read the shared PreparedFrame
+# and release the GIL inside native code, so within one frame they can run
+# side by side. Outputs are joined before the (sequential) tracking logic.
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StageExecutor:
+    def __init__(self, max_workers=1, torch_threads=None):
+        self.max_workers = max_workers
+        self.torch_threads = torch_threads
+        self.pool = None
+        if max_workers > 1:
+            self.pool = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix='proctor-stage',
+                initializer=self._init_thread,
+            )
+
+    def _init_thread(self):
+        # Torch keeps the intra-op thread count per calling thread
+        if self.torch_threads:
+            import torch
+            torch.set_num_threads(self.torch_threads)
+
+    def run(self, stages):
+        """
+        stages: {name: callable}. Returns {name: output} once every stage finished.
+        The first stage runs on the calling thread, the rest on the pool.
+        """
+        if self.pool is None or len(stages) <= 1:
+            return {name: stage() for name, stage in stages.items()}
+        (first, first_stage), *rest = stages.items()
+        futures = {name: self.pool.submit(stage) for name, stage in rest}
+        outputs = {first: first_stage()}
+        for name, future in futures.items():
+            outputs[name] = future.result()
+        return outputs
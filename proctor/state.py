@@ -0,0 +1,193 @@
+# state.py - PER-CANDIDATE PROCTORING STATE, SHARED ACROSS WORKERS
+#
+# Face buffers, the prohibited-object tracker and the phone tracker used to
+# live in each gunicorn worker's ProctorDetector, so a candidate's frames had
+# to keep landing on the same worker or their grace periods started over.
+# They now live in a state store, one small record per candidate, updated with
+# an atomic read-modify-write per analysed frame:
+#
+#   state = store.acquire(candidate_id)    # lock the candidate, read the record
+#   ...advance buffers / trackers...
+#   store.release(candidate_id, state)     # write it back, unlock
+#
+#   LocalStateStore  - in-process dict + per-candidate locks (one worker, dev)
+#   RedisStateStore  - msgpack (or compact JSON) record per candidate in Redis,
+#                      guarded by a Redis lock: any worker on any host can
+#                      serve any frame, no sticky routing
+#
+# Heavy per-candidate data stays in each worker: the motion background (a frame
+# sized array - a worker seeing a candidate for the first time warms it up
+# again), the perceptual-hash detection cache and the last result. A worker
+# drops them once the candidate has sent nothing for PROCTOR_STATE_TTL seconds.
+import json
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:  # optional - records fall back to compact JSON
+    msgpack = None
+
+
+def new_state():
+    return {
+        'buffers': {'no_face': 0, 'multiple_faces': 0},
+        'objects': {},   # obj_id -> object track (see ProctorDetector.analyze_frame)
+        'phones': {},    # phone_id -> phone track (see MobilePhoneDetector.detect_phones)
+        'clock': None,   # capture time of the latest analysed frame - timers never run backwards
+    }
+
+
+def encode(state):
+    """Compact record: b'm' + msgpack, or b'j' + JSON when msgpack isn't installed"""
+    if msgpack is not None:
+        return b'm' + msgpack.packb(state, use_bin_type=True)
+    return b'j' + json.dumps(state, separators=(',', ':')).encode()
+
+
+def decode(blob):
+    if not blob:
+        return new_state()
+    try:
+        if blob[:1] == b'm' and msgpack is not None:
+            return msgpack.unpackb(blob[1:], raw=False)
+        if blob[:1] == b'j':
+            return json.loads(blob[1:])
+    except (ValueError, TypeError) as e:
+        print(f"⚠️ Unreadable candidate state, starting over: {e}")
+    return new_state()
+
+
+class LocalStateStore:
+    """Candidate state in this process only - replicas share it, other workers don't"""
+
+    def __init__(self, ttl=300.0, stripes=64):
+        self.ttl = ttl                # seconds before a silent candidate's state is forgotten
+        self.lock = threading.Lock()
+        # A candidate's frames are serialised on one of a fixed set of locks - the
+        # tracker update is microseconds, so sharing a stripe costs nothing measurable
+        self.stripes = [threading.Lock() for _ in range(stripes)]
+        self.states = {}              # candidate_id -> state dict
+        self.touched = {}             # candidate_id -> monotonic time of last release
+        self.calls = 0
+
+    def _stripe(self, candidate_id):
+        return self.stripes[hash(candidate_id) % len(self.stripes)]
+
+    def acquire(self, candidate_id):
+        self._stripe(candidate_id).acquire()
+        with self.lock:
+            state = self.states.get(candidate_id)
+        return new_state() if state is None else state
+
+    def release(self, candidate_id, state):
+        now = time.monotonic()
+        with self.lock:
+            self.states[candidate_id] = state
+            self.touched[candidate_id] = now
+            self.calls += 1
+            if self.calls % 1000 == 0:
+                self._forget_idle(now)
+        self._stripe(candidate_id).release()
+
+    def _forget_idle(self, now):
+        for candidate_id in [c for c, t in self.touched.items() if now - t > self.ttl]:
+            del self.states[candidate_id]
+            del self.touched[candidate_id]
+
+    def clear(self):
+        with self.lock:
+            self.states.clear()
+            self.touched.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {'state_store': 'local', 'candidates': len(self.states)}
+
+
+class RedisStateStore:
+    """Candidate state in Redis - one record and one lock key per candidate"""
+
+    def __init__(self, url, ttl=300.0, lock_timeout=5.0, lock_wait=2.0, prefix='proctor:state:'):
+        import redis
+
+        self.redis = redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = int(ttl)                 # seconds a silent candidate's record is kept
+        self.lock_timeout = lock_timeout    # seconds before a lock held by a dead worker expires
+        self.lock_wait = lock_wait          # seconds to wait for another worker's frame
+        self.prefix = prefix
+        # Used while Redis is unreachable, so frames are still analysed (per worker)
+        self.fallback = LocalStateStore(ttl)
+        self.held = threading.local()      # candidate_id -> lock / 'fallback', per thread
+        self.failures = 0
+
+    def _key(self, candidate_id):
+        return f"{self.prefix}{candidate_id}"
+
+    def _held(self):
+        held = getattr(self.held, 'locks', None)
+        if held is None:
+            held = self.held.locks = {}
+        return held
+
+    def acquire(self, candidate_id):
+        key = self._key(candidate_id)
+        lock = self.client.lock(f"{key}:lock", timeout=self.lock_timeout, blocking_timeout=self.lock_wait)
+        try:
+            if not lock.acquire():
+                # Another worker is stuck on this candidate - go ahead rather than stall the frame
+                print(f"⚠️ Candidate state for {candidate_id} still locked after {self.lock_wait}s, proceeding")
+                lock = None
+            state = decode(self.client.get(key))
+        except self.redis.RedisError as e:
+            self._failed(e)
+            self._held()[candidate_id] = 'fallback'
+            return self.fallback.acquire(candidate_id)
+        self._held()[candidate_id] = lock
+        return state
+
+    def release(self, candidate_id, state):
+        lock = self._held().pop(candidate_id, None)
+        if lock == 'fallback':
+            self.fallback.release(candidate_id, state)
+            return
+        try:
+            self.client.set(self._key(candidate_id), encode(state), ex=self.ttl)
+            if lock is not None:
+                lock.release()
+        except self.redis.exceptions.LockError:
+            print(f"⚠️ Candidate state lock for {candidate_id} expired before the frame finished")
+        except self.redis.RedisError as e:
+            self._failed(e)
+
+    def _failed(self, error):
+        self.failures += 1
+        if self.failures == 1 or self.failures % 100 == 0:
+            print(f"❌ Redis state store unavailable ({self.failures} failure(s)), using worker-local state: {error}")
+
+    def clear(self):
+        self.fallback.clear()
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.prefix}*", count=1000))
+            if keys:
+                self.client.delete(*keys)
+        except self.redis.RedisError as e:
+            self._failed(e)
+
+    def snapshot(self):
+        return {'state_store': 'redis', 'state_store_failures': self.failures}
+
+
+def get_state_store():
+    """Store named by PROCTOR_STATE_STORE: 'local', or a redis:// URL"""
+    backend = getattr(settings, 'PROCTOR_STATE_STORE', 'local') or 'local'
+    ttl = getattr(settings, 'PROCTOR_STATE_TTL', 300)
+    if backend.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            return RedisStateStore(backend, ttl=ttl)
+        except ImportError:
+            print("⚠️ PROCTOR_STATE_STORE points at Redis but `redis` isn't installed - using worker-local state")
+    return LocalStateStore(ttl=ttl)
@@ -0,0 +1,389 @@
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+
+from .grading import NO_ANSWER, _cache_key, _key_arrays, current_answer_key, grade_submission, key_arrays
+from .backpressure import LoadMonitor
+from .episodes import end_episodes, episode_gap, frame_findings, record_frame, touch_episodes
+from .management.commands.detector_regression import category_scores, reason_categories, score_problems
+from .motion import MotionModel
+from .models import AnswerKey, Exam, ExamSession, Question, RetentionPolicy, Screenshot, TestResult, Violation
+from .pool import DetectorPool, FrameScheduler
+from .retention import apply_policy
+from . import state as state_module
+from .state import LocalStateStore, RedisStateStore, decode, encode, new_state
+
+
+class AnswerKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Rolled-back keys' ids are reused between tests
+        _key_arrays.clear()
+        self.exam = Exam.objects.create(name="Key test")
+
+    def add_question(self, correct_answer):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Question.objects.create(exam=self.exam, text="Q", option_a="a", option_b="b",
+                                           option_c="c", option_d="d", correct_answer=correct_answer)
+
+    def test_lowercase_and_padded_answers_are_normalised(self):
+        first = self.add_question('b')
+        second = self.add_question(' c ')
+        sheet, score, total, _ = grade_submission(self.exam.pk, {first.pk: 'B', second.pk: 'c'})
+        self.assertEqual(sheet, 'BC')
+        self.assertEqual((score, total), (2, 2))
+
+    def test_non_ascii_and_invalid_answers_never_match(self):
+        valid = self.add_question('A')
+        accented = self.add_question('é')
+        blank = self.add_question('')
+        key_id = current_answer_key(self.exam.pk)
+        self.assertEqual(AnswerKey.objects.get(id=key_id).answers, 'A' + NO_ANSWER * 2)
+        _, score, total, _ = grade_submission(self.exam.pk, {valid.pk: 'A', accented.pk: 'E', blank.pk: 'A'})
+        self.assertEqual((score, total), (1, 3))
+
+    def test_stale_cached_key_from_another_worker_is_not_trusted(self):
+        question = self.add_question('A')
+        old_key_id = current_answer_key(self.exam.pk)
+        key_arrays(old_key_id)
+
+        question.correct_answer = 'D'
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+        # Another worker's cache still points at the old version
+        cache.set(_cache_key(self.exam.pk), old_key_id)
+
+        _, score, _, key_id = grade_submission(self.exam.pk, {question.pk: 'D'})
+        self.assertNotEqual(key_id, old_key_id)
+        self.assertEqual(score, 1)
+
+
+class SubmissionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        _key_arrays.clear()
+        self.client = Client(HTTP_HOST='localhost')
+        self.active = Exam.objects.create(name="Active", is_active=True)
+        self.exam = Exam.objects.create(name="Proctored", is_active=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question = Question.objects.create(exam=self.exam, text="Q", option_a="a", option_b="b",
+                                                    option_c="c", option_d="d", correct_answer='B')
+        self.session = ExamSession.objects.create(candidate_id="cand@x", exam=self.exam)
+
+    def post(self, url, **data):
+        return self.client.post(url, {'student_name': 'cand@x', **data}, content_type='application/json')
+
+    def test_results_endpoint_grades_instead_of_trusting_client_scores(self):
+        response = self.post('/api/proctor/results/', score=99, total_questions=99,
+                             answers={self.question.pk: 'A'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['score'], response.json()['total_questions']), (0, 1))
+        self.assertEqual(self.post('/api/proctor/results/', score=99, total_questions=99).status_code, 400)
+
+    def test_graded_against_the_sessions_exam_when_none_given(self):
+        response = self.post('/api/proctor/results/submit/', answers={self.question.pk: 'B'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['exam'], self.exam.pk)
+        self.assertEqual(response.json()['score'], 1)
+
+    def test_concurrent_submit_of_one_session_conflicts(self):
+        stale = ExamSession.objects.get(pk=self.session.pk)
+        self.assertEqual(self.post('/api/proctor/results/submit/', answers={}).status_code, 201)
+        # A second request that read the session before the first one terminated it
+        with mock.patch.object(ExamSession, 'active_for', return_value=stale):
+            response = self.post('/api/proctor/results/submit/', answers={})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(TestResult.objects.filter(session=self.session).count(), 1)
+
+
+class AnalyticsTests(TestCase):
+    def test_unparseable_since_or_until_is_rejected(self):
+        client = Client(HTTP_HOST='localhost')
+        self.assertEqual(client.get('/api/proctor/analytics/', {'since': '2024-05-01T00:00:00'}).status_code, 200)
+        for params in ({'since': 'yesterday'}, {'until': '2024-13-45'}, {'since': '2024-02-30T00:00:00'}):
+            self.assertEqual(client.get('/api/proctor/analytics/', params).status_code, 400, params)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.archive = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive.cleanup)
+        self.exam = Exam.objects.create(name="Retention test")
+        self.policy = RetentionPolicy.objects.create(name="Exam", exam=self.exam, max_age_days=30,
+                                                     archive_by=RetentionPolicy.ARCHIVE_BY_EXAM)
+        self.now = timezone.now()
+
+    def session(self, candidate_id, days_ago, terminated, evidence_days_ago):
+        session = ExamSession.objects.create(candidate_id=candidate_id, exam=self.exam, terminated=terminated)
+        ExamSession.objects.filter(id=session.id).update(started_at=self.now - timedelta(days=days_ago))
+        seen = self.now - timedelta(days=evidence_days_ago)
+        violation = Violation.objects.create(session=session, reason="No face")
+        Violation.objects.filter(id=violation.id).update(timestamp=seen, last_seen_at=seen)
+        screenshot = Screenshot.objects.create(session=session, violation=violation, image="data:,", reason="No face")
+        Screenshot.objects.filter(id=screenshot.id).update(captured_at=seen)
+        return session
+
+    def test_terminated_and_abandoned_sessions_are_purged_active_ones_kept(self):
+        finished = self.session("finished", 60, terminated=True, evidence_days_ago=60)
+        abandoned = self.session("abandoned", 60, terminated=False, evidence_days_ago=45)
+        returning = self.session("returning", 60, terminated=False, evidence_days_ago=1)
+        recent = self.session("recent", 5, terminated=True, evidence_days_ago=5)
+
+        with override_settings(PROCTOR_ARCHIVE_DIR=self.archive.name):
+            totals = apply_policy(self.policy, now=self.now, log=lambda message: None)
+
+        self.assertEqual(totals['sessions'], 2)
+        kept = set(Violation.objects.values_list('session_id', flat=True))
+        self.assertEqual(kept, {returning.id, recent.id})
+        self.assertFalse(Screenshot.objects.filter(session__in=[finished, abandoned]).exists())
+        # Archived under the session's exam even though no session has a result
+        self.assertEqual(os.listdir(self.archive.name), [f"exam-{self.exam.id}.jsonl.gz"])
+
+
+class StubDetector:
+    """Stands in for ProctorDetector in the pool - analysis blocks until `release` is set"""
+
+    def __init__(self):
+        self.load_monitor = LoadMonitor()
+        self.release = threading.Event()
+        self.release.set()
+        self.analysed = []
+
+    def analyze_frame(self, frame, candidate_id, scale=1, captured_at=None):
+        self.release.wait()
+        self.analysed.append((candidate_id, frame))
+        return {'frame': frame}
+
+    def needs_attention(self, candidate_id):
+        return False
+
+    def _busy_result(self, candidate_id):
+        return {'skipped': True}
+
+
+class MotionModelTests(TestCase):
+    def test_heavy_movement_matches_the_original_window_rule(self):
+        rng = np.random.default_rng(7)
+        model = MotionModel(background_alpha=1.0, warmup_frames=0)
+        history = deque(maxlen=10)
+        frame = np.zeros((120, 160), dtype=np.uint8)
+        model.update(frame)
+        for coverage in [0.05, 0.1, 0.08, 0.06, 0.1, 0.07, 0.6, 0.1, 0.4, 0.05, 0.9, 0.2]:
+            frame = np.where(rng.random(frame.shape) < coverage, 255 - frame, frame).astype(np.uint8)
+            movement, heavy = model.update(frame)
+            history.append(movement)
+            expected = len(history) > 5 and movement > max(35, np.mean(history) * 1.8)
+            self.assertEqual(heavy, expected, movement)
+
+
+class GoldenScoringTests(TestCase):
+    def test_frame_reasons_map_to_categories(self):
+        result = {'face_detected': False, 'mobile_phone_detected': True, 'object_violation': True,
+                  'violation_type': 'Mobile Phone',
+                  'mobile_phone_details': [{'phone_part': 'Back Camera', 'camera_module': True}]}
+        got = {c for reason in frame_findings(result) for c in reason_categories(reason, result)}
+        self.assertEqual(got, {'no_face', 'phone', 'back_camera'})
+        book = {'face_detected': True, 'object_violation': True, 'violation_type': '📚 Book'}
+        self.assertEqual([reason_categories(r, book) for r in frame_findings(book)], [['book']])
+
+    def test_scores_fail_on_a_drop_against_the_baseline(self):
+        frames = [
+            {'expected': ['no_face'], 'got': ['no_face']},
+            {'expected': ['phone'], 'got': []},
+            {'expected': ['phone'], 'got': ['phone', 'book']},
+            {'expected': [], 'got': []},
+        ]
+        scores = category_scores(frames)
+        self.assertEqual((scores['phone']['precision'], scores['phone']['recall']), (1.0, 0.5))
+        self.assertEqual(scores['book']['precision'], 0.0)
+        self.assertIsNone(scores['laptop']['recall'])
+
+        baseline = {'phone': {'precision': 1.0, 'recall': 1.0}, 'book': {'precision': None, 'recall': None}}
+        problems = score_problems(scores, baseline, min_precision=0.0, min_recall=0.0)
+        self.assertEqual(problems, ["phone: recall dropped 100% -> 50%"])
+        self.assertEqual(score_problems(scores, baseline, min_precision=0.0, min_recall=0.0, tolerance=0.5), [])
+        self.assertIn("book: precision 0% < 100%", score_problems(scores))
+
+
+class DetectorPoolTests(TestCase):
+    def test_hung_analysis_answers_with_last_result_at_the_deadline(self):
+        detector = StubDetector()
+        detector.release.clear()
+        self.addCleanup(detector.release.set)
+        pool = DetectorPool(detector, checkout_timeout=1.0)
+
+        started = time.monotonic()
+        result = pool.analyze_frame('frame', candidate_id='c1', deadline=time.time() + 0.2)
+        self.assertEqual(result, {'skipped': True})
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(pool.scheduler.snapshot()['overran_frames'], 1)
+
+
+class FrameSchedulerTests(TestCase):
+    def setUp(self):
+        self.scheduler = FrameScheduler(LoadMonitor(), min_rate=0)
+
+    def test_newer_frame_supersedes_the_waiting_one(self):
+        older = self.scheduler.submit('c1', 'frame-1')
+        newer = self.scheduler.submit('c1', 'frame-2')
+        self.assertTrue(older.superseded)
+        self.assertTrue(older.done.is_set())
+        self.assertIsNone(older.frame)
+        self.assertEqual(self.scheduler.next_slot(), ('c1', newer))
+        self.assertEqual(self.scheduler.snapshot()['superseded_frames'], 1)
+
+    def test_candidates_are_served_in_turn_whatever_their_frame_rate(self):
+        self.scheduler.submit('greedy', 'g1')
+        self.scheduler.submit('steady', 's1')
+        self.scheduler.submit('greedy', 'g2')   # keeps greedy's place, doesn't jump the queue twice
+        served = [self.scheduler.next_slot()[0] for _ in range(2)]
+        self.assertEqual(served, ['greedy', 'steady'])
+
+    def test_cancel_withdraws_a_frame_not_yet_started(self):
+        slot = self.scheduler.submit('c1', 'frame')
+        self.assertTrue(self.scheduler.cancel('c1', slot))
+        self.assertTrue(slot.superseded)
+        self.assertEqual(self.scheduler.snapshot()['pending_candidates'], 0)
+        started = self.scheduler.submit('c2', 'frame')
+        self.scheduler.next_slot()
+        self.assertFalse(self.scheduler.cancel('c2', started))
+
+
+class StaleFrameTests(TestCase):
+    def test_frame_past_its_deadline_in_the_queue_is_never_analysed(self):
+        detector = StubDetector()
+        pool = DetectorPool(detector)
+        slot = pool.scheduler.submit('c1', 'frame', deadline=time.time() - 1)
+        self.assertTrue(slot.done.wait(2))
+        self.assertTrue(slot.superseded)
+        self.assertEqual(detector.analysed, [])
+        self.assertEqual(pool.scheduler.snapshot()['stale_frames'], 1)
+
+    def test_frame_whose_request_gave_up_is_withdrawn(self):
+        detector = StubDetector()
+        detector.release.clear()
+        self.addCleanup(detector.release.set)
+        pool = DetectorPool(detector, checkout_timeout=0.1)
+        # c1's frame occupies the only replica; c2's is still queued when its request gives up
+        threading.Thread(target=pool.analyze_frame, args=('busy',), kwargs={'candidate_id': 'c1'}, daemon=True).start()
+        while pool.scheduler.snapshot()['pending_candidates'] or not pool.scheduler.picks:
+            time.sleep(0.01)
+        self.assertEqual(pool.analyze_frame('late', candidate_id='c2'), {'skipped': True})
+        detector.release.set()
+        time.sleep(0.1)
+        self.assertEqual(detector.analysed, [('c1', 'busy')])
+
+
+class StateStoreTests(TestCase):
+    def tracked_state(self):
+        state = new_state()
+        state['buffers']['no_face'] = 2
+        state['objects']['73_3_4'] = {'first_seen': 1000.5, 'last_seen': 1003.25, 'confidence_scores': [0.81, 0.9],
+                                      'violation_logged': False, 'correction_start_time': None, 'grace_remaining': 5}
+        state['phones']['phone_5_7'] = {'first_seen': 1001.0, 'last_seen': 1003.25, 'detection_count': 3,
+                                        'violation_logged': True, 'grace_start': 1001.0, 'warning_shown': True,
+                                        'phone_part': 'Mobile Phone (Portrait)'}
+        state['clock'] = 1003.25
+        return state
+
+    def test_tracker_state_round_trips_through_json_records(self):
+        with mock.patch.object(state_module, 'msgpack', None):
+            blob = encode(self.tracked_state())
+            self.assertEqual(blob[:1], b'j')
+            self.assertEqual(decode(blob), self.tracked_state())
+
+    def test_tracker_state_round_trips_through_msgpack_records(self):
+        if state_module.msgpack is None:
+            self.skipTest("msgpack not installed")
+        blob = encode(self.tracked_state())
+        self.assertEqual(blob[:1], b'm')
+        self.assertEqual(decode(blob), self.tracked_state())
+
+    def test_unreadable_record_starts_over(self):
+        self.assertEqual(decode(b'j{not json'), new_state())
+        self.assertEqual(decode(None), new_state())
+
+    def test_local_store_keeps_each_candidates_state_between_frames(self):
+        store = LocalStateStore()
+        state = store.acquire('c1')
+        state['buffers']['multiple_faces'] = 1
+        store.release('c1', state)
+        self.assertEqual(store.acquire('c1')['buffers']['multiple_faces'], 1)
+        store.release('c1', state)
+        self.assertEqual(store.acquire('c2'), new_state())
+        store.release('c2', new_state())
+        store.clear()
+        self.assertEqual(store.acquire('c1'), new_state())
+        store.release('c1', new_state())
+
+    def test_redis_store_falls_back_to_worker_local_state_when_unreachable(self):
+        try:
+            store = RedisStateStore('redis://127.0.0.1:1/0', lock_wait=0.1)
+        except ImportError:
+            self.skipTest("redis not installed")
+        state = store.acquire('c1')
+        state['buffers']['no_face'] = 3
+        store.release('c1', state)
+        self.assertEqual(store.acquire('c1')['buffers']['no_face'], 3)
+        store.release('c1', state)
+        self.assertGreater(store.snapshot()['state_store_failures'], 0)
+
+
+class EpisodeTests(TestCase):
+    def setUp(self):
+        self.session = ExamSession.objects.create(candidate_id="episodes@x")
+        self.start = timezone.now()
+
+    def at(self, seconds):
+        return self.start + timedelta(seconds=seconds)
+
+    def frame(self, seconds, *reasons):
+        return record_frame(self.session, {reason: reason for reason in reasons}, "data:,", now=self.at(seconds))
+
+    def test_finding_on_consecutive_frames_is_one_episode(self):
+        self.assertEqual(self.frame(0, "No face"), ["No face"])
+        self.assertEqual(self.frame(5, "No face"), [])
+        self.assertEqual(self.frame(10, "No face"), [])
+        episode = Violation.objects.get(session=self.session)
+        self.assertEqual(episode.frame_count, 3)
+        self.assertEqual(episode.last_seen_at, self.at(10))
+        self.assertIsNone(episode.ended_at)
+        self.assertEqual(Screenshot.objects.filter(violation=episode).count(), 1)
+
+    def test_clean_frame_ends_the_episode_at_its_last_sighting(self):
+        self.frame(0, "No face")
+        self.frame(4, "No face")
+        self.assertEqual(self.frame(8), [])
+        self.assertEqual(Violation.objects.get(session=self.session).ended_at, self.at(4))
+        self.assertEqual(self.frame(12, "No face"), ["No face"])
+
+    def test_silence_longer_than_the_gap_starts_a_new_episode(self):
+        self.frame(0, "No face")
+        self.assertEqual(self.frame(episode_gap() + 1, "No face"), ["No face"])
+        first, second = Violation.objects.filter(session=self.session).order_by('id')
+        self.assertEqual(first.ended_at, self.at(0))
+        self.assertIsNone(second.ended_at)
+
+    def test_skipped_frames_keep_the_episode_open(self):
+        gap = episode_gap()
+        self.frame(0, "No face")
+        touch_episodes(self.session.id, now=self.at(gap - 1))
+        self.assertEqual(self.frame(2 * gap - 2, "No face"), [])
+        self.assertEqual(Violation.objects.get(session=self.session).frame_count, 2)
+
+    def test_end_episodes_closes_everything_open(self):
+        self.frame(0, "No face", "Mobile Phone")
+        self.frame(3, "No face", "Mobile Phone")
+        end_episodes([self.session.id])
+        ended = Violation.objects.filter(session=self.session).values_list('ended_at', flat=True)
+        self.assertEqual(list(ended), [self.at(3), self.at(3)])
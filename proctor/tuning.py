@@ -0,0 +1,197 @@
+# tuning.py - INFERENCE THREAD SPLIT AND HOST PROFILE
+#
+# The face net (OpenCV DNN) and the two YOLO models (Torch) run concurrently
+# within a frame (see stages.py). Both libraries keep their own native thread
+# pools, so left at their defaults three stages x all cores - times every
+# gunicorn worker on the box - oversubscribe the CPU.
+#
+# `manage.py autotune_inference` benchmarks the detectors on this host and
+# writes the fastest configuration to a JSON profile. Workers load it when the
+# detector starts; without a profile the split is derived from the core count.
+import json
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+# Keys of a profile that describe one process's inference configuration
+PROFILE_KEYS = ('stage_threads', 'torch_threads', 'interop_threads', 'cv2_threads', 'grad_mode', 'batch_size')
+
+
+def profile_path():
+    return getattr(settings, 'PROCTOR_TUNING_PROFILE', os.path.join(settings.BASE_DIR, 'inference_profile.json'))
+
+
+def load_profile():
+    """The tuned profile for this host, or {} if missing or tuned on a different CPU count"""
+    path = profile_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as fh:
+            profile = json.load(fh)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable inference profile {path}: {e}")
+        return {}
+    if profile.get('host_cores') != os.cpu_count():
+        print(f"⚠️ Ignoring inference profile tuned for {profile.get('host_cores')} cores "
+              f"(this host has {os.cpu_count()}) - rerun `manage.py autotune_inference`")
+        return {}
+    return profile
+
+
+def save_profile(profile):
+    path = profile_path()
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as fh:
+        json.dump(profile, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return path
+
+
+def thread_split(cores=None, profile=None, processes=None):
+    """
+    Inference configuration for one of `processes` worker processes (default
+    PROCTOR_WORKER_PROCESSES).
+    Precedence: PROCTOR_*_THREADS settings > tuned profile > derived from the core count.
+    """
+    cores = cores or os.cpu_count() or 1
+    profile = load_profile() if profile is None else profile
+    processes = processes or getattr(settings, 'PROCTOR_WORKER_PROCESSES', 1)
+    replicas = max(1, getattr(settings, 'PROCTOR_DETECTOR_REPLICAS', 1))
+    # Every replica of every worker process may be running a frame at the same time
+    per_replica = max(1, cores // max(1, processes) // replicas)
+
+    def pick(key, default):
+        return getattr(settings, f'PROCTOR_{key.upper()}', 0) or profile.get(key) or default
+
+    stage_threads = pick('stage_threads', 3 if per_replica >= 4 else 1)
+    cv2_threads = pick('cv2_threads', max(1, per_replica // 4))
+    # Phone and object YOLO each run their own intra-op team when stages overlap
+    torch_stages = 2 if stage_threads > 1 else 1
+    return {
+        'stage_threads': stage_threads,
+        'torch_threads': pick('torch_threads', max(1, (per_replica - cv2_threads) // torch_stages)),
+        'interop_threads': pick('interop_threads', 1),
+        'cv2_threads': cv2_threads,
+        'grad_mode': profile.get('grad_mode', 'inference_mode'),
+        'batch_size': profile.get('batch_size', 16),
+        'replicas': replicas,
+    }
+
+
+def configure_threads(split=None):
+    """Apply a thread split to the process-wide Torch / OpenCV pools"""
+    import cv2
+    import torch
+    from .preprocessing import set_grad_mode
+
+    split = split or thread_split()
+    torch.set_num_threads(split['torch_threads'])
+    try:
+        torch.set_num_interop_threads(split['interop_threads'])
+    except RuntimeError:
+        # Only settable before Torch starts its first inter-op work
+        pass
+    cv2.setNumThreads(split['cv2_threads'])
+    set_grad_mode(split['grad_mode'])
+    print(f"🧵 Threads per replica: {split['stage_threads']} stage(s), torch {split['torch_threads']} "
+          f"(interop {split['interop_threads']}), opencv {split['cv2_threads']}, "
+          f"{split['grad_mode']} ({os.cpu_count()} cores)")
+    return split
+
+
+# ============ BENCHMARK WORKERS (run in spawned processes) ============
+
+def _setup_benchmark_process():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camera_demo_backend.settings')
+    import django
+    django.setup()
+    # The detectors log every frame - keep the benchmark output readable
+    sys.stdout = open(os.devnull, 'w')
+
+
+def _synthetic_frames(count=4, size=(640, 480)):
+    """Distinct noise frames - never similar enough for the detection cache to kick in"""
+    import numpy as np
+    rng = np.random.default_rng(os.getpid())
+    width, height = size
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def benchmark_worker(config, seconds, barrier, results):
+    """Live path: frames/sec of the detector pool under `config`, one client thread per replica"""
+    try:
+        _setup_benchmark_process()
+        # Before any model is loaded, so the inter-op pool size still applies
+        configure_threads(config)
+        from .detector import ProctorDetector
+        from .pool import DetectorPool
+        from .state import LocalStateStore
+        pool = DetectorPool(
+            ProctorDetector(stage_threads=config['stage_threads'], torch_threads=config['torch_threads'],
+                            state_store=LocalStateStore()),
+            size=config.get('replicas', 1),
+        )
+        frames = _synthetic_frames()
+
+        # Warm up every replica past stable_frames_required so the object model runs too
+        for replica in pool.replicas:
+            for i in range(replica.stable_frames_required + 3):
+                replica.analyze_frame(frames[i % len(frames)], candidate_id='autotune')
+    except Exception as e:
+        results.put(('error', repr(e)))
+        barrier.abort()
+        return
+
+    try:
+        barrier.wait(timeout=600)
+    except threading.BrokenBarrierError:
+        results.put(('error', 'another benchmark process failed'))
+        return
+
+    counts = [0] * len(pool.replicas)
+
+    def drive(index):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pool.analyze_frame(frames[counts[index] % len(frames)], candidate_id=f'autotune-{index}', timeout=60)
+            counts[index] += 1
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=drive, args=(i,)) for i in range(len(pool.replicas))]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    results.put(('ok', sum(counts) / (time.perf_counter() - start)))
+
+
+def benchmark_batch_worker(batch_sizes, seconds, results):
+    """Offline path: frames/sec of a single-threaded rescore worker per batch size"""
+    import base64
+    import cv2
+    from . import batch
+
+    try:
+        _setup_benchmark_process()
+        batch.init_worker()
+        rows = []
+        for i, frame in enumerate(_synthetic_frames(count=max(batch_sizes))):
+            ok, buf = cv2.imencode('.jpg', frame)
+            rows.append((i, 'data:image/jpeg;base64,' + base64.b64encode(buf.tobytes()).decode()))
+
+        rates = {}
+        for batch_size in batch_sizes:
+            batch.rescore_chunk(rows[:batch_size], batch_size)  # warm-up
+            count = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < seconds:
+                batch.rescore_chunk(rows[:batch_size], batch_size)
+                count += batch_size
+            rates[batch_size] = count / (time.perf_counter() - start)
+        results.put(('ok', rates))
+    except Exception as e:
+        results.put(('error', repr(e)))
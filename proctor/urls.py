@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import QuestionViewSet, TestResultViewSet, ExamViewSet, analyze_frame, reset_session, log_violation, check_exam_access, request_retake, student_login
+from .views import QuestionViewSet, TestResultViewSet, ExamViewSet, analyze_frame, reset_session, log_violation, check_exam_access, request_retake, student_login, violation_analytics, inference_metrics, export_exam_data
 
 router = DefaultRouter()
 router.register(r'questions', QuestionViewSet)
@@ -14,6 +14,9 @@ urlpatterns = [
     path("check_exam_access/", check_exam_access, name="check_exam_access"),
     path("request_retake/", request_retake, name="request_retake"),
     path("student_login/", student_login, name="student_login"),
+    path("analytics/", violation_analytics, name="violation_analytics"),
+    path("metrics/", inference_metrics, name="inference_metrics"),
+    path("exams/<int:exam_id>/export/<str:kind>.<str:fmt>", export_exam_data, name="export_exam_data"),
 ]
 
 urlpatterns += router.urls
\ No newline at end of file
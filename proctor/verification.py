@@ -0,0 +1,80 @@
+# verification.py - PRE-EXAM CAMERA CHECK
+#
+# `mode: verification` frames only need to answer "is exactly one face clearly
+# visible?". They run the Caffe face net on a reduced decode plus an optional
+# brightness / sharpness check - no YOLO, no motion model, no per-candidate
+# trackers or buffers, no ExamSession row, and they don't queue behind
+# proctoring frames in the detector pool.
+import os
+import threading
+import time
+
+import cv2
+
+from .detector import face_boxes, face_net_files
+from .preprocessing import FramePreprocessor
+
+
+class VerificationChecker:
+    # Mean gray level outside this range: camera covered / lights off, or washed out
+    min_brightness = 60
+    max_brightness = 220
+    # Variance of the Laplacian below this: out of focus or motion-blurred
+    min_sharpness = 50.0
+    quality_width = 320  # pixels - quality is judged on a small gray copy
+
+    def __init__(self):
+        config_file, model_file = face_net_files()
+        if os.path.exists(model_file) and os.path.exists(config_file):
+            self.face_net = cv2.dnn.readNetFromCaffe(config_file, model_file)
+        else:
+            print(f"Warning: Caffe model files not found at {model_file} or {config_file}. Verification will fail.")
+            self.face_net = None
+        self.preprocessor = FramePreprocessor()
+        # Decode just large enough for the face net and the quality copy
+        self.required_side = max(max(self.preprocessor.face_size), self.quality_width)
+        # One net and one set of face buffers - a check takes a few milliseconds
+        self.lock = threading.Lock()
+
+    def check(self, frame, scale=1, quality=True):
+        start_time = time.perf_counter()
+        h, w = frame.shape[:2]
+        width, height = int(w * scale), int(h * scale)
+
+        faces = []
+        if self.face_net is not None:
+            with self.lock:
+                self.face_net.setInput(self.preprocessor._prepare_face(frame))
+                faces = face_boxes(self.face_net.forward(), width, height)
+
+        result = {
+            "verification": True,
+            "face_count": len(faces),
+            "face_detected": len(faces) > 0,
+            "multiple_faces": len(faces) > 1,
+            "faces": [{"bbox": face[:4], "confidence": round(face[4], 2)} for face in faces],
+        }
+        if quality:
+            result["quality"] = self._quality(frame)
+        result["ready"] = len(faces) == 1 and (not quality or result["quality"]["ok"])
+        result["processing_time"] = round((time.perf_counter() - start_time) * 1000, 2)
+        return result
+
+    def _quality(self, frame):
+        h, w = frame.shape[:2]
+        if w > self.quality_width:
+            frame = cv2.resize(frame, (self.quality_width, int(h * self.quality_width / w)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        brightness = float(gray.mean())
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        too_dark = brightness < self.min_brightness
+        too_bright = brightness > self.max_brightness
+        blurry = sharpness < self.min_sharpness
+        return {
+            "brightness": round(brightness, 1),
+            "sharpness": round(sharpness, 1),
+            "too_dark": too_dark,
+            "too_bright": too_bright,
+            "blurry": blurry,
+            "ok": not (too_dark or too_bright or blurry),
+        }
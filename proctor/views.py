@@ -1,4 +1,3 @@
-import openpyxl
 import os
 import warnings
 import traceback
@@ -8,9 +7,13 @@ warnings.filterwarnings("ignore", category=FutureWarning)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Question, TestResult, Exam, ExamSession, Violation, Screenshot, Student
+from .models import Question, TestResult, Exam, ExamSession, Violation, Student
 from .serializers import QuestionSerializer, TestResultSerializer, ExamSerializer
+from .episodes import end_episodes, frame_findings, record_frame, touch_episodes
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+from django.utils import timezone
+from django.db import IntegrityError, transaction
 
 class ExamViewSet(viewsets.ModelViewSet):
     queryset = Exam.objects.all()
@@ -56,52 +59,41 @@ class QuestionViewSet(viewsets.ModelViewSet):
             exam, _ = Exam.objects.get_or_create(name="Default Exam", defaults={'duration_minutes': 30, 'is_active': True})
 
         try:
+            import openpyxl
             wb = openpyxl.load_workbook(file_obj)
             sheet = wb.active
             questions_created = 0
             
             # Headers: Text, Option A, Option B, Option C, Option D, Correct Answer
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                if not row or not row[0]: continue
+            # One transaction - the exam's answer key gets one new version, once the whole sheet is in
+            with transaction.atomic():
+                for row in sheet.iter_rows(min_row=2, values_only=True):
+                    if not row or not row[0]: continue
                 
-                Question.objects.create(
-                    exam=exam,
-                    text=row[0],
-                    option_a=row[1],
-                    option_b=row[2],
-                    option_c=row[3],
-                    option_d=row[4],
-                    correct_answer=row[5]
-                )
-                questions_created += 1
+                    Question.objects.create(
+                        exam=exam,
+                        text=row[0],
+                        option_a=row[1],
+                        option_b=row[2],
+                        option_c=row[3],
+                        option_d=row[4],
+                        correct_answer=row[5]
+                    )
+                    questions_created += 1
                 
             return Response({'message': f'{questions_created} questions uploaded to {exam.name}'}, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-# ... (imports and get_detector code remain same) ...
-import cv2
-import numpy as np
-import base64
-from django.http import JsonResponse
-from rest_framework.decorators import api_view
-from .detector import ProctorDetector
-
-import threading
-
-# Global detector instance
-detector = None
-detector_lock = threading.Lock()
+from rest_framework.decorators import api_view, renderer_classes
+from .renderers import analyze_renderers
 
-def get_detector():
-    global detector
-    if detector is None:
-        with detector_lock:
-            if detector is None:
-                detector = ProctorDetector()
-    return detector
+# NOTE: cv2 / numpy / torch are deliberately NOT imported here. The inference
+# stack lives in `proctor.inference` and is imported on the first analyze_frame
+# call, so CRUD, auth, admin and manage.py processes stay lightweight.
 
 @api_view(['POST'])
+@renderer_classes(analyze_renderers())
 def analyze_frame(request):
     try:
         image_data = request.data.get('image')
@@ -112,14 +104,47 @@ def analyze_frame(request):
             print("Analyze Frame: Error - No image provided")
             return Response({'error': 'No image provided'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Lazy import: loads OpenCV / Torch and the detectors on first use only
+        from . import inference
+        from .deadlines import expired, frame_deadline
+
+        if mode == 'verification':
+            # Pre-exam camera check: face net + image quality only - no YOLO, trackers or session row
+            if ';base64,' not in image_data:
+                return Response({'error': 'Invalid image format'}, status=status.HTTP_400_BAD_REQUEST)
+            quality = str(request.data.get('quality', True)).lower() not in ('false', '0')
+            try:
+                result = inference.verify_frame(image_data.split(';base64,', 1)[1], quality=quality)
+            except Exception as e:
+                print(f"Analyze Frame: Error decoding verification image: {e}")
+                return Response({'error': f'Invalid image format: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+            if result is None:
+                return Response({'error': 'Failed to decode image'}, status=status.HTTP_400_BAD_REQUEST)
+            # Same response keys as test mode - looked up, never created, before the exam starts
+            session = ExamSession.active_for(candidate_id)
+            result['session_violations'] = session.violations if session else 0
+            return Response(result)
+
+        # Capture time on the server clock - frames past their deadline aren't even decoded
+        captured_at, deadline = frame_deadline(candidate_id, request.data.get('captured_at'))
+        if expired(deadline):
+            result = inference.get_detector().stale_result(candidate_id, captured_at)
+            session = ExamSession.active_for(candidate_id)
+            result['session_violations'] = session.violations if session else 0
+            if session:
+                touch_episodes(session.id)
+            print(f"⌛ Dropping stale frame from {candidate_id} ({result['frame_age_ms']}ms old)")
+            return Response(result)
+
         try:
             if ';base64,' not in image_data:
                 print(f"Analyze Frame: Error - Invalid image format (missing ;base64,). Data prefix: {image_data[:50]}")
                 return Response({'error': 'Invalid image format'}, status=status.HTTP_400_BAD_REQUEST)
                 
             format, imgstr = image_data.split(';base64,') 
-            nparr = np.frombuffer(base64.b64decode(imgstr), np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            # Decoded at reduced resolution when oversized; the original
+            # full-resolution payload is only persisted as violation evidence
+            frame, scale = inference.decode_image(imgstr)
         except Exception as e:
              print(f"Analyze Frame: Error decoding image: {e}")
              return Response({'error': f'Invalid image format: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
@@ -128,70 +153,33 @@ def analyze_frame(request):
             print("Analyze Frame: Error - Failed to decode image (frame is None)")
             return Response({'error': 'Failed to decode image'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get or create active session
-        session, created = ExamSession.objects.get_or_create(
-            candidate_id=candidate_id,
-            terminated=False,
-            defaults={'violations': 0}
-        )
-
-        if session.terminated and mode != 'verification':
-             return Response({'error': 'Session terminated'}, status=status.HTTP_403_FORBIDDEN)
+        # Get or create active session - never a terminated one: a finished candidate starts a new session
+        session, created = ExamSession.acquire_active(
+            candidate_id, request.data.get('exam_id') or request.data.get('exam'))
 
-        detector_instance = get_detector()
-        result = detector_instance.analyze_frame(frame, candidate_id=candidate_id)
+        detector_instance = inference.get_detector()
+        result = detector_instance.analyze_frame(frame, candidate_id=candidate_id, scale=scale,
+                                                 captured_at=captured_at, deadline=deadline)
         
-        # If the frame was skipped (lock busy), don't process violations
+        # If the frame was skipped (lock busy), the result repeats the last real
+        # analysis - its violations were already recorded, don't process them again
         if result.get('skipped'):
-            print(f"⏩ Skipping violation analysis for {candidate_id} (Busy)")
+            print(f"⏩ Skipping violation analysis for {candidate_id} (Busy, next capture in {result.get('next_capture_ms')}ms)")
+            # ...but the candidate is still there - keep their ongoing episodes open
+            touch_episodes(session.id)
             result['session_violations'] = session.violations
             return Response(result)
 
-        # If in verification mode, just return the result without saving violations
-        if mode == 'verification':
-            result['session_violations'] = session.violations
-            return Response(result)
-
-        # Persist Violations - Robust atomic counting
+        # Persist Violations as episodes - only the frame that opens one writes a row and a screenshot
         from django.db.models import F
-        new_violations = 0
-
-        # 1. Mobile Phone (High Priority)
-        if result.get('mobile_phone_detected'):
-            # Check for actual violation (after grace period triggers object_violation)
-            phone_violation = result.get('object_violation') and result.get('violation_type') == 'Mobile Phone'
-            if phone_violation:
-                details = "Mobile Phone Detected"
-                if result.get('mobile_phone_details'):
-                    part = result['mobile_phone_details'][0].get('phone_part', 'Mobile Phone')
-                    details = f"Mobile Phone Detected: {part}"
-                
-                Violation.objects.create(session=session, reason=details)
-                Screenshot.objects.create(session=session, image=image_data, reason="Mobile Phone")
-                new_violations += 1
-                print(f"🚨 PHONE VIOLATION: {details} for {candidate_id}")
-            
-        # 2. Multiple faces detected
-        if result.get('multiple_faces'):
-            Violation.objects.create(session=session, reason="Multiple faces detected")
-            Screenshot.objects.create(session=session, image=image_data, reason="Multiple Faces")
-            new_violations += 1
-            print(f"🚨 VIOLATION: Multiple faces for {candidate_id}")
-
-        # 3. Face is not visible (Strict independent check)
-        if not result.get('face_detected'):
-            Violation.objects.create(session=session, reason="Face is not visible")
-            Screenshot.objects.create(session=session, image=image_data, reason="No Face Detected")
-            new_violations += 1
-            print(f"🚨 VIOLATION: Face not visible for {candidate_id}")
-            
-        # 4. Other Prohibited Objects
-        if result.get('object_violation') and result.get('violation_type') != 'Mobile Phone':
-            v_type = result.get('violation_type', 'Prohibited Object')
-            Violation.objects.create(session=session, reason=f"Prohibited Object: {v_type}")
-            Screenshot.objects.create(session=session, image=image_data, reason=f"Object: {v_type}")
-            new_violations += 1
-            print(f"🚨 VIOLATION: Object ({v_type}) for {candidate_id}")
+        findings = frame_findings(result)  # reason -> screenshot label
+
+        opened = record_frame(session, findings, image_data)
+        for reason in opened:
+            print(f"🚨 VIOLATION: {reason} for {candidate_id}")
+        new_violations = len(opened)
+        if findings and not opened:
+            print(f"⏳ Ongoing: {', '.join(findings)} for {candidate_id}")
 
         if new_violations > 0:
             # Use atomic update on the queryset for maximum reliability
@@ -209,6 +197,8 @@ def analyze_frame(request):
         status_text = "✅ STABLE"
         if new_violations > 0:
             status_text = "🚨 VIOLATION RECORDED"
+        elif findings:
+            status_text = "🚨 VIOLATION ONGOING"
         elif result.get('phone_warnings'):
             status_text = "⚠️ WARNING (GRACE PERIOD)"
         elif not result.get('face_detected'):
@@ -231,7 +221,10 @@ def reset_session(request):
     candidate_id = request.data.get('candidate_id')
     if candidate_id:
         # Important: Mark all existing active sessions as terminated
-        ExamSession.objects.filter(candidate_id=candidate_id, terminated=False).update(terminated=True)
+        active = ExamSession.objects.filter(candidate_id=candidate_id, terminated=False)
+        session_ids = list(active.values_list('id', flat=True))
+        active.update(terminated=True)
+        end_episodes(session_ids)
         print(f"🔄 SESSIONS RESET for {candidate_id}")
         return Response({'message': f'Active sessions for {candidate_id} terminated.'})
     return Response({'error': 'Candidate ID required'}, status=status.HTTP_400_BAD_REQUEST)
@@ -244,11 +237,13 @@ def log_violation(request):
     if not candidate_id:
         return Response({'error': 'Candidate ID required'}, status=status.HTTP_400_BAD_REQUEST)
         
-    session = ExamSession.objects.filter(candidate_id=candidate_id, terminated=False).order_by('-started_at').first()
+    session = ExamSession.active_for(candidate_id)
     if not session:
         return Response({'error': 'No active session found'}, status=status.HTTP_404_NOT_FOUND)
         
-    Violation.objects.create(session=session, reason=reason)
+    # A browser event is a moment, not an episode - closed as soon as it is written
+    now = timezone.now()
+    Violation.objects.create(session=session, reason=reason, last_seen_at=now, ended_at=now)
     # Optional: Save a screenshot placeholder or null if needed
     from django.db.models import F
     session.violations = F('violations') + 1
@@ -263,32 +258,59 @@ class TestResultViewSet(viewsets.ModelViewSet):
     serializer_class = TestResultSerializer
 
     def create(self, request, *args, **kwargs):
-        # Custom create to link ExamSession
-        candidate_id = request.data.get('student_name') # Using email as ID for now
-        
+        # Scores are never taken from the client - POST /results/ grades like /results/submit/
+        return self.submit(request)
+
+    @action(detail=False, methods=['post'])
+    def submit(self, request):
+        """Grade the candidate's answers ({question id: letter}) on the server and store the result"""
+        from .grading import grade_submission
+
+        candidate_id = request.data.get('student_name')
+        answers = request.data.get('answers')
+        if not candidate_id or not isinstance(answers, dict):
+            return Response({'error': 'student_name and answers ({question_id: letter}) required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        session = ExamSession.active_for(candidate_id)
+        exam_id = request.data.get('exam')
+        if exam_id:
+            exam = get_object_or_404(Exam, pk=exam_id)
+        elif session is not None and session.exam_id:
+            # The exam the candidate was proctored for
+            exam = session.exam
+        else:
+            # Same default as QuestionViewSet: the first active exam
+            exam = Exam.objects.filter(is_active=True).first()
+            if exam is None:
+                return Response({'error': 'No active exam'}, status=status.HTTP_400_BAD_REQUEST)
+
+        sheet, score, total, key_id = grade_submission(exam.pk, answers)
+        already_submitted = Response({'error': 'This session was already submitted'}, status=status.HTTP_409_CONFLICT)
         try:
-            # Try to find the active session for this candidate
-            session = ExamSession.objects.filter(candidate_id=candidate_id, terminated=False).order_by('-started_at').first()
-            
-            # Create Result
-            serializer = self.get_serializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-            test_result = serializer.save(session=session)
-            
-            # Mark session as terminated and completed
-            if session:
-                session.terminated = True
-                session.completed = True
-                session.save()
-                
-            headers = self.get_success_headers(serializer.data)
-            return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
-            
-        except Exception as e:
-            print(f"❌ ERROR in TestResult creation for {candidate_id}: {e}")
-            import traceback
-            traceback.print_exc()
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic():
+                if session is not None:
+                    # A concurrent submit of the same session waits here, then finds it terminated
+                    session = ExamSession.objects.select_for_update().get(id=session.id)
+                    if session.terminated:
+                        return already_submitted
+                test_result = TestResult.objects.create(
+                    exam=exam, session=session, student_name=candidate_id,
+                    score=score, total_questions=total, answers=sheet, answer_key_id=key_id,
+                )
+                if session is not None:
+                    session.exam = exam
+                    session.terminated = True
+                    session.completed = True
+                    session.save()
+        except IntegrityError:
+            # Databases without row locks: the session already has its result
+            return already_submitted
+        if session is not None:
+            end_episodes([session.id])
+
+        print(f"📝 Graded {candidate_id} on {exam.name}: {score}/{total}")
+        return Response(self.get_serializer(test_result).data, status=status.HTTP_201_CREATED)
 
 @api_view(['GET'])
 def check_exam_access(request):
@@ -394,3 +416,78 @@ def student_login(request):
             
     except Student.DoesNotExist:
         return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+@api_view(['GET'])
+def violation_analytics(request):
+    """Violation patterns by reason, exam, hour and candidate (served from ViolationSummary)"""
+    from django.utils.dateparse import parse_datetime
+    from .analytics import violation_analytics as build_analytics
+
+    raw_since = request.query_params.get('since')
+    raw_until = request.query_params.get('until')
+    try:
+        since = parse_datetime(raw_since) if raw_since else None
+        until = parse_datetime(raw_until) if raw_until else None
+        top = int(request.query_params.get('top', 20))
+    except ValueError:
+        return Response({'error': 'Invalid since/until/top parameter'}, status=status.HTTP_400_BAD_REQUEST)
+    # parse_datetime returns None for text that isn't a datetime - don't fall back to all-time totals
+    if (raw_since and since is None) or (raw_until and until is None):
+        return Response({'error': 'Invalid since/until/top parameter'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(build_analytics(
+        exam_id=request.query_params.get('exam_id'),
+        since=since,
+        until=until,
+        top=top,
+    ))
+
+
+@api_view(['GET'])
+def inference_metrics(request):
+    """Load, latency and model tier of this worker's detector"""
+    import sys
+    # Don't load the inference stack just to report on it
+    inference = sys.modules.get('proctor.inference')
+    if inference is None or inference.detector is None:
+        return Response({'loaded': False, 'pid': os.getpid()})
+    return Response({'loaded': True, 'pid': os.getpid(), **inference.detector.load_monitor.snapshot(),
+                     **inference.detector.scheduler.snapshot(),
+                     **inference.detector.primary.state_store.snapshot()})
+
+
+@require_GET
+def export_exam_data(request, exam_id, kind, fmt):
+    """Stream an exam's results / sessions / violations as CSV, or XLSX one capped file at a time"""
+    # Plain Django view: DRF content negotiation would reject Accept: text/csv
+    from django.http import FileResponse, Http404, HttpResponseBadRequest, StreamingHttpResponse
+    from .exports import (EXPORTS, FORMATS, LastId, export_rows, has_rows_after, stream_csv, write_xlsx,
+                          xlsx_max_rows)
+
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise Http404(f"Unknown export {kind}.{fmt}")
+    exam = get_object_or_404(Exam, pk=exam_id)
+    filename = f"exam-{exam.pk}-{kind}.{fmt}"
+    print(f"📤 Exporting {kind} for exam '{exam.name}' as {fmt}")
+
+    if fmt == 'csv':
+        response = StreamingHttpResponse(stream_csv(export_rows(kind, exam.pk)), content_type=FORMATS['csv'])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    # XLSX can't stream - cap each file and page through with ?after=<last id>
+    after = request.GET.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            return HttpResponseBadRequest("after must be a row id")
+        filename = f"exam-{exam.pk}-{kind}-after-{after}.{fmt}"
+    rows = LastId(export_rows(kind, exam.pk, after=after, limit=xlsx_max_rows()))
+    response = FileResponse(write_xlsx(rows, title=kind), as_attachment=True,
+                            filename=filename, content_type=FORMATS['xlsx'])
+    if rows.last is not None and rows.count - 1 >= xlsx_max_rows() and has_rows_after(kind, exam.pk, rows.last):
+        response['X-Export-Next-After'] = str(rows.last)
+        print(f"📤 {kind} export capped at {xlsx_max_rows()} rows, next file after id {rows.last}")
+    return response
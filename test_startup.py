@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+
+# Measures the import cost of a lightweight (CRUD / auth / admin / manage.py)
+# process and checks that it never pulls in the inference stack.
+#
+# Usage: python test_startup.py
+
+HEAVY_MODULES = ['torch', 'cv2', 'proctor.detector', 'proctor.mobile_phone_detector', 'proctor.inference']
+BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', '3.0'))
+
+PROBE = """
+import os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camera_demo_backend.settings')
+start = time.perf_counter()
+import django
+django.setup()
+import proctor.urls
+import proctor.admin
+import camera_demo_backend.urls
+elapsed = time.perf_counter() - start
+print('ELAPSED', elapsed)
+print('LOADED', ','.join(m for m in %r if m in sys.modules))
+""" % (HEAVY_MODULES,)
+
+INFERENCE_PROBE = """
+import os, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camera_demo_backend.settings')
+import django
+django.setup()
+start = time.perf_counter()
+import proctor.inference
+print('ELAPSED', time.perf_counter() - start)
+"""
+
+def run_probe(code):
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    values = {}
+    for line in proc.stdout.splitlines():
+        key, _, value = line.partition(' ')
+        if key in ('ELAPSED', 'LOADED'):
+            values[key] = value.strip()
+    return proc, values
+
+print("Starting Startup Import Diagnostic...")
+
+proc, values = run_probe(PROBE)
+if 'ELAPSED' not in values:
+    print(f"❌ Lightweight probe failed:\n{proc.stderr}")
+    sys.exit(1)
+
+elapsed = float(values['ELAPSED'])
+loaded = [m for m in values.get('LOADED', '').split(',') if m]
+
+print("\n--- Lightweight Process (django.setup + urls + admin) ---")
+print(f"   - Import time: {elapsed * 1000:.0f} ms (budget {BUDGET_SECONDS * 1000:.0f} ms)")
+print(f"   - Heavy modules loaded: {loaded or 'none'}")
+
+failed = False
+if loaded:
+    print(f"❌ Inference stack leaked into lightweight import path: {loaded}")
+    failed = True
+if elapsed > BUDGET_SECONDS:
+    print("❌ Lightweight import exceeded budget")
+    failed = True
+
+# For comparison: what the first analyze_frame call pays
+proc, values = run_probe(INFERENCE_PROBE)
+print("\n--- Inference Stack (first analyze_frame) ---")
+if 'ELAPSED' in values:
+    print(f"   - Import time: {float(values['ELAPSED']) * 1000:.0f} ms")
+else:
+    last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'unknown error'
+    print(f"   - Not importable in this environment: {last_line}")
+print("--- End of Startup Diagnostic ---\n")
+
+if failed:
+    sys.exit(1)
+print("✅ Lightweight processes do not load the inference stack")